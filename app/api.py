@@ -0,0 +1,232 @@
+# api.py
+#
+# Read-only JSON API, version 1, over categories, seasonal prices, tourist
+# locations, bookings and payments (the views are ApiListView and
+# ApiDetailView in views.py, under /api/v1/).
+#
+# Every resource declares its JSON fields once, as a map to values_list()
+# columns. A Serializer is built once per field selection (?fields=...) and
+# turns rows into dicts by position, so there is no model instantiation and
+# no per-object field lookup. Lists use keyset pagination (?cursor=, ?limit=).
+#
+# ETags are strong and computed from the id and updated_at of the rows on
+# the page (or of the one row), plus the request URL. They are checked
+# against If-None-Match before anything is serialised, so an unchanged page
+# costs its one query and an empty 304.
+
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.utils.http import parse_etags
+
+from .models import Booking, Category, Payment, SeasonalPricing, TouristLocation
+from .pagination import InvalidCursor, akeyset_page
+
+API_VERSION = 1
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Serializer:
+    """Rows of ``columns`` to dicts of ``names``, for one field selection of a resource."""
+
+    def __init__(self, resource, names):
+        self.names = names
+        # id and updated_at first (ETag), then the sort keys (cursor), then the selected fields
+        sort_columns = [field.lstrip('-') for field in resource.ordering]
+        columns = ['id', 'updated_at', *sort_columns, *(resource.fields[name] for name in names)]
+        self.columns = tuple(dict.fromkeys(columns))
+        self.positions = tuple(self.columns.index(resource.fields[name]) for name in names)
+        self.sort_positions = tuple(self.columns.index(column) for column in sort_columns)
+        self.converters = tuple(
+            (i, resource.converters[name]) for i, name in enumerate(names) if name in resource.converters
+        )
+
+    def sort_key(self, row):
+        return [row[i] for i in self.sort_positions]
+
+    def __call__(self, row):
+        values = [row[i] for i in self.positions]
+        for i, convert in self.converters:
+            values[i] = convert(values[i])
+        return dict(zip(self.names, values))
+
+
+class Resource:
+    """One API collection: its JSON fields, ordering, filters and who may read it."""
+
+    model = None
+    fields = {}  # JSON name -> values_list() column, in output order
+    converters = {}  # JSON name -> function applied to the column value
+    ordering = ('id',)  # Keyset order; the last field must be unique
+    filters = {}  # Query parameter -> model field, matched exactly
+    login_required = False
+
+    def __init__(self):
+        self._serializers = {}
+
+    def queryset(self, user):
+        return self.model.objects.all()
+
+    def serializer(self, request):
+        selected = request.GET.get('fields')
+        if selected:
+            names = tuple(dict.fromkeys(name.strip() for name in selected.split(',') if name.strip()))
+            unknown = [name for name in names if name not in self.fields]
+            if unknown or not names:
+                raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(self.fields)}.")
+        else:
+            names = tuple(self.fields)
+        serializer = self._serializers.get(names)
+        if serializer is None:
+            serializer = self._serializers.setdefault(names, Serializer(self, names))
+        return serializer
+
+    def filter(self, queryset, params):
+        for param, field_name in self.filters.items():
+            if param in params:
+                field = self.model._meta.get_field(field_name)
+                try:
+                    value = field.to_python(params[param])
+                except ValidationError:
+                    raise ApiError(f"Invalid value for '{param}'.")
+                queryset = queryset.filter(**{field.attname: value})
+        return queryset
+
+    async def page(self, request, user):
+        serializer = self.serializer(request)
+        limit = page_size(request)
+        queryset = self.filter(self.queryset(user), request.GET).values_list(*serializer.columns)
+        try:
+            page = await akeyset_page(queryset, self.ordering, request.GET.get('cursor'), limit,
+                                      key=serializer.sort_key)
+        except (InvalidCursor, ValidationError):
+            raise ApiError("Invalid cursor.")
+        return serializer, page
+
+    async def get(self, request, user, pk):
+        serializer = self.serializer(request)
+        row = await self.queryset(user).filter(id=pk).values_list(*serializer.columns).afirst()
+        if row is None:
+            raise ApiError("Not found.", status=404)
+        return serializer, row
+
+
+class CategoryResource(Resource):
+    model = Category
+    fields = {
+        'id': 'id', 'name': 'name', 'description': 'description', 'price_per_night': 'price_per_night',
+        'number_of_rooms': 'number_of_rooms', 'max_guests': 'max_guests', 'is_available': 'is_available',
+        'image': 'image', 'free_wifi': 'free_wifi', 'hot_water': 'hot_water', 'swimming_pool': 'swimming_pool',
+        'kitchen': 'kitchen', 'parking_area': 'parking_area', 'is_ac': 'is_ac', 'is_non_ac': 'is_non_ac',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    converters = {'image': image_url}
+    filters = {'is_available': 'is_available'}
+
+
+class SeasonalPricingResource(Resource):
+    model = SeasonalPricing
+    fields = {
+        'id': 'id', 'category': 'category_id', 'start_date': 'start_date', 'end_date': 'end_date',
+        'price_per_night': 'price_per_night', 'priority': 'priority', 'updated_at': 'updated_at',
+    }
+    filters = {'category': 'category'}
+
+
+class TouristLocationResource(Resource):
+    model = TouristLocation
+    fields = {
+        'id': 'id', 'name': 'name', 'description': 'description',
+        'distance_from_home_stay': 'distance_from_home_stay', 'image': 'image', 'link': 'link',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    converters = {'image': image_url}
+
+
+class BookingResource(Resource):
+    model = Booking
+    fields = {
+        'id': 'id', 'customer': 'customer_id', 'category': 'Category_id', 'start_date': 'start_date',
+        'end_date': 'end_date', 'total_price': '_total_price', 'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    ordering = ('-created_at', '-id')  # booking_created_idx / booking_customer_created_idx
+    filters = {'category': 'Category', 'customer': 'customer'}
+    login_required = True
+
+    def queryset(self, user):
+        # Customers see their own bookings, admins all of them
+        bookings = Booking.objects.all()
+        return bookings if user.role == 'admin' else bookings.filter(customer=user)
+
+
+class PaymentResource(Resource):
+    model = Payment
+    fields = {
+        'id': 'id', 'booking': 'booking_id', 'amount': 'amount', 'status': 'status',
+        'transaction_id': 'transaction_id', 'payment_date': 'payment_date', 'updated_at': 'updated_at',
+    }
+    ordering = ('-id',)
+    filters = {'booking': 'booking', 'status': 'status'}
+    login_required = True
+
+    def queryset(self, user):
+        payments = Payment.objects.all()
+        return payments if user.role == 'admin' else payments.filter(booking__customer=user)
+
+
+RESOURCES = {
+    'categories': CategoryResource(),
+    'seasonal_prices': SeasonalPricingResource(),
+    'tourist_locations': TouristLocationResource(),
+    'bookings': BookingResource(),
+    'payments': PaymentResource(),
+}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise ApiError(f"Unknown resource '{name}'. Choose from: {', '.join(RESOURCES)}.", status=404)
+
+
+def page_size(request):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return settings.API_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ApiError("limit must be a number.")
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(f"limit must be between 1 and {settings.API_MAX_PAGE_SIZE}.")
+    return limit
+
+
+def etag(request, rows, *extra):
+    """Strong ETag of a response built from ``rows`` (id and updated_at come first in every row)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'v{API_VERSION}\0{request.get_full_path()}\0{extra}'.encode())
+    for row in rows:
+        digest.update(f'\0{row[0]}:{row[1].isoformat()}'.encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified(request, tag):
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return '*' in tags or tag in tags or f'W/{tag}' in tags
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.contrib.staticfiles.apps import StaticFilesConfig as BaseStaticFilesConfig
 
 
 class AppConfig(AppConfig):
+    default = True  # apps.py defines more than one AppConfig
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+
+# collectstatic skips the SCSS sources; only the compiled CSS is served
+class StaticFilesConfig(BaseStaticFilesConfig):
+    ignore_patterns = BaseStaticFilesConfig.ignore_patterns + ['scss', '*.scss']
@@ -0,0 +1,237 @@
+# ari.py
+#
+# Availability, rates and inventory (ARI) feed for channel managers: for every
+# category and every night of a horizon, the rooms still for sale, the nightly
+# rate and whether the night is closed. Consecutive nights with the same values
+# are sent as one range (start_date to end_date, both nights included, like
+# SeasonalPricing).
+#
+# The grid is kept in the ARI_CACHE_ALIAS cache in slices of one category and
+# one calendar month, each stamped with the time its computation started.
+# Whatever changes availability or rates records the affected nights in the
+# AriChange log once its transaction has committed: the inventory ledger
+# functions (bookings, holds, imports, rebuilds) and the SeasonalPricing and
+# Category signals. A feed request reads its slices with one get_many, finds
+# the stale ones with one query on the log, and recomputes only those, all
+# together, from one query each on the categories, the ledger and the seasons.
+#
+# The same log answers "what changed since": a request with ``since`` returns
+# only the nights changed after it. Clients pass the previous response's
+# generated_at; a change committed while that response was being built is
+# stamped after it, so it is sent again next time rather than lost. A since
+# older than ARI_CHANGE_TTL (the log is purged past that) gets the full grid.
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AriChange, Category, RoomInventory
+from .pricing import PriceIndex
+
+ONE_DAY = timedelta(days=1)
+
+# Category-wide changes (price, room count, availability) cover every night
+ALL_NIGHTS = (date(2000, 1, 1), date(9999, 1, 1))
+
+
+def ari_cache():
+    return caches[settings.ARI_CACHE_ALIAS]
+
+
+def cache_key(category_id, month):
+    return f'ari:{category_id}:{month:%Y-%m}'
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _months(start_date, end_date):
+    month = _month(start_date)
+    while month < end_date:
+        yield month
+        month = _next_month(month)
+
+
+# Recording changes
+
+def changed(ranges):
+    """Record ``ranges`` ({category_id: (start_date, end_date exclusive)}) once the transaction commits."""
+    if not ranges:
+        return
+    ranges = dict(ranges)
+    transaction.on_commit(lambda: AriChange.objects.bulk_create(
+        AriChange(category_id=category_id, start_date=start, end_date=end, changed_at=timezone.now())
+        for category_id, (start, end) in ranges.items()
+    ))
+
+
+def changed_nights(category, start_date, end_date):
+    # category may be an instance or a primary key
+    changed({getattr(category, 'pk', category): (start_date, end_date)})
+
+
+def changed_category(category):
+    changed({getattr(category, 'pk', category): ALL_NIGHTS})
+
+
+def changed_counts(counts):
+    """Record the nights of ``counts`` ({(category_id, night): rooms}), one range per category."""
+    ranges = {}
+    for category_id, night in counts:
+        start, end = ranges.get(category_id, (night, night + ONE_DAY))
+        ranges[category_id] = (min(start, night), max(end, night + ONE_DAY))
+    changed(ranges)
+
+
+def purge(now=None):
+    """Delete log entries older than ARI_CHANGE_TTL; returns how many were deleted."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.ARI_CHANGE_TTL)
+    deleted, _ = AriChange.objects.filter(changed_at__lt=cutoff).delete()
+    return deleted
+
+
+# Computing slices
+
+def _compute(categories, slices):
+    """Cells of every (category_id, month) in ``slices``: one (available, rate, closed) per night."""
+    computed_at = timezone.now()  # Before reading, so a change committed meanwhile marks the slice stale
+    by_pk = {c.pk: c for c in categories}
+    wanted = [by_pk[pk] for pk in {pk for pk, _ in slices}]
+    start_date = min(month for _, month in slices)
+    end_date = _next_month(max(month for _, month in slices))
+
+    ledger = {
+        (category_id, day): (capacity, sold)
+        for category_id, day, capacity, sold in RoomInventory.objects.filter(
+            category_id__in=[c.pk for c in wanted], date__gte=start_date, date__lt=end_date,
+        ).values_list('category_id', 'date', 'capacity', 'sold')
+    }
+    indexes = PriceIndex.for_categories(wanted)
+
+    result = {}
+    for category_id, month in slices:
+        category = by_pk[category_id]
+        rooms = category.number_of_rooms
+        cells = []
+        for day, rate in indexes[category_id].nights(month, _next_month(month)):
+            capacity, sold = ledger.get((category_id, day), (rooms, 0))
+            # Same rule as inventory.rooms_left: never more than the category has today
+            available = max(0, min(capacity - sold, rooms))
+            cells.append((available, rate, not category.is_available or available == 0))
+        result[category_id, month] = (computed_at, cells)
+    return result
+
+
+def _merge(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def feed(start_date, days, since=None):
+    """The ARI grid for ``days`` nights from ``start_date``, or only what changed after ``since``."""
+    generated_at = timezone.now()
+    end_date = start_date + timedelta(days=days)
+    if since is not None and since < generated_at - timedelta(seconds=settings.ARI_CHANGE_TTL):
+        since = None  # Older than the log: send everything
+
+    categories = list(
+        Category.objects.only('name', 'price_per_night', 'number_of_rooms', 'is_available').order_by('pk')
+    )
+    months = list(_months(start_date, end_date))
+    cache = ari_cache()
+    keys = {cache_key(c.pk, month): (c.pk, month) for c in categories for month in months}
+    slices = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+    # One read of the change log serves both the staleness check and the delta
+    stamps = [computed_at for computed_at, _ in slices.values()]
+    if since is not None:
+        stamps.append(since)
+    changes = []
+    if stamps:
+        # Inclusive comparisons throughout: sending a night twice is harmless, missing one is not
+        known = {c.pk for c in categories}
+        changes = [change for change in AriChange.objects.filter(
+            changed_at__gte=min(stamps), start_date__lt=end_date, end_date__gt=start_date,
+        ).values_list('category_id', 'start_date', 'end_date', 'changed_at') if change[0] in known]
+
+    if since is None:
+        wanted = {c.pk: [(start_date, end_date)] for c in categories}
+    else:
+        wanted = defaultdict(list)
+        for category_id, start, end, changed_at in changes:
+            if changed_at >= since:
+                wanted[category_id].append((max(start, start_date), min(end, end_date)))
+        wanted = {pk: _merge(ranges) for pk, ranges in wanted.items()}
+
+    stale = set()
+    for category_id, ranges in wanted.items():
+        for start, end in ranges:
+            for month in _months(start, end):
+                if (category_id, month) not in slices:
+                    stale.add((category_id, month))
+    for category_id, start, end, changed_at in changes:
+        for month in _months(max(start, start_date), min(end, end_date)):
+            cached = slices.get((category_id, month))
+            if cached is not None and changed_at >= cached[0]:
+                stale.add((category_id, month))
+    if stale:
+        fresh = _compute(categories, stale)
+        slices.update(fresh)
+        cache.set_many({cache_key(*key): value for key, value in fresh.items()}, settings.ARI_CACHE_TIMEOUT)
+
+    result = []
+    for category in categories:
+        if category.pk in wanted:
+            result.append({
+                'id': category.pk,
+                'name': category.name,
+                'ranges': list(_runs(slices, category.pk, wanted[category.pk])),
+            })
+    return {
+        'generated_at': generated_at.isoformat(),
+        'since': since.isoformat() if since else None,
+        'start_date': start_date.isoformat(),
+        'end_date': (end_date - ONE_DAY).isoformat(),
+        'categories': result,
+    }
+
+
+def _runs(slices, category_id, ranges):
+    # Collapse consecutive nights with equal cells into one range
+    for start, end in ranges:
+        run_start, run_cell = None, None
+        day = start
+        while day < end:
+            cell = slices[category_id, _month(day)][1][day.day - 1]
+            if cell != run_cell:
+                if run_cell is not None:
+                    yield _range(run_start, day, run_cell)
+                run_start, run_cell = day, cell
+            day += ONE_DAY
+        if run_cell is not None:
+            yield _range(run_start, end, run_cell)
+
+
+def _range(start, end, cell):
+    available, rate, closed = cell
+    return {
+        'start_date': start.isoformat(),
+        'end_date': (end - ONE_DAY).isoformat(),
+        'available': available,
+        'rate': str(rate),
+        'closed': closed,
+    }
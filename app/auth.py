@@ -0,0 +1,49 @@
+# auth.py
+#
+# Authentication backend with a cached user lookup. Django loads the signed-in
+# User on every request (ModelBackend.get_user, one query); this backend keeps
+# the row in the AUTH_USER_CACHE_ALIAS cache for AUTH_USER_CACHE_TIMEOUT
+# seconds. Together with cached_db sessions an authenticated page makes no
+# session or user queries once both are warm.
+#
+# The entry is dropped whenever the user is saved or deleted (signals.py), so
+# a password change, deactivation or role change takes effect immediately in
+# this process, and in every process when the cache is shared.
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate(user_id):
+    user_cache().delete(cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        cache = user_cache()
+        user = cache.get(cache_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(cache_key(user_id), user, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        cache = user_cache()
+        user = await cache.aget(cache_key(user_id))
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(cache_key(user_id), user, settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,96 @@
+# availability.py
+#
+# "Which categories can I book for these dates?" answered with a fixed number
+# of queries: the categories and one grouped aggregate over the inventory
+# ledger, plus three for the pricing rules of categories whose compiled rules
+# are not cached (see pricing.py). asearch() runs the same queries through the
+# async ORM for the async view.
+
+from math import ceil
+
+from django.db.models import F, Min
+
+from .models import Category, RoomInventory
+from .pricing import PriceIndex, quote
+
+
+class Availability:
+    def __init__(self, category, rooms_left, rooms_needed, quote):
+        self.category = category
+        self.rooms_left = rooms_left
+        self.rooms_needed = rooms_needed
+        self.quote = quote
+
+    def as_dict(self):
+        return {
+            'id': self.category.pk,
+            'name': self.category.name,
+            'max_guests': self.category.max_guests,
+            'rooms_left': self.rooms_left,
+            'rooms_needed': self.rooms_needed,
+            'quote': self.quote.as_dict(),
+        }
+
+
+def _tightest_nights(categories, start_date, end_date):
+    return RoomInventory.objects.filter(
+        category_id__in=[c.pk for c in categories], date__gte=start_date, date__lt=end_date
+    ).values('category').annotate(left=Min(F('capacity') - F('sold'))).values_list('category', 'left')
+
+
+def rooms_left_by_category(categories, start_date, end_date):
+    """Tightest night of the stay for every category, from one grouped query."""
+    return _rooms_left(categories, dict(_tightest_nights(categories, start_date, end_date)))
+
+
+def _rooms_left(categories, tightest):
+    left = {}
+    for category in categories:
+        rooms = category.number_of_rooms
+        if category.pk in tightest:
+            rooms = max(0, min(rooms, tightest[category.pk]))
+        left[category.pk] = rooms
+    return left
+
+
+def _bookable_categories():
+    return (
+        Category.objects.filter(is_available=True, number_of_rooms__gt=0)
+        .only('name', 'price_per_night', 'number_of_rooms', 'max_guests')
+        .order_by('pk')
+    )
+
+
+def search(start_date, end_date, guests=1):
+    """Bookable categories for the stay, cheapest total first."""
+    categories = list(_bookable_categories())
+    if not categories:
+        return []
+
+    left = rooms_left_by_category(categories, start_date, end_date)
+    indexes = PriceIndex.for_categories(categories)
+    return _rank(categories, left, indexes, start_date, end_date, guests)
+
+
+async def asearch(start_date, end_date, guests=1):
+    categories = [category async for category in _bookable_categories()]
+    if not categories:
+        return []
+
+    tightest = {pk: rooms async for pk, rooms in _tightest_nights(categories, start_date, end_date)}
+    left = _rooms_left(categories, tightest)
+    indexes = await PriceIndex.afor_categories(categories)
+    return _rank(categories, left, indexes, start_date, end_date, guests)
+
+
+def _rank(categories, left, indexes, start_date, end_date, guests):
+    results = []
+    for category in categories:
+        rooms_needed = ceil(guests / max(category.max_guests, 1))
+        if left[category.pk] < rooms_needed:
+            continue
+        stay = quote(category, start_date, end_date, index=indexes[category.pk])
+        results.append(Availability(category, left[category.pk], rooms_needed, stay))
+
+    results.sort(key=lambda a: (a.quote.total * a.rooms_needed, a.category.pk))
+    return results
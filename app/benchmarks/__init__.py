@@ -0,0 +1,74 @@
+# benchmarks
+#
+# Shared helpers for the bench_* management commands. Benchmarks seed their
+# own data inside a transaction that is always rolled back, so they can be run
+# against the real database without leaving anything behind.
+
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def scratch_data(using='default'):
+    """Run the block in a transaction that is rolled back on exit."""
+    try:
+        with transaction.atomic(using=using):
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def bench_client(**defaults):
+    """Test client that passes the DEBUG host check outside the test runner."""
+    defaults.setdefault('HTTP_HOST', 'localhost')
+    return Client(**defaults)
+
+
+def count_queries(func, using='default'):
+    """Call ``func`` once and return (result, number of SQL queries)."""
+    # The query log is capped (9000 entries); once full, a capture over it counts nothing
+    connections[using].queries_log.clear()
+    with CaptureQueriesContext(connections[using]) as ctx:
+        result = func()
+    return result, len(ctx.captured_queries)
+
+
+def time_calls(func, repeat):
+    """Call ``func`` ``repeat`` times and return the per-call durations in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize(timings):
+    """p50/p95/p99/mean in milliseconds plus calls per second."""
+    total = sum(timings)
+    return {
+        'calls': len(timings),
+        'mean_ms': statistics.fmean(timings) * 1000 if timings else 0.0,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'per_second': len(timings) / total if total else 0.0,
+    }
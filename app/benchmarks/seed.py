@@ -0,0 +1,109 @@
+# benchmarks/seed.py
+#
+# Synthetic dataset generator. Everything is written with bulk_create and
+# every name starts with SYNTHETIC_PREFIX so the data can be removed again.
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from app import reports
+from app.inventory import rebuild
+from app.models import Booking, Category, Payment, Photo, SeasonalPricing, TouristLocation, User
+from app.pricing import PriceIndex
+
+SYNTHETIC_PREFIX = 'synthetic-'
+
+
+def seed(users=1000, categories=10, seasons=6, bookings=10000, payments=0.8, photos=20, locations=10,
+         password='synthetic', batch_size=5000, rng=None):
+    """
+    Create a synthetic dataset and return a dict of row counts.
+
+    ``payments`` is the fraction of bookings that get a payment row.
+    Every user shares one password hash so seeding does not pay PBKDF2 per user.
+    """
+    rng = rng or random.Random(42)
+    today = timezone.now().date()
+    password_hash = make_password(password)
+
+    customers = User.objects.bulk_create(
+        (User(username=f'{SYNTHETIC_PREFIX}user-{i}', email=f'user{i}@example.com',
+              password=password_hash, role='customer') for i in range(users)),
+        batch_size=batch_size,
+    )
+    User.objects.create(username=f'{SYNTHETIC_PREFIX}admin', email='admin@example.com',
+                        password=password_hash, role='admin', is_staff=True)
+
+    rooms = Category.objects.bulk_create(
+        Category(name=f'{SYNTHETIC_PREFIX}room-{i}', description='Synthetic room category',
+                 price_per_night=Decimal(1500 + 250 * (i % 8)), number_of_rooms=rng.randint(5, 40),
+                 max_guests=rng.randint(1, 4), free_wifi=True, hot_water=bool(i % 2))
+        for i in range(categories)
+    )
+
+    # Non-overlapping seasons spread over the next year
+    SeasonalPricing.objects.bulk_create(
+        SeasonalPricing(category=room,
+                        start_date=today + timedelta(days=60 * s),
+                        end_date=today + timedelta(days=60 * s + rng.randint(7, 30)),
+                        price_per_night=room.price_per_night * Decimal('1.25'))
+        for room in rooms for s in range(seasons)
+    )
+
+    indexes = PriceIndex.for_categories(rooms)
+
+    def generate_bookings():
+        for _ in range(bookings):
+            start = today + timedelta(days=rng.randint(-365, 365))
+            end = start + timedelta(days=rng.randint(1, 7))
+            room = rng.choice(rooms)
+            yield Booking(customer=rng.choice(customers), Category=room, start_date=start, end_date=end,
+                          _total_price=indexes[room.pk].total(start, end))
+
+    created = Booking.objects.bulk_create(generate_bookings(), batch_size=batch_size)
+    for room in rooms:
+        rebuild(room)
+    booking_ids = [b.pk for b in created if b.pk is not None] or list(
+        Booking.objects.filter(customer__username__startswith=SYNTHETIC_PREFIX).values_list('pk', flat=True)
+    )
+
+    paid = [pk for pk in booking_ids if rng.random() < payments]
+    Payment.objects.bulk_create(
+        (Payment(booking_id=pk, amount=Decimal(1500), transaction_id=f'{SYNTHETIC_PREFIX}txn-{pk}',
+                 status=rng.choice(('completed',) * 8 + ('pending', 'failed'))) for pk in paid),
+        batch_size=batch_size,
+    )
+    # bulk_create skips the signals that keep the report rows current
+    reports.rebuild(batch_size=batch_size)
+
+    Photo.objects.bulk_create(
+        Photo(image=f'photos/{SYNTHETIC_PREFIX}{i}.jpg', caption=f'{SYNTHETIC_PREFIX}photo-{i}') for i in range(photos)
+    )
+    TouristLocation.objects.bulk_create(
+        TouristLocation(name=f'{SYNTHETIC_PREFIX}place-{i}', description='Synthetic tourist location',
+                        distance_from_home_stay=Decimal(rng.randint(1, 400)) / 10) for i in range(locations)
+    )
+
+    return {
+        'users': users + 1,
+        'categories': categories,
+        'seasonal_prices': categories * seasons,
+        'bookings': len(booking_ids),
+        'payments': len(paid),
+        'photos': photos,
+        'tourist_locations': locations,
+    }
+
+
+def clear():
+    """Delete everything seed() created."""
+    Payment.objects.filter(transaction_id__startswith=SYNTHETIC_PREFIX).delete()
+    Booking.objects.filter(customer__username__startswith=SYNTHETIC_PREFIX).delete()
+    Category.objects.filter(name__startswith=SYNTHETIC_PREFIX).delete()
+    User.objects.filter(username__startswith=SYNTHETIC_PREFIX).delete()
+    Photo.objects.filter(caption__startswith=SYNTHETIC_PREFIX).delete()
+    TouristLocation.objects.filter(name__startswith=SYNTHETIC_PREFIX).delete()
@@ -0,0 +1,136 @@
+# benchmarks/suite.py
+#
+# Endpoint benchmarks for the booking flow, driven through the Django test
+# client. Each scenario reports latency percentiles, throughput and the SQL
+# queries per request; results are written as JSON so runs on different
+# commits can be compared.
+
+import json
+import platform
+import subprocess
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.models import Category, User
+
+from . import bench_client, summarize
+from .seed import SYNTHETIC_PREFIX
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Scenario:
+    def __init__(self, name, request):
+        self.name = name
+        self.request = request  # callable(iteration) -> response
+
+    def run(self, requests, warmup=3):
+        for i in range(warmup):
+            self.request(i)
+
+        timings = []
+        queries = 0
+        statuses = set()
+        with CaptureQueriesContext(connection) as ctx:
+            for i in range(warmup, warmup + requests):
+                started = time.perf_counter()
+                response = self.request(i)
+                timings.append(time.perf_counter() - started)
+                statuses.add(response.status_code)
+            queries = len(ctx.captured_queries)
+
+        result = summarize(timings)
+        result['queries_per_request'] = round(queries / requests, 2)
+        result['status_codes'] = sorted(statuses)
+        return result
+
+
+def scenarios():
+    """The key endpoints of the booking flow, against the synthetic dataset."""
+    customer = User.objects.filter(username__startswith=f'{SYNTHETIC_PREFIX}user-').order_by('pk').first()
+    admin = User.objects.get(username=f'{SYNTHETIC_PREFIX}admin')
+    category = Category.objects.filter(name__startswith=SYNTHETIC_PREFIX).order_by('pk').first()
+    # Plenty of rooms so the POST scenario measures successful bookings, not sold-out errors
+    Category.objects.filter(pk=category.pk).update(number_of_rooms=100_000)
+    category.refresh_from_db()
+
+    anonymous = bench_client()
+    customer_client = bench_client()
+    customer_client.force_login(customer)
+    admin_client = bench_client()
+    admin_client.force_login(admin)
+
+    booking_url = reverse('booking_add', args=[category.pk])
+    first_night = timezone.now().date() + timedelta(days=400)
+
+    def post_booking(i):
+        start = first_night + timedelta(days=i % 300)
+        return customer_client.post(booking_url, {
+            'Category': category.pk, 'start_date': start, 'end_date': start + timedelta(days=3),
+            'name': 'Bench Guest', 'email': 'bench@example.com', 'phone_number': '9999999999',
+            'payment_method': 'cash', 'number_of_guests': 2,
+        })
+
+    return [
+        Scenario('index', lambda i: anonymous.get(reverse('index'))),
+        Scenario('booking_add GET', lambda i: customer_client.get(booking_url)),
+        Scenario('booking_add POST', post_booking),
+        Scenario('booking_list', lambda i: customer_client.get(reverse('booking_list'))),
+        Scenario('admin_reservations', lambda i: admin_client.get(reverse('admin_reservations'))),
+        Scenario('seasonalpricing_list', lambda i: admin_client.get(reverse('seasonalpricing_list'))),
+    ]
+
+
+def run_suite(requests=200, dataset=None, only=None):
+    results = {}
+    # The suite measures the views, not the rate limiter that would start answering 429
+    with override_settings(RATELIMIT_ENABLED=False):
+        for scenario in scenarios():
+            if only and scenario.name not in only:
+                continue
+            results[scenario.name] = scenario.run(requests)
+    return {
+        'commit': _git_commit(),
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'requests_per_scenario': requests,
+        'dataset': dataset or {},
+        'results': results,
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+
+
+def compare(report, baseline_path):
+    """(scenario, metric, before, after, change %) rows against an earlier report."""
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    rows = []
+    for name, after in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+            old, new = before.get(metric), after.get(metric)
+            if old:
+                rows.append((name, metric, old, new, (new - old) / old * 100))
+    return rows
@@ -0,0 +1,34 @@
+# caching.py
+#
+# Content-versioned caching. The homepage fragment is cached under a version
+# number that is bumped whenever a Category, Photo or TouristLocation changes
+# (see signals.py), so stale entries are never read again and simply expire.
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+HOMEPAGE_VERSION_KEY = 'homepage:version'
+
+
+def homepage_cache():
+    return caches[getattr(settings, 'HOMEPAGE_CACHE_ALIAS', 'default')]
+
+
+def homepage_version():
+    # Seed from the clock so a flushed cache never reuses an old version
+    return homepage_cache().get_or_set(HOMEPAGE_VERSION_KEY, int(time.time()), timeout=None)
+
+
+async def ahomepage_version():
+    return await homepage_cache().aget_or_set(HOMEPAGE_VERSION_KEY, int(time.time()), timeout=None)
+
+
+def bump_homepage_version():
+    cache = homepage_cache()
+    try:
+        cache.incr(HOMEPAGE_VERSION_KEY)
+    except ValueError:
+        # Key missing (evicted or never read): start a fresh version
+        cache.set(HOMEPAGE_VERSION_KEY, int(time.time()), timeout=None)
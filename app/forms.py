@@ -1,8 +1,26 @@
 # forms.py
 
 from django import forms
+from django.conf import settings
 from .models import *
 from django.utils import timezone
+from datetime import timedelta
+from .jobs import enqueue
+from .transfer import FORMATS, RESOURCES
+
+
+class DerivativeImagesMixin:
+    # Image fields whose resized variants are generated in the background when a new file is uploaded
+    derivative_fields = ('image',)
+
+    def save(self, commit=True):
+        instance = super().save(commit=commit)
+        if commit:
+            for field_name in self.derivative_fields:
+                image = getattr(instance, field_name)
+                if field_name in self.changed_data and image:
+                    enqueue('generate_derivatives', name=image.name)
+        return instance
 
 class CustomerRegistrationForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput)
@@ -22,11 +40,11 @@ class CustomerRegistrationForm(forms.ModelForm):
         return cleaned_data
 
 
-class CategoryForm(forms.ModelForm):
+class CategoryForm(DerivativeImagesMixin, forms.ModelForm):
     class Meta:
         model = Category
         fields = [
-            'name', 'description', 'price_per_night', 'number_of_rooms', 
+            'name', 'description', 'price_per_night', 'number_of_rooms', 'max_guests',
             'is_available', 'image', 'free_wifi', 'hot_water', 
             'swimming_pool', 'kitchen', 'parking_area', 'is_ac', 'is_non_ac'
         ]
@@ -35,6 +53,7 @@ class CategoryForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Enter description'}),
             'price_per_night': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter price per night'}),
             'number_of_rooms': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Enter number of rooms'}),
+            'max_guests': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Guests per room'}),
             'image': forms.ClearableFileInput(attrs={'class': 'form-control'}),
             'is_available': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'free_wifi': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
@@ -57,14 +76,54 @@ class CategoryForm(forms.ModelForm):
 class SeasonalPricingForm(forms.ModelForm):
     class Meta:
         model = SeasonalPricing
-        fields = ['category', 'start_date', 'end_date', 'price_per_night']
+        fields = ['category', 'start_date', 'end_date', 'price_per_night', 'priority']
         
         widgets={
            'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'end_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         }
+        help_texts = {'priority': "Where seasons overlap, the one with the highest priority sets the price."}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        category = cleaned_data.get('category')
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            raise forms.ValidationError("End date must not be before the start date.")
+
+        # Overlapping seasons are fine as long as the priority says which one applies
+        if category and start_date and end_date:
+            clash = SeasonalPricing.objects.filter(
+                category=category, priority=cleaned_data.get('priority') or 0,
+                start_date__lte=end_date, end_date__gte=start_date,
+            ).exclude(pk=self.instance.pk).first()
+            if clash:
+                raise forms.ValidationError(
+                    f"Overlaps the season from {clash.start_date} to {clash.end_date} with the same priority. "
+                    "Change the dates or give one of them a higher priority."
+                )
+        return cleaned_data
+
+
+# Weekday rates and length-of-stay discounts of one category, edited together
+DayOfWeekRateFormSet = forms.inlineformset_factory(
+    Category, DayOfWeekRate, fields=['weekday', 'adjustment_percent'], extra=1, can_delete=True,
+    widgets={
+        'weekday': forms.Select(attrs={'class': 'form-select'}),
+        'adjustment_percent': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '% (e.g. 20 or -10)'}),
+    },
+)
 
-class TouristLocationForm(forms.ModelForm):
+LengthOfStayDiscountFormSet = forms.inlineformset_factory(
+    Category, LengthOfStayDiscount, fields=['min_nights', 'discount_percent'], extra=1, can_delete=True,
+    widgets={
+        'min_nights': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Minimum nights'}),
+        'discount_percent': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': '% off'}),
+    },
+)
+
+class TouristLocationForm(DerivativeImagesMixin, forms.ModelForm):
     class Meta:
         model = TouristLocation
         fields = ['name', 'description', 'distance_from_home_stay', 'image', 'link']
@@ -77,20 +136,21 @@ class TouristLocationForm(forms.ModelForm):
         }
         
         
-class PhotoForm(forms.ModelForm):
+class PhotoForm(DerivativeImagesMixin, forms.ModelForm):
     class Meta:
         model = Photo
         fields = ['image', 'caption']  # Fields to include in the form
         
 
-class BookingForm(forms.ModelForm):
-    # Non-DB Fields
-    name = forms.CharField(max_length=100, label="Full Name")
-    email = forms.EmailField(label="Email Address")
-    phone_number = forms.CharField(max_length=15, label="Phone Number")
+# Guest and payment details asked for at checkout (not stored on the booking)
+class GuestDetailsForm(forms.Form):
+    name = forms.CharField(max_length=100, label="Full Name", widget=forms.TextInput(attrs={'class': 'form-control'}))
+    email = forms.EmailField(label="Email Address", widget=forms.EmailInput(attrs={'class': 'form-control'}))
+    phone_number = forms.CharField(max_length=15, label="Phone Number",
+                                   widget=forms.TextInput(attrs={'class': 'form-control'}))
     special_requests = forms.CharField(
         required=False, 
-        widget=forms.Textarea(attrs={'rows': 3, 'placeholder': 'Any special requests...'}),
+        widget=forms.Textarea(attrs={'rows': 3, 'placeholder': 'Any special requests...', 'class': 'form-control'}),
         label="Special Requests"
     )
     payment_method = forms.ChoiceField(
@@ -100,10 +160,14 @@ class BookingForm(forms.ModelForm):
             ('debit_card','Debit Card'),
             ('cash','Cash')
         ],
-        label="Payment Method"
+        label="Payment Method",
+        widget=forms.Select(attrs={'class': 'form-select'})
     )
-    number_of_guests = forms.IntegerField(min_value=1, label="Number of Guests")
+    number_of_guests = forms.IntegerField(min_value=1, label="Number of Guests",
+                                          widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
 
+class BookingForm(GuestDetailsForm, forms.ModelForm):
     class Meta:
         model = Booking
         fields = ['Category', 'start_date', 'end_date']  # Fields to save in DB
@@ -113,9 +177,17 @@ class BookingForm(forms.ModelForm):
             'end_date': forms.DateInput(attrs={'type': 'date'}),
         }
 
+    def __init__(self, *args, category=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.category = category
+        if category is not None:
+            # Category given by the view (from the URL): no lookup or validation of a posted one
+            del self.fields['Category']
+            self.instance.Category = category
+
     def clean(self):
         cleaned_data = super().clean()
-        category = cleaned_data.get('Category')
+        category = self.category or cleaned_data.get('Category')
         start_date = cleaned_data.get('start_date')
         end_date = cleaned_data.get('end_date')
 
@@ -132,4 +204,125 @@ class BookingForm(forms.ModelForm):
         if category and not category.is_available:
             raise forms.ValidationError(f"The '{category.name}' category is currently unavailable.")
 
-        return cleaned_data
\ No newline at end of file
+        return cleaned_data
+
+
+# Dates for a booking hold; the category comes from the URL
+class BookingHoldForm(forms.ModelForm):
+    class Meta:
+        model = BookingHold
+        fields = ['start_date', 'end_date']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date:
+            if start_date < timezone.now().date():
+                raise forms.ValidationError("Start date cannot be in the past.")
+            if end_date <= start_date:
+                raise forms.ValidationError("End date must be after the start date.")
+        return cleaned_data
+
+
+# Check-in and check-out of a future stay, shared by the availability search and the quote API
+class StayDatesForm(forms.Form):
+    start_date = forms.DateField()
+    end_date = forms.DateField()
+
+    verb = 'searched'  # "Stays longer than a year cannot be ..."
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date:
+            if start_date < timezone.now().date():
+                raise forms.ValidationError("Start date cannot be in the past.")
+            if end_date <= start_date:
+                raise forms.ValidationError("End date must be after the start date.")
+            if (end_date - start_date).days > 365:
+                raise forms.ValidationError(f"Stays longer than a year cannot be {self.verb}.")
+        return cleaned_data
+
+
+class AvailabilitySearchForm(StayDatesForm):
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    guests = forms.IntegerField(min_value=1, initial=1, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+
+# Stay dates for a price quote (API)
+class QuoteForm(StayDatesForm):
+    verb = 'quoted'
+
+
+# Horizon of the ARI feed, and optionally only what changed since a previous response
+class AriFeedForm(forms.Form):
+    start_date = forms.DateField(required=False)
+    days = forms.IntegerField(required=False, min_value=1)
+    since = forms.DateTimeField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['start_date'] = cleaned_data.get('start_date') or timezone.localdate()
+        cleaned_data['days'] = cleaned_data.get('days') or settings.ARI_DEFAULT_DAYS
+        if cleaned_data['days'] > settings.ARI_MAX_DAYS:
+            raise forms.ValidationError(f"The feed covers at most {settings.ARI_MAX_DAYS} nights.")
+        return cleaned_data
+
+
+class ReservationFilterForm(forms.Form):
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.only('name').order_by('name'), required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    customer = forms.CharField(
+        required=False, widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Username'})
+    )
+
+    def filter(self, queryset):
+        """Apply the cleaned filters to a Booking queryset."""
+        data = self.cleaned_data
+        # Bookings that overlap the selected date range
+        if data.get('start_date'):
+            queryset = queryset.filter(end_date__gt=data['start_date'])
+        if data.get('end_date'):
+            queryset = queryset.filter(start_date__lt=data['end_date'])
+        if data.get('category'):
+            queryset = queryset.filter(Category=data['category'])
+        if data.get('customer'):
+            queryset = queryset.filter(customer__username=data['customer'])
+        return queryset
+
+
+class ReportFilterForm(forms.Form):
+    start_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.only('name').order_by('name'), required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Default to the last 30 days and the next 30 days on the books
+        today = timezone.now().date()
+        cleaned_data['start_date'] = cleaned_data.get('start_date') or today - timedelta(days=30)
+        cleaned_data['end_date'] = cleaned_data.get('end_date') or today + timedelta(days=30)
+        if cleaned_data['end_date'] < cleaned_data['start_date']:
+            raise forms.ValidationError("End date must not be before the start date.")
+        if (cleaned_data['end_date'] - cleaned_data['start_date']).days > 3660:
+            raise forms.ValidationError("Reports cover at most ten years.")
+        return cleaned_data
+
+
+class DataImportForm(forms.Form):
+    resource = forms.ChoiceField(choices=[(name, name.replace('_', ' ').title()) for name in RESOURCES],
+                                 widget=forms.Select(attrs={'class': 'form-select'}))
+    format = forms.ChoiceField(choices=[(fmt, fmt.upper()) for fmt in FORMATS],
+                               widget=forms.Select(attrs={'class': 'form-select'}))
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control'}))
+    dry_run = forms.BooleanField(required=False, help_text="Validate only, write nothing")
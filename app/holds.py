@@ -0,0 +1,142 @@
+# holds.py
+#
+# Short-lived booking holds. place() claims the rooms in the inventory ledger
+# straight away, so a hold counts against availability exactly like a booking,
+# and records a BookingHold that expires after BOOKING_HOLD_TTL seconds.
+# confirm() turns the hold into a Booking without touching the ledger again:
+# the held rooms simply become the booking's.
+#
+# Expired holds are given back by sweep(), oldest first, in batches: one
+# DELETE per hold and a few grouped ledger UPDATEs per batch. It runs on a background
+# thread (start_sweeper), from `manage.py sweep_holds`, and for a single
+# category right before a new hold is placed there, so a room abandoned in
+# checkout is back on sale as soon as someone else asks for it.
+#
+# Whoever deletes the hold row first wins: confirm() and sweep() both delete
+# before they act, so a hold is either booked or released, never both.
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .inventory import release, release_nights, reserve, stay_dates
+from .models import BookingHold
+from .pricing import quote
+
+logger = logging.getLogger(__name__)
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+class HoldExpired(Exception):
+    pass
+
+
+class TooManyHolds(Exception):
+    pass
+
+
+def place(customer, category, start_date, end_date, ttl=None):
+    """Hold a room on every night of the stay for ``ttl`` seconds, or raise RoomsUnavailable."""
+    sweep(category=category)
+    ttl = settings.BOOKING_HOLD_TTL if ttl is None else ttl
+    now = timezone.now()
+    with transaction.atomic():
+        limit = settings.BOOKING_HOLD_MAX_PER_CUSTOMER
+        if limit and BookingHold.objects.filter(customer=customer, expires_at__gt=now).count() >= limit:
+            raise TooManyHolds(f"You can hold at most {limit} stays at a time.")
+        reserve(category, start_date, end_date)
+        hold = BookingHold.objects.create(
+            customer=customer, category=category, start_date=start_date, end_date=end_date,
+            total_price=quote(category, start_date, end_date).total, expires_at=now + timedelta(seconds=ttl),
+        )
+    start_sweeper()
+    return hold
+
+
+def confirm(hold, booking):
+    """Save ``booking`` for the held stay at the held price, or raise HoldExpired."""
+    with transaction.atomic():
+        claimed, _ = BookingHold.objects.filter(pk=hold.pk, expires_at__gt=timezone.now()).delete()
+        if not claimed:
+            raise HoldExpired("Your hold on this room has expired.")
+        booking.customer_id = hold.customer_id
+        booking.Category_id = hold.category_id
+        booking.start_date = hold.start_date
+        booking.end_date = hold.end_date
+        booking.total_price = hold.total_price
+        booking.save()
+    return booking
+
+
+def cancel(hold):
+    """Give the held rooms back now instead of waiting for the hold to expire."""
+    with transaction.atomic():
+        deleted, _ = BookingHold.objects.filter(pk=hold.pk).delete()
+        if deleted:
+            release(hold.category_id, hold.start_date, hold.end_date)
+
+
+def sweep(now=None, category=None, batch_size=500):
+    """Delete expired holds and release their rooms; returns how many holds were released."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = BookingHold.objects.filter(expires_at__lte=now)
+            if category is not None:
+                expired = expired.filter(category=category)
+            # Another sweeper (or a confirm) holding a row lock keeps it
+            batch = list(
+                expired.order_by('expires_at').select_for_update(skip_locked=True)
+                .values_list('pk', 'category_id', 'start_date', 'end_date')[:batch_size]
+            )
+            if not batch:
+                break
+            # skip_locked is a no-op on SQLite: a confirm may have taken a hold since
+            # the SELECT, so only the holds this sweep deletes give their rooms back
+            nights = Counter()
+            for pk, category_id, start_date, end_date in batch:
+                deleted, _ = BookingHold.objects.filter(pk=pk).delete()
+                if deleted:
+                    released += 1
+                    for night in stay_dates(start_date, end_date):
+                        nights[category_id, night] += 1
+            release_nights(nights)
+        if len(batch) < batch_size:
+            break
+    return released
+
+
+def start_sweeper(interval=None):
+    """Start the background sweeper thread, once per process."""
+    global _sweeper
+    interval = settings.BOOKING_HOLD_SWEEP_INTERVAL if interval is None else interval
+    if not interval:
+        return None
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(target=_sweep_forever, args=(interval,), name='hold-sweeper', daemon=True)
+            _sweeper.start()
+        return _sweeper
+
+
+def _sweep_forever(interval):
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            released = sweep()
+            if released:
+                logger.info("Released %s expired booking holds", released)
+        except Exception:
+            logger.exception("Booking hold sweep failed")
+        finally:
+            close_old_connections()
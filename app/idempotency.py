@@ -0,0 +1,109 @@
+# idempotency.py
+#
+# Idempotency keys for form and API submissions that create bookings. The
+# client sends a key (the hidden ``idempotency_key`` form field, or an
+# Idempotency-Key header) that stays the same across retries of one
+# submission. The first request to finish records the key, under a unique
+# constraint, together with its response; a retry replays that response
+# before any pricing or inventory work is done.
+#
+# The key row is inserted at the start of the transaction that writes the
+# booking. A concurrent duplicate therefore waits on the unique index (or on
+# the SQLite write lock) until the first request commits, fails with an
+# IntegrityError, rolls back, and replays the recorded response. A request
+# that fails leaves no row behind, so its retry runs again.
+
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+FIELD_NAME = 'idempotency_key'
+HEADER_NAME = 'Idempotency-Key'
+IGNORED_FIELDS = {'csrfmiddlewaretoken', FIELD_NAME}
+
+
+class DuplicateRequest(Exception):
+    pass
+
+
+def new_key():
+    """A fresh key to embed in a form."""
+    return uuid.uuid4().hex
+
+
+def fingerprint(request):
+    digest = hashlib.sha256(request.path.encode())
+    for name in sorted(set(request.POST) - IGNORED_FIELDS):
+        for value in request.POST.getlist(name):
+            digest.update(f'\0{name}={value}'.encode())
+    return digest.hexdigest()
+
+
+class IdempotentRequest:
+    """
+    The idempotency key of one POST. Without a key every method is a no-op,
+    so callers do not need a separate code path for clients that send none.
+    """
+
+    def __init__(self, request, scope):
+        key = request.headers.get(HEADER_NAME) or request.POST.get(FIELD_NAME) or ''
+        self.key = key.strip()[:64] or None
+        self.user = request.user
+        self.scope = scope
+        self.fingerprint = fingerprint(request) if self.key else None
+        self.record = None
+
+    def replay(self):
+        """The response recorded for this key, or None if the request has not been handled yet."""
+        if not self.key:
+            return None
+        record = IdempotencyKey.objects.filter(user=self.user, scope=self.scope, key=self.key).first()
+        if record is None:
+            return None
+        if record.fingerprint != self.fingerprint:
+            return HttpResponse("This idempotency key was already used for a different request.", status=422)
+        if not record.response_status:
+            return HttpResponse("This request is still being processed.", status=409)
+        if record.response_location:
+            response = HttpResponseRedirect(record.response_location)
+            response.status_code = record.response_status
+        else:
+            response = HttpResponse(status=record.response_status)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def claim(self):
+        """Record the key inside the caller's transaction; raises DuplicateRequest if another request did first."""
+        if not self.key:
+            return
+        try:
+            with transaction.atomic():
+                self.record = IdempotencyKey.objects.create(
+                    user=self.user, scope=self.scope, key=self.key, fingerprint=self.fingerprint
+                )
+        except IntegrityError:
+            raise DuplicateRequest(self.key)
+
+    def complete(self, response, booking=None):
+        """Store the response to replay; call before the caller's transaction commits."""
+        if self.record is None:
+            return response
+        self.record.response_status = response.status_code
+        self.record.response_location = response.get('Location', '')
+        self.record.booking = booking
+        self.record.save(update_fields=['response_status', 'response_location', 'booking'])
+        return response
+
+
+def purge(older_than=None):
+    """Delete keys older than IDEMPOTENCY_KEY_TTL seconds; returns how many were deleted."""
+    older_than = older_than or timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+    return deleted
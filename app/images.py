@@ -0,0 +1,117 @@
+# images.py
+#
+# Resized derivatives of uploaded images. For every upload we write a JPEG
+# (and optionally a WebP) at a few fixed widths next to the original, e.g.
+# photos/IMG_4070.JPG -> photos/IMG_4070.JPG.w640.jpg, .JPG.w640.webp. The
+# whole upload name is kept, so IMG.jpg and IMG.png get different files.
+# Upload names are never reused by the storage, so derivative names are
+# stable for the lifetime of the file.
+#
+# The variants written are recorded on the rows that own the upload (their
+# image_derivatives field), so rendering a srcset never touches the storage.
+
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Category, Photo, TouristLocation
+
+# Models with an ``image`` upload and its ``image_derivatives`` record
+IMAGE_MODELS = (Category, Photo, TouristLocation)
+
+DERIVATIVE_RE = re.compile(r'\.w\d+\.(jpg|webp)$')
+
+
+def derivative_widths():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1280)))
+
+
+def webp_enabled():
+    return getattr(settings, 'IMAGE_DERIVATIVE_WEBP', True)
+
+
+def is_derivative(name):
+    return bool(DERIVATIVE_RE.search(name))
+
+
+def derivative_name(name, width, fmt='jpg'):
+    return f"{name}.w{width}.{fmt}"
+
+
+def derivative_names(name):
+    """Every derivative that may exist for ``name``, as (width, fmt, name)."""
+    formats = ('jpg', 'webp') if webp_enabled() else ('jpg',)
+    return [(width, fmt, derivative_name(name, width, fmt)) for width in derivative_widths() for fmt in formats]
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=75, method=4)
+    else:
+        # No exif= argument, so camera metadata is stripped from derivatives
+        image.save(buffer, 'JPEG', quality=80, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=None, force=False):
+    """
+    Write the resized variants of ``name``. Returns the variants now present,
+    as [width, fmt, name] for record_derivatives(), and the names written.
+    """
+    storage = storage or default_storage
+    variants = []
+    written = []
+
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        # Let the JPEG decoder downscale while decoding (both sides stay >= the largest width)
+        largest = max(derivative_widths())
+        original.draft('RGB', (largest, largest))
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'L'):
+            original = original.convert('RGB')
+
+        for width, fmt, target in derivative_names(name):
+            # Never upscale; small originals are already cheap to serve
+            if width >= original.width:
+                continue
+            variants.append([width, fmt, target])
+            if not force and storage.exists(target):
+                continue
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.LANCZOS)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(_encode(resized, fmt)))
+            written.append(target)
+
+    return variants, written
+
+
+def record_derivatives(name, variants):
+    """Store ``variants`` on every row whose image is ``name``; returns how many rows were updated."""
+    return sum(model.objects.filter(image=name).update(image_derivatives=variants) for model in IMAGE_MODELS)
+
+
+def delete_derivatives(variants, storage=None):
+    # Missing files are ignored by the storage
+    storage = storage or default_storage
+    for _, _, target in variants or ():
+        storage.delete(target)
+
+
+def srcset(name, variants, fmt='jpg', storage=None):
+    """``srcset`` value for the recorded ``variants`` of ``name``."""
+    storage = storage or default_storage
+    # A variant recorded for an earlier upload of the row does not match the current name
+    return ", ".join(
+        f"{storage.url(target)} {width}w"
+        for width, target_fmt, target in variants or ()
+        if target_fmt == fmt and target == derivative_name(name, width, target_fmt)
+    )
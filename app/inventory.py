@@ -0,0 +1,149 @@
+# inventory.py
+#
+# Per-night room inventory. Every (category, night) has a RoomInventory row
+# holding the capacity and the rooms already sold. A stay is reserved with a
+# single conditional UPDATE over all of its nights inside one transaction, so
+# concurrent bookings never overwrite each other's counts and a stay is either
+# claimed for every night or not at all.
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from . import ari
+from .models import Booking, BookingHold, Category, RoomInventory
+
+
+class RoomsUnavailable(Exception):
+    pass
+
+
+def stay_dates(start_date, end_date):
+    """Every night of a stay, end date exclusive."""
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days)]
+
+
+def ensure_nights(category, start_date, end_date):
+    # Missing nights start empty at the category's current capacity
+    RoomInventory.objects.bulk_create(
+        [RoomInventory(category=category, date=day, capacity=category.number_of_rooms)
+         for day in stay_dates(start_date, end_date)],
+        ignore_conflicts=True,
+    )
+
+
+def reserve(category, start_date, end_date, rooms=1):
+    """Claim ``rooms`` on every night of the stay or raise RoomsUnavailable."""
+    nights = (end_date - start_date).days
+    with transaction.atomic():
+        ensure_nights(category, start_date, end_date)
+        claimed = RoomInventory.objects.filter(
+            category=category,
+            date__gte=start_date,
+            date__lt=end_date,
+            sold__lte=F('capacity') - rooms,
+        ).update(sold=F('sold') + rooms)
+        if claimed != nights:
+            # Leaving the atomic block with an exception undoes the partial claim
+            raise RoomsUnavailable(f"No rooms available in '{category.name}' for the selected dates.")
+        ari.changed_nights(category, start_date, end_date)
+
+
+def release(category, start_date, end_date, rooms=1):
+    """Give back rooms previously claimed with reserve()."""
+    RoomInventory.objects.filter(
+        category=category,
+        date__gte=start_date,
+        date__lt=end_date,
+        sold__gte=rooms,
+    ).update(sold=F('sold') - rooms)
+    ari.changed_nights(category, start_date, end_date)
+
+
+def rooms_left(category, start_date, end_date):
+    """Rooms that can still be booked for every night of the stay."""
+    tightest = RoomInventory.objects.filter(
+        category=category, date__gte=start_date, date__lt=end_date
+    ).aggregate(left=Min(F('capacity') - F('sold')))['left']
+    # Nights without a ledger row are still fully available
+    if tightest is None:
+        return category.number_of_rooms
+    return max(0, min(tightest, category.number_of_rooms))
+
+
+def sync_capacity(category):
+    # Capacity follows Category.number_of_rooms for nights already in the ledger
+    RoomInventory.objects.filter(category=category).update(capacity=category.number_of_rooms)
+    ari.changed_category(category)
+
+
+def _by_count(counts):
+    # Nights with the same count share one UPDATE, at most 500 nights per statement
+    groups = defaultdict(list)
+    for (category_id, day), rooms in counts.items():
+        groups[category_id, rooms].append(day)
+    for (category_id, rooms), days in groups.items():
+        for start in range(0, len(days), 500):
+            yield category_id, rooms, days[start:start + 500]
+
+
+def claim(counts):
+    """
+    Claim ``counts`` ({(category_id, night): rooms}) with the same conditional
+    UPDATE as reserve(), for bookings written with bulk_create (see transfer.py),
+    or raise RoomsUnavailable. A partial claim is undone with the transaction.
+    """
+    capacities = dict(
+        Category.objects.filter(pk__in={category_id for category_id, _ in counts}).values_list('pk', 'number_of_rooms')
+    )
+    with transaction.atomic():
+        RoomInventory.objects.bulk_create(
+            (RoomInventory(category_id=category_id, date=day, capacity=capacities[category_id])
+             for category_id, day in counts),
+            ignore_conflicts=True,
+        )
+        for category_id, rooms, days in _by_count(counts):
+            claimed = RoomInventory.objects.filter(
+                category_id=category_id, date__in=days, sold__lte=F('capacity') - rooms,
+            ).update(sold=F('sold') + rooms)
+            if claimed != len(days):
+                raise RoomsUnavailable("Rooms were booked meanwhile on some of these nights.")
+        ari.changed_counts(counts)
+
+
+def release_nights(counts):
+    """Give back ``counts`` ({(category_id, night): rooms}), e.g. for a batch of expired holds."""
+    for category_id, rooms, days in _by_count(counts):
+        RoomInventory.objects.filter(category_id=category_id, date__in=days, sold__gte=rooms).update(
+            sold=F('sold') - rooms
+        )
+    ari.changed_counts(counts)
+
+
+def rebuild(category, batch_size=1000):
+    """Recreate a category's ledger from its bookings and holds; returns the per-night sold counts."""
+    sold = Counter()
+    bookings = Booking.objects.filter(Category=category).values_list('start_date', 'end_date')
+    # Unexpired holds keep their rooms (the sweeper gives back the expired ones)
+    holds = BookingHold.objects.filter(category=category, expires_at__gt=timezone.now()).values_list(
+        'start_date', 'end_date'
+    )
+    for start_date, end_date in chain(bookings.iterator(), holds.iterator()):
+        day = start_date
+        while day < end_date:
+            sold[day] += 1
+            day += timedelta(days=1)
+
+    with transaction.atomic():
+        RoomInventory.objects.filter(category=category).delete()
+        RoomInventory.objects.bulk_create(
+            (RoomInventory(category=category, date=day, capacity=category.number_of_rooms, sold=count)
+             for day, count in sorted(sold.items())),
+            batch_size=batch_size,
+        )
+        ari.changed_category(category)
+    return sold
@@ -0,0 +1,144 @@
+# jobs.py
+#
+# Lightweight in-process job queue. Work is written to the Job table and
+# handed to a thread pool once the enqueuing transaction commits, so views
+# return immediately. A worker claims a job with a conditional update and
+# holds it for JOBS_LEASE seconds; jobs left queued, or running past their
+# lease by a crashed worker, are picked up again the next time a pool starts
+# (or by ``manage.py run_jobs``).
+#
+# Settings:
+#   JOBS_EAGER    run jobs inline inside enqueue() (tests, management commands)
+#   JOBS_WORKERS  size of the thread pool
+#   JOBS_LEASE    seconds a claimed job belongs to its worker
+
+import logging
+import os
+import socket
+import threading
+import uuid
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Avg, Count, F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Recorded on every job this process claims
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def task(name):
+    """Register a function as a job task under ``name``."""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(task_name, **payload):
+    if task_name not in TASKS:
+        raise KeyError(f"Unknown job task '{task_name}'")
+    job = Job.objects.create(task=task_name, payload=payload)
+    if getattr(settings, 'JOBS_EAGER', False):
+        run_job(job.pk)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+
+def submit(job_id):
+    get_executor().submit(_run_in_worker, job_id)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'JOBS_WORKERS', 2), thread_name_prefix='job'
+            )
+            # Resume whatever a crashed process left behind
+            requeue_expired()
+            for job_id in queued_jobs():
+                _executor.submit(_run_in_worker, job_id)
+        return _executor
+
+
+def requeue_expired(now=None):
+    """Queue again the running jobs whose lease has expired; returns how many."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.JOBS_LEASE)
+    return Job.objects.filter(status='running', started_at__lt=cutoff).update(status='queued', worker='')
+
+
+def queued_jobs():
+    return list(Job.objects.filter(status='queued').order_by('pk').values_list('pk', flat=True))
+
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_job(job_id):
+    # Claim the job; a job already claimed by another worker is skipped
+    claimed = Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', started_at=timezone.now(), worker=WORKER_ID, attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return
+
+    job = Job.objects.get(pk=job_id)
+    # Only while still ours: past the lease, the job may have been requeued and claimed elsewhere
+    ours = Job.objects.filter(pk=job_id, status='running', worker=WORKER_ID)
+    try:
+        TASKS[job.task](**job.payload)
+    except Exception:
+        logger.exception("Job %s failed", job)
+        ours.update(status='failed', error=traceback.format_exc(), finished_at=timezone.now())
+    else:
+        ours.update(status='done', error=None, finished_at=timezone.now())
+
+
+def stats(window=timedelta(minutes=15)):
+    """Queue depth per status and throughput over the last ``window``."""
+    counts = dict(Job.objects.values_list('status').annotate(n=Count('pk')).values_list('status', 'n'))
+    since = timezone.now() - window
+    recent = Job.objects.filter(status='done', finished_at__gte=since)
+    finished = recent.count()
+    avg = recent.aggregate(avg=Avg(F('finished_at') - F('started_at')))['avg']
+    return {
+        'counts': {status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        'window_seconds': int(window.total_seconds()),
+        'finished_in_window': finished,
+        'jobs_per_minute': round(finished / (window.total_seconds() / 60), 2),
+        'avg_duration_seconds': round(avg.total_seconds(), 3) if avg is not None else None,
+    }
+
+
+# Tasks
+
+@task('generate_derivatives')
+def generate_derivatives_task(name):
+    from .caching import bump_homepage_version
+    from .images import generate_derivatives, record_derivatives
+
+    variants, _ = generate_derivatives(name)
+    if record_derivatives(name, variants) and variants:
+        # The cached homepage was rendered without these srcsets
+        bump_homepage_version()
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import ari
+from app.forms import AriFeedForm
+
+
+class Command(BaseCommand):
+    help = "Write the availability and rates (ARI) feed as JSON, optionally only the changes since a timestamp"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="First night (default: today)")
+        parser.add_argument('--days', type=int, help="Nights to cover (default: ARI_DEFAULT_DAYS)")
+        parser.add_argument('--since', help="Only nights changed since this ISO timestamp (a previous generated_at)")
+        parser.add_argument('--output', help="File to write instead of stdout")
+        parser.add_argument('--purge', action='store_true', help="First delete change log entries older than ARI_CHANGE_TTL")
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            self.stderr.write(f"Purged {ari.purge()} ARI change log entries.")
+        form = AriFeedForm({
+            'start_date': options['start_date'] or '', 'days': options['days'] or '', 'since': options['since'] or '',
+        })
+        if not form.is_valid():
+            raise CommandError('; '.join(e for errors in form.errors.values() for e in errors))
+        data = form.cleaned_data
+        feed = ari.feed(data['start_date'], data['days'], data.get('since'))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(feed, f)
+            ranges = sum(len(category['ranges']) for category in feed['categories'])
+            self.stderr.write(f"Wrote {len(feed['categories'])} categories, {ranges} ranges "
+                              f"(generated_at {feed['generated_at']}) to {options['output']}.")
+        else:
+            self.stdout.write(json.dumps(feed))
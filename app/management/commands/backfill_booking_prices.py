@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.models import Booking, Category
+from app.pricing import PriceIndex
+
+
+class Command(BaseCommand):
+    help = "Store Booking._total_price for every booking in batches with bulk_update"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute bookings that already have a price")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bookings = Booking.objects.only('id', 'Category_id', 'start_date', 'end_date', '_total_price')
+        if not options['all']:
+            bookings = bookings.filter(_total_price__isnull=True)
+
+        total = bookings.count()
+        if not total:
+            self.stdout.write("Nothing to backfill.")
+            return
+
+        # Every category's seasons in one query, reused for every booking
+        indexes = PriceIndex.for_categories(list(Category.objects.all()))
+
+        done = 0
+        last_id = 0
+        started = time.perf_counter()
+        while True:
+            # Walk by primary key so each batch is an index range scan
+            batch = list(bookings.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for booking in batch:
+                index = indexes[booking.Category_id]
+                booking._total_price = index.total(booking.start_date, booking.end_date)
+            with transaction.atomic():
+                Booking.objects.bulk_update(batch, ['_total_price'], batch_size=500)
+
+            done += len(batch)
+            last_id = batch[-1].pk
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{done}/{total} bookings ({done / total:.0%}), {done / elapsed:.0f} rows/s")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored prices for {done} bookings in {elapsed:.1f}s ({done / elapsed:.0f} rows/s)"
+        ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.urls import reverse
+
+from app.benchmarks import bench_client, count_queries, scratch_data, summarize, time_calls
+from app.models import Booking, User
+
+
+class Command(BaseCommand):
+    help = "Compare the JSON API (200 and 304) with the HTML pages showing the same rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with scratch_data():
+            admin = User.objects.create_user('__bench_api__', 'bench@example.com', 'x', role='admin')
+            customer_id = (
+                Booking.objects.values('customer').annotate(n=Count('pk')).order_by('-n').values_list('customer', flat=True)
+                .first()
+            )
+            if customer_id is None:
+                self.stderr.write("No bookings to serve; run seed_synthetic first.")
+                return
+            customer = User.objects.get(pk=customer_id)
+
+            admin_client = bench_client()
+            admin_client.force_login(admin)
+            customer_client = bench_client()
+            customer_client.force_login(customer)
+
+            cases = (
+                ('reservations (admin)', admin_client, reverse('admin_reservations'),
+                 reverse('api_list', args=['bookings'])),
+                ("customer's bookings", customer_client, reverse('booking_list'),
+                 reverse('api_list', args=['bookings']) + '?limit=200'),
+                ('seasonal prices', admin_client, reverse('seasonalpricing_list'),
+                 reverse('api_list', args=['seasonal_prices']) + '?limit=200'),
+            )
+
+            self.stdout.write(f"{'rows':>22} {'variant':>10} {'queries':>8} {'bytes':>8} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}")
+            for label, client, html_url, api_url in cases:
+                etag = client.get(api_url)['ETag']
+                variants = (
+                    ('html', html_url, {}),
+                    ('api', api_url, {}),
+                    ('api 304', api_url, {'HTTP_IF_NONE_MATCH': etag}),
+                )
+                for variant, url, headers in variants:
+                    response, queries = count_queries(lambda: client.get(url, **headers))
+                    stats = summarize(time_calls(lambda: client.get(url, **headers), options['requests']))
+                    self.stdout.write(
+                        f"{label:>22} {variant:>10} {queries:>8} {len(response.content):>8} "
+                        f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['per_second']:>8.0f}"
+                    )
@@ -0,0 +1,58 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import TestCase
+from django.utils import timezone
+
+from app import ari
+from app.benchmarks import count_queries, scratch_data
+from app.inventory import reserve, rooms_left
+from app.models import Category, SeasonalPricing
+
+
+def per_night_grid(categories, start_date, days):
+    # The BookingCreateView pricing loop (one season lookup per night) plus a ledger read per night
+    grid = {}
+    for category in categories:
+        for i in range(days):
+            day = start_date + timedelta(days=i)
+            season = SeasonalPricing.objects.filter(category=category, start_date__lte=day, end_date__gte=day).first()
+            rate = season.price_per_night if season else category.price_per_night
+            grid[category.pk, day] = (rooms_left(category, day, day + timedelta(days=1)), rate)
+    return grid
+
+
+class Command(BaseCommand):
+    help = "Time the ARI feed: per-night loop, cold batched build, warm cache and deltas after a booking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365)
+
+    def handle(self, *args, **options):
+        days = options['days']
+        start_date = timezone.localdate()
+        categories = list(Category.objects.order_by('pk'))
+        self.stdout.write(f"{len(categories)} categories x {days} nights (the per-night loop's ranges are its cells)")
+        self.stdout.write(f"{'case':>28} {'queries':>8} {'ms':>10} {'ranges':>8}")
+
+        def run(label, func):
+            started = time.perf_counter()
+            result, queries = count_queries(func)
+            ms = (time.perf_counter() - started) * 1000
+            ranges = sum(len(c['ranges']) for c in result['categories']) if 'categories' in result else len(result)
+            self.stdout.write(f"{label:>28} {queries:>8} {ms:>10.1f} {ranges:>8}")
+            return result
+
+        with scratch_data():
+            ari.ari_cache().clear()
+            run('per-night loop', lambda: per_night_grid(categories, start_date, days))
+            run('batched, cold cache', lambda: ari.feed(start_date, days))
+            full = run('warm cache', lambda: ari.feed(start_date, days))
+
+            # The scratch transaction never commits, so run the on_commit callbacks by hand
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                reserve(categories[0], start_date + timedelta(days=30), start_date + timedelta(days=33))
+            since = timezone.datetime.fromisoformat(full['generated_at'])
+            run('after 1 booking, full', lambda: ari.feed(start_date, days))
+            run('after 1 booking, since', lambda: ari.feed(start_date, days, since=since))
@@ -0,0 +1,161 @@
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from django.utils import timezone
+
+from app.benchmarks import summarize
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref server handling requests on a fixed thread pool, like a threaded WSGI worker."""
+
+    threads = 8
+    request_queue_size = 128  # the default backlog of 5 resets connections while the pool is busy
+
+    def server_activate(self):
+        super().server_activate()
+        self.pool = ThreadPoolExecutor(self.threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_wsgi(threads):
+    PooledWSGIServer.threads = threads
+    server = make_server('127.0.0.1', 0, get_wsgi_application(), server_class=PooledWSGIServer,
+                         handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        server.pool.shutdown(wait=False, cancel_futures=True)
+    return server.server_address[1], stop
+
+
+def start_asgi():
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError("The ASGI benchmark needs uvicorn (pip install uvicorn).")
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(get_asgi_application(), lifespan='off', log_level='warning'))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return sock.getsockname()[1], stop
+
+
+async def fetch(port, path, trickle=0.0):
+    """One HTTP/1.1 request; with ``trickle`` the request is sent a few bytes at a time over that many seconds."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode()
+    try:
+        if trickle:
+            chunks = [request[i:i + 4] for i in range(0, len(request), 4)]
+            for chunk in chunks:
+                writer.write(chunk)
+                await writer.drain()
+                await asyncio.sleep(trickle / len(chunks))
+        else:
+            writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def load(port, paths, requests, concurrency, slow_clients, trickle):
+    slow = [asyncio.create_task(fetch(port, paths[i % len(paths)], trickle)) for i in range(slow_clients)]
+    await asyncio.sleep(0.1)  # let the slow clients take their connections first
+
+    timings, errors = [], 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in queue:
+            started = time.perf_counter()
+            try:
+                ok = await fetch(port, paths[i % len(paths)]) == 200
+            except OSError:
+                ok = False
+            if ok:
+                timings.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    slow_ok = sum(1 for status in await asyncio.gather(*slow, return_exceptions=True) if status == 200)
+
+    stats = summarize(timings)
+    stats.update(per_second=len(timings) / elapsed, errors=errors, slow_ok=slow_ok)
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Compare WSGI (thread pool) and ASGI (uvicorn, async views) latency for fast clients while slow clients hold connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Fast requests per server")
+        parser.add_argument('--concurrency', type=int, default=10, help="Concurrent fast clients")
+        parser.add_argument('--slow-clients', type=int, default=32)
+        parser.add_argument('--trickle', type=float, default=2.0, help="Seconds each slow client takes to send its request")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads")
+        parser.add_argument('--path', action='append', help="Paths to request (default: homepage and availability JSON)")
+
+    def handle(self, *args, **options):
+        paths = options['path']
+        if not paths:
+            start = timezone.now().date() + timedelta(days=30)
+            paths = [
+                reverse('index'),
+                f"{reverse('availability')}?start_date={start}&end_date={start + timedelta(days=3)}&guests=2&format=json",
+            ]
+
+        for label, server in (
+            (f"WSGI ({options['threads']} threads)", lambda: start_wsgi(options['threads'])),
+            ("ASGI (uvicorn, 1 worker)", start_asgi),
+        ):
+            port, stop = server()
+            try:
+                stats = asyncio.run(load(port, paths, options['requests'], options['concurrency'],
+                                         options['slow_clients'], options['trickle']))
+            finally:
+                stop()
+            self.stdout.write(
+                f"{label:>24}: {stats['per_second']:6.1f} req/s  p50 {stats['p50_ms']:7.1f} ms  "
+                f"p95 {stats['p95_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  {stats['errors']} errors  "
+                f"{stats['slow_ok']}/{options['slow_clients']} slow clients served"
+            )
@@ -0,0 +1,59 @@
+import re
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from app.benchmarks import bench_client, scratch_data
+from app.models import Category, User
+
+DB_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+CACHED_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['app.auth.CachedModelBackend'],
+}
+
+
+def queries(response):
+    # RequestStatsMiddleware counts every query of the request, async views included
+    return int(re.search(r'"(\d+) queries"', response['Server-Timing']).group(1))
+
+
+class Command(BaseCommand):
+    help = "Queries per authenticated page with database sessions/ModelBackend and with the cached fast path"
+
+    def handle(self, *args, **options):
+        with scratch_data():
+            customer = User.objects.create_user('__bench_auth__', 'guest@example.com', 'x')
+            admin = User.objects.create_user('__bench_auth_admin__', 'admin@example.com', 'x', role='admin')
+            category = Category.objects.create(name='__bench_auth__', price_per_night=Decimal(1000), number_of_rooms=5)
+            pages = [
+                (customer, 'booking_list', reverse('booking_list')),
+                (customer, 'booking_add', reverse('booking_add', args=[category.pk])),
+                (customer, 'availability', reverse('availability')),
+                (admin, 'admin_reservations', reverse('admin_reservations')),
+                (admin, 'adminindex', reverse('adminindex')),
+                (admin, 'data_transfer', reverse('data_transfer')),
+                (admin, 'seasonalpricing_list', reverse('seasonalpricing_list')),
+            ]
+
+            counts = {}
+            for label, config in (('db', DB_AUTH), ('cached', CACHED_AUTH)):
+                caches['default'].clear()
+                with override_settings(**config):
+                    clients = {}
+                    for user in (customer, admin):
+                        clients[user.pk] = bench_client()
+                        clients[user.pk].force_login(user)
+                    for user, name, url in pages:
+                        clients[user.pk].get(url)  # warm the caches
+                        counts[label, name] = queries(clients[user.pk].get(url))
+
+            self.stdout.write(f"{'view':>22} {'db sessions':>12} {'cached':>8}")
+            for _, name, _ in pages:
+                self.stdout.write(f"{name:>22} {counts['db', name]:>12} {counts['cached', name]:>8}")
@@ -0,0 +1,57 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from app.benchmarks import bench_client, count_queries, scratch_data, summarize, time_calls
+from app.models import Category, RoomInventory, SeasonalPricing
+
+
+class Command(BaseCommand):
+    help = "Load-test the availability search endpoint (JSON) and report requests/second and query count"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--nights', type=int, default=7)
+
+    def handle(self, *args, **options):
+        start = timezone.now().date() + timedelta(days=30)
+        end = start + timedelta(days=options['nights'])
+
+        with scratch_data():
+            categories = Category.objects.bulk_create(
+                Category(name=f'__bench_availability_{i}__', price_per_night=Decimal(1000 + i),
+                         number_of_rooms=5, max_guests=2 + i % 3)
+                for i in range(options['categories'])
+            )
+            SeasonalPricing.objects.bulk_create(
+                SeasonalPricing(category=c, start_date=start + timedelta(days=2),
+                                end_date=start + timedelta(days=4), price_per_night=Decimal(1500))
+                for c in categories
+            )
+            # Half the categories are partly sold for every night of the stay
+            RoomInventory.objects.bulk_create(
+                RoomInventory(category=c, date=start + timedelta(days=d), capacity=5, sold=i % 6)
+                for i, c in enumerate(categories) for d in range(options['nights'])
+                if i % 2
+            )
+
+            client = bench_client()
+            url = reverse('availability')
+            params = {'start_date': start, 'end_date': end, 'guests': 3, 'format': 'json'}
+
+            response, queries = count_queries(lambda: client.get(url, params))
+            found = len(response.json()['results'])
+            stats = summarize(time_calls(lambda: client.get(url, params), options['requests']))
+
+            self.stdout.write(
+                f"{options['categories']} categories, {options['nights']} nights: {found} bookable, "
+                f"{queries} queries/request"
+            )
+            self.stdout.write(
+                f"{stats['per_second']:.0f} req/s  p50 {stats['p50_ms']:.2f} ms  "
+                f"p95 {stats['p95_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms"
+            )
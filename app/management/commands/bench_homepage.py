@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from app.benchmarks import bench_client, count_queries, scratch_data, summarize, time_calls
+from app.caching import bump_homepage_version
+from app.models import Category, Photo, TouristLocation
+
+
+class Command(BaseCommand):
+    help = "Compare cold (invalidated) and warm (cached) homepage requests/second"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--items', type=int, default=20, help="Categories, photos and locations to seed")
+
+    def handle(self, *args, **options):
+        with scratch_data():
+            n = options['items']
+            Category.objects.bulk_create(
+                Category(name=f'__bench_home_{i}__', price_per_night=Decimal(1000), number_of_rooms=3,
+                         image=f'category/bench_{i}.jpg', free_wifi=True)
+                for i in range(n)
+            )
+            Photo.objects.bulk_create(Photo(image=f'photos/bench_{i}.jpg', caption=f'Photo {i}') for i in range(n))
+            TouristLocation.objects.bulk_create(
+                TouristLocation(name=f'Place {i}', description='A short walk away. ' * 5,
+                                distance_from_home_stay=Decimal('1.5'), image=f'tourist_locations/bench_{i}.jpg')
+                for i in range(n)
+            )
+
+            client = bench_client()
+            url = reverse('index')
+
+            def cold():
+                bump_homepage_version()
+                return client.get(url)
+
+            def warm():
+                return client.get(url)
+
+            warm()
+            for label, func in (('cold', cold), ('warm', warm)):
+                _, queries = count_queries(func)
+                stats = summarize(time_calls(func, options['requests']))
+                self.stdout.write(
+                    f"{label}: {stats['per_second']:.0f} req/s  p50 {stats['p50_ms']:.2f} ms  "
+                    f"p95 {stats['p95_ms']:.2f} ms  {queries} queries/request"
+                )
@@ -0,0 +1,121 @@
+import random
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.benchmarks import scratch_data, summarize, time_calls
+from app.models import Booking, Category, Payment, SeasonalPricing, User
+
+# Indexes added for the hot booking and pricing lookups (migration 0014)
+BENCH_INDEXES = (
+    (Booking, 'booking_category_dates_idx'),
+    (Booking, 'booking_customer_created_idx'),
+    (Payment, 'payment_status_date_idx'),
+)
+
+
+def find_index(model, name):
+    return next(index for index in model._meta.indexes if index.name == name)
+
+
+class Command(BaseCommand):
+    help = "Print query plans and timings of the hot lookups with and without the booking/payment indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def seed(self, count):
+        rng = random.Random(11)
+        customers = User.objects.bulk_create(
+            User(username=f'__bench_idx_{i}__', email=f'i{i}@example.com') for i in range(2000)
+        )
+        categories = Category.objects.bulk_create(
+            Category(name=f'__bench_idx_{i}__', price_per_night=Decimal(1000), number_of_rooms=20) for i in range(20)
+        )
+        SeasonalPricing.objects.bulk_create(
+            SeasonalPricing(category=c, start_date=date(2030, m, 1), end_date=date(2030, m, 20),
+                            price_per_night=Decimal(1200))
+            for c in categories for m in range(1, 13)
+        )
+
+        def bookings():
+            for _ in range(count):
+                start = date(2030, 1, 1) + timedelta(days=rng.randrange(365))
+                yield Booking(customer=rng.choice(customers), Category=rng.choice(categories), start_date=start,
+                              end_date=start + timedelta(days=rng.randint(1, 6)), _total_price=Decimal(1000))
+
+        Booking.objects.bulk_create(bookings(), batch_size=5000)
+        booking_ids = list(Booking.objects.values_list('pk', flat=True))
+        base = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+        Payment.objects.bulk_create(
+            (Payment(booking_id=booking_id, amount=Decimal(1000),
+                     status=rng.choice(['completed'] * 8 + ['pending', 'failed']),
+                     transaction_id=f'__bench_idx_{booking_id}__') for booking_id in booking_ids),
+            batch_size=5000,
+        )
+        # payment_date is auto_now_add; spread it over the year for the date-range lookup
+        payment_ids = list(Payment.objects.filter(booking_id__in=booking_ids).values_list('pk', flat=True))
+        for month in range(12):
+            Payment.objects.filter(pk__in=payment_ids[month::12]).update(
+                payment_date=base + timedelta(days=30 * month)
+            )
+        return customers, categories
+
+    def queries(self, customers, categories):
+        category = categories[5]
+        customer = customers[123]
+        return {
+            'category date overlap': Booking.objects.filter(
+                Category=category, start_date__lt=date(2030, 6, 8), end_date__gt=date(2030, 6, 1)
+            ),
+            'customer history': Booking.objects.filter(customer=customer).order_by('-created_at'),
+            'pending payments in range': Payment.objects.filter(
+                status='pending',
+                payment_date__gte=datetime(2030, 3, 1, tzinfo=dt_timezone.utc),
+                payment_date__lt=datetime(2030, 4, 1, tzinfo=dt_timezone.utc),
+            ),
+            'seasonal price lookup': SeasonalPricing.objects.filter(
+                category=category, start_date__lt=date(2030, 6, 8), end_date__gte=date(2030, 6, 1)
+            ),
+        }
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(str(col) for col in row[-1:]) for row in cursor.fetchall()]
+
+    def measure(self, label, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for name, queryset in queries.items():
+            stats = summarize(time_calls(lambda: list(queryset.all()), repeat))
+            self.stdout.write(f"  {name}: p50 {stats['p50_ms']:.2f} ms  p95 {stats['p95_ms']:.2f} ms")
+            for line in self.explain(queryset):
+                self.stdout.write(f"      {line}")
+
+    def analyze(self):
+        # Refresh planner statistics after changing the index set
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def handle(self, *args, **options):
+        with scratch_data():
+            customers, categories = self.seed(options['bookings'])
+            queries = self.queries(customers, categories)
+            editor = connection.schema_editor()
+
+            with connection.cursor() as cursor:
+                for model, name in BENCH_INDEXES:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+            self.analyze()
+            self.measure("Without indexes", queries, options['repeat'])
+
+            with connection.cursor() as cursor:
+                for model, name in BENCH_INDEXES:
+                    cursor.execute(str(find_index(model, name).create_sql(model, editor)))
+            self.analyze()
+            self.measure("With indexes", queries, options['repeat'])
@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from app.benchmarks import count_queries, scratch_data, summarize, time_calls
+from app.models import Category, DayOfWeekRate, LengthOfStayDiscount, SeasonalPricing
+from app.pricing import pricing_cache, quote
+
+
+def legacy_total(category, start_date, end_date):
+    # The per-night query loop BookingCreateView used before app.pricing
+    total_price = 0
+    current_date = start_date
+    while current_date < end_date:
+        seasonal_pricing = SeasonalPricing.objects.filter(
+            category=category,
+            start_date__lte=current_date,
+            end_date__gte=current_date
+        ).first()
+        price_per_night = seasonal_pricing.price_per_night if seasonal_pricing else category.price_per_night
+        total_price += price_per_night
+        current_date += timedelta(days=1)
+    return total_price
+
+
+def cold_quote(category, start_date, end_date):
+    # Rules compiled from the database, as on the first quote after a change
+    pricing_cache().clear()
+    return quote(category, start_date, end_date).total
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query count and latency of the per-night pricing loop against app.pricing.quote, "
+        "with its compiled rules cached (quote) and compiled on every call (cold)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seasons', type=int, default=12, help="Seasonal price rows to seed")
+
+    def handle(self, *args, **options):
+        start = date(2030, 1, 1)
+        with scratch_data():
+            category = Category.objects.create(
+                name='__bench_pricing__', price_per_night=Decimal('100.00'), number_of_rooms=10
+            )
+            # Non-overlapping two-week seasons with a gap between each
+            SeasonalPricing.objects.bulk_create(
+                SeasonalPricing(
+                    category=category,
+                    start_date=start + timedelta(days=30 * i),
+                    end_date=start + timedelta(days=30 * i + 13),
+                    price_per_night=Decimal(150 + 10 * i),
+                )
+                for i in range(options['seasons'])
+            )
+
+            self.stdout.write(f"{'nights':>7} {'impl':>8} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9}")
+            for nights in (1, 7, 30, 90, 365):
+                end = start + timedelta(days=nights)
+                self.run(nights, (
+                    ('legacy', lambda: legacy_total(category, start, end)),
+                    ('cold', lambda: cold_quote(category, start, end)),
+                    ('quote', lambda: quote(category, start, end).total),
+                ), options['repeat'])
+                assert legacy_total(category, start, end) == quote(category, start, end).total
+
+            # Overlapping seasons by priority, weekend rates and stay discounts (no legacy equivalent)
+            SeasonalPricing.objects.bulk_create(
+                SeasonalPricing(
+                    category=category,
+                    start_date=start + timedelta(days=30 * i + 7),
+                    end_date=start + timedelta(days=30 * i + 20),
+                    price_per_night=Decimal(400 + 10 * i),
+                    priority=1,
+                )
+                for i in range(options['seasons'])
+            )
+            DayOfWeekRate.objects.bulk_create([
+                DayOfWeekRate(category=category, weekday=4, adjustment_percent=Decimal('15')),
+                DayOfWeekRate(category=category, weekday=5, adjustment_percent=Decimal('25')),
+            ])
+            LengthOfStayDiscount.objects.bulk_create([
+                LengthOfStayDiscount(category=category, min_nights=7, discount_percent=Decimal('5')),
+                LengthOfStayDiscount(category=category, min_nights=28, discount_percent=Decimal('12')),
+            ])
+            pricing_cache().clear()  # bulk_create sends no signals
+            self.stdout.write("With overlapping seasons, weekday rates and stay discounts:")
+            for nights in (1, 7, 30, 90, 365):
+                end = start + timedelta(days=nights)
+                self.run(nights, (
+                    ('cold', lambda: cold_quote(category, start, end)),
+                    ('quote', lambda: quote(category, start, end).total),
+                ), options['repeat'])
+
+    def run(self, nights, impls, repeat):
+        for label, func in impls:
+            total, queries = count_queries(func)
+            stats = summarize(time_calls(func, repeat))
+            self.stdout.write(
+                f"{nights:>7} {label:>8} {queries:>8} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f}"
+            )
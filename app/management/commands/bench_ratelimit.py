@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from app.benchmarks import bench_client, scratch_data
+from app.models import User
+from app.ratelimit import get_cache
+
+
+class Command(BaseCommand):
+    help = "Replay a credential-stuffing burst against the login view with and without rate limiting"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=300)
+        parser.add_argument('--ips', type=int, default=2, help="Distinct client addresses in the burst")
+        parser.add_argument('--usernames', type=int, default=20, help="Distinct usernames tried")
+
+    def handle(self, *args, **options):
+        login_url = reverse('login')
+        clients = [bench_client(REMOTE_ADDR=f'203.0.113.{i + 1}') for i in range(options['ips'])]
+
+        with scratch_data():
+            User.objects.create_user('__bench_ratelimit__', 'bench@example.com', 'correct horse')
+
+            self.stdout.write(f"{'limiter':>8} {'attempts':>9} {'429s':>6} {'cpu s':>8} {'wall s':>8} "
+                              f"{'cpu ms/attempt':>15} {'genuine login':>14}")
+            for enabled in (False, True):
+                get_cache().clear()
+                with override_settings(RATELIMIT_ENABLED=enabled):
+                    statuses = []
+                    cpu, wall = time.process_time(), time.perf_counter()
+                    for i in range(options['attempts']):
+                        client = clients[i % len(clients)]
+                        response = client.post(login_url, {
+                            'username': f'victim{i % options["usernames"]}', 'password': f'guess-{i}',
+                        })
+                        statuses.append(response.status_code)
+                    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+                    # A real customer on another address is not affected by the burst
+                    genuine = bench_client(REMOTE_ADDR='198.51.100.7').post(login_url, {
+                        'username': '__bench_ratelimit__', 'password': 'correct horse',
+                    }).status_code
+
+                self.stdout.write(
+                    f"{'on' if enabled else 'off':>8} {len(statuses):>9} {statuses.count(429):>6} {cpu:>8.2f} "
+                    f"{wall:>8.2f} {cpu / len(statuses) * 1000:>15.2f} {genuine:>14}"
+                )
@@ -0,0 +1,73 @@
+import html
+import random
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from app.benchmarks import bench_client, count_queries, scratch_data, summarize, time_calls
+from app.models import Booking, Category, SeasonalPricing, User
+
+NEXT_LINK_RE = re.compile(r'href="\?([^"]*cursor=[^"]*)"')
+
+
+class Command(BaseCommand):
+    help = "Benchmark the admin reservation list (first page, deep cursor, filters) on a seeded booking table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=100_000)
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--pages', type=int, default=20, help="Cursor pages to walk for the deep-page case")
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_data():
+            admin = User.objects.create_user('__bench_admin__', 'bench@example.com', 'x', role='admin')
+            customers = User.objects.bulk_create(
+                User(username=f'__bench_customer_{i}__', email=f'c{i}@example.com') for i in range(500)
+            )
+            categories = Category.objects.bulk_create(
+                Category(name=f'__bench_reservations_{i}__', price_per_night=Decimal(1000 + 100 * i), number_of_rooms=10)
+                for i in range(10)
+            )
+            SeasonalPricing.objects.bulk_create(
+                SeasonalPricing(category=c, start_date=date(2030, 12, 20), end_date=date(2031, 1, 5),
+                                price_per_night=Decimal(3000))
+                for c in categories
+            )
+
+            def bookings():
+                for _ in range(options['bookings']):
+                    start = date(2030, 1, 1) + timedelta(days=rng.randrange(730))
+                    # Legacy rows without a stored price exercise the Booking.total_price fallback
+                    yield Booking(customer=rng.choice(customers), Category=rng.choice(categories),
+                                  start_date=start, end_date=start + timedelta(days=rng.randint(1, 7)))
+
+            Booking.objects.bulk_create(bookings(), batch_size=5000)
+            self.stdout.write(f"Seeded {Booking.objects.count()} bookings")
+
+            client = bench_client()
+            client.force_login(admin)
+            url = reverse('admin_reservations')
+
+            # Walk a few pages to get a deep cursor
+            query = ''
+            for _ in range(options['pages']):
+                response = client.get(f"{url}?{query}")
+                query = html.unescape(NEXT_LINK_RE.search(response.content.decode()).group(1))
+
+            cases = (
+                ('first page', ''),
+                (f"page {options['pages'] + 1}", query),
+                ('category filter', f"category={categories[3].pk}"),
+                ('date range filter', "start_date=2030-06-01&end_date=2030-06-08"),
+                ('customer filter', f"customer={customers[42].username}"),
+            )
+            for label, qs in cases:
+                _, queries = count_queries(lambda: client.get(f"{url}?{qs}"))
+                stats = summarize(time_calls(lambda: client.get(f"{url}?{qs}"), options['requests']))
+                self.stdout.write(
+                    f"{label:>18}: {queries} queries  p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms"
+                )
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.benchmarks import bench_client, summarize
+from app.caching import bump_homepage_version
+from app.models import Category, Photo, TouristLocation, User
+
+PROFILES = ('default', 'production')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write concurrency benchmark (homepage reads vs. booking creation) "
+        "on a fresh SQLite file, with and without the production SQLite profile"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per profile")
+        parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            # Measure the database, not the booking rate limit
+            with override_settings(RATELIMIT_ENABLED=False):
+                self.stdout.write(json.dumps(self.run_worker(options)))
+            return
+
+        # Each profile runs in its own process so it gets its own settings and database file
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, DJANGO_SQLITE_PROFILE=profile, DJANGO_SQLITE_NAME=os.path.join(tmp, 'bench.sqlite3'))
+                manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+                subprocess.run(manage + ['migrate', '-v0'], env=env, check=True)
+                worker = subprocess.run(
+                    manage + ['bench_sqlite_profile', '--worker', '--readers', str(options['readers']),
+                              '--writers', str(options['writers']), '--duration', str(options['duration'])],
+                    env=env, check=True, capture_output=True, text=True,
+                )
+            result = json.loads(worker.stdout.strip().splitlines()[-1])
+            self.stdout.write(f"{profile} profile (journal_mode={result['journal_mode']}):")
+            for role in ('reads', 'writes'):
+                stats = result[role]
+                self.stdout.write(
+                    f"  {role:>6}: {stats['per_second']:7.1f} req/s  p50 {stats['p50_ms']:7.1f} ms  "
+                    f"p95 {stats['p95_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  {stats['errors']} errors"
+                )
+
+    def run_worker(self, options):
+        customer = User.objects.create_user('__bench_sqlite__', 'bench@example.com', 'x')
+        category = Category.objects.create(name='__bench_sqlite__', price_per_night=Decimal(1000), number_of_rooms=100_000)
+        Category.objects.bulk_create(
+            Category(name=f'__bench_sqlite_{i}__', price_per_night=Decimal(1000), number_of_rooms=3,
+                     image=f'category/bench_{i}.jpg')
+            for i in range(10)
+        )
+        Photo.objects.bulk_create(Photo(image=f'photos/bench_{i}.jpg', caption=f'Photo {i}') for i in range(10))
+        TouristLocation.objects.bulk_create(
+            TouristLocation(name=f'Place {i}', description='Nearby', distance_from_home_stay=Decimal('1.5'))
+            for i in range(10)
+        )
+        journal_mode = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+        first_night = timezone.now().date() + timedelta(days=30)
+        booking_url = reverse('booking_add', args=[category.pk])
+        index_url = reverse('index')
+        deadline = time.perf_counter() + options['duration']
+        results = {'reads': ([], [0]), 'writes': ([], [0])}
+
+        def read(client, i):
+            # Invalidate first so every read renders the homepage from the database
+            bump_homepage_version()
+            return client.get(index_url)
+
+        def write(client, i):
+            start = first_night + timedelta(days=i % 365)
+            return client.post(booking_url, {
+                'Category': category.pk, 'start_date': start, 'end_date': start + timedelta(days=2),
+                'name': 'Bench Guest', 'email': 'bench@example.com', 'phone_number': '9999999999',
+                'payment_method': 'cash', 'number_of_guests': 2,
+            })
+
+        def loop(role, request, expected, offset):
+            client = bench_client()
+            if role == 'writes':
+                client.force_login(customer)
+            timings, errors = results[role]
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    ok = request(client, i).status_code == expected
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                # The test client keeps connections open; close them the way the WSGI handler would
+                close_old_connections()
+                if ok:
+                    timings.append(elapsed)
+                else:
+                    errors[0] += 1
+                i += 1
+            connection.close()
+
+        threads = [threading.Thread(target=loop, args=('reads', read, 200, n)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=loop, args=('writes', write, 302, n * 1000)) for n in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = {'journal_mode': journal_mode}
+        for role, (timings, errors) in results.items():
+            stats = summarize(timings)
+            stats['per_second'] = len(timings) / options['duration']
+            stats['errors'] = errors[0]
+            report[role] = stats
+        return report
+
@@ -0,0 +1,85 @@
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from app.benchmarks import scratch_data
+from app.models import Booking, Category, RoomInventory, User
+from app.transfer import get_resource
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Time the streaming bookings import and export on a generated file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--naive-rows', type=int, default=2000,
+                            help="Rows imported one Booking.objects.create() at a time, for comparison")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        rows = options['rows']
+        first_night = date(2031, 1, 1)
+
+        with scratch_data(), tempfile.TemporaryDirectory() as tmp:
+            User.objects.create_user('__bench_transfer__', 'bench@example.com', 'bench')
+            names = [f'__bench_transfer_{i}__' for i in range(options['categories'])]
+            Category.objects.bulk_create(
+                Category(name=name, price_per_night=Decimal(1000 + 100 * i), number_of_rooms=10_000)
+                for i, name in enumerate(names)
+            )
+
+            path = os.path.join(tmp, 'bookings.csv')
+            started = time.perf_counter()
+            with open(path, 'w', newline='') as fh:
+                writer = csv.writer(fh)
+                writer.writerow(('customer', 'category', 'start_date', 'end_date', 'total_price'))
+                for _ in range(rows):
+                    start = first_night + timedelta(days=rng.randint(0, 729))
+                    writer.writerow(('__bench_transfer__', rng.choice(names), start,
+                                     start + timedelta(days=rng.randint(1, 7)), ''))
+            self.report('generate', rows, started, f"{os.path.getsize(path) / 2 ** 20:.0f} MB file")
+
+            started = time.perf_counter()
+            with open(path, newline='') as fh:
+                result = get_resource('bookings').load(fh, 'csv', batch_size=options['batch_size'])
+            self.report('import', result.created, started, f"{result.skipped} skipped")
+
+            nights = sum((b.end_date - b.start_date).days for b in Booking.objects.filter(
+                Category__name__in=names).only('start_date', 'end_date').iterator(chunk_size=5000))
+            sold = sum(RoomInventory.objects.filter(category__name__in=names).values_list('sold', flat=True))
+            assert nights == sold, (nights, sold)
+
+            started = time.perf_counter()
+            with open(os.devnull, 'w') as fh:
+                fh.writelines(get_resource('bookings').export('csv'))
+            self.report('export', Booking.objects.count(), started)
+
+            customer = User.objects.get(username='__bench_transfer__')
+            categories = list(Category.objects.filter(name__in=names))
+            started = time.perf_counter()
+            for i in range(options['naive_rows']):
+                start = first_night + timedelta(days=i % 700)
+                Booking.objects.create(customer=customer, Category=categories[i % len(categories)],
+                                       start_date=start, end_date=start + timedelta(days=3))
+            self.report('naive create()', options['naive_rows'], started)
+
+    def report(self, label, rows, started, note=''):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label:>15}: {rows:>9,} rows {elapsed:>7.1f}s {rows / elapsed:>9,.0f} rows/s "
+            f"peak RSS {peak_rss_mb():>6.0f} MB {note}"
+        )
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.caching import bump_homepage_version
+from app.images import generate_derivatives, is_derivative, record_derivatives
+
+UPLOAD_DIRS = ('photos', 'category', 'tourist_locations')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def _build(name, force):
+    # Runs in a worker process; the variants are recorded by the parent
+    try:
+        return name, *generate_derivatives(name, force=force), None
+    except Exception as exc:  # one bad file must not stop the backfill
+        return name, [], [], str(exc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized image derivatives for existing uploads using a process pool, "
+        "and record them on the rows that use each upload"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--force', action='store_true', help="Regenerate derivatives that already exist")
+
+    def uploads(self):
+        root = settings.MEDIA_ROOT
+        for directory in UPLOAD_DIRS:
+            path = os.path.join(root, directory)
+            if not os.path.isdir(path):
+                continue
+            for filename in sorted(os.listdir(path)):
+                name = f"{directory}/{filename}"
+                if filename.lower().endswith(IMAGE_EXTENSIONS) and not is_derivative(name):
+                    yield name
+
+    def handle(self, *args, **options):
+        names = list(self.uploads())
+        started = time.perf_counter()
+        written = failed = recorded = 0
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futures = [pool.submit(_build, name, options['force']) for name in names]
+            for future in as_completed(futures):
+                name, variants, created, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    written += len(created)
+                    recorded += record_derivatives(name, variants)
+                    self.stdout.write(f"{name}: {len(created)} derivatives")
+        if recorded:
+            bump_homepage_version()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(names)} images, {written} derivatives written, {failed} failed in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,22 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from app.transfer import FORMATS, RESOURCES, get_resource
+
+
+class Command(BaseCommand):
+    help = "Export categories, seasonal prices or bookings as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=list(RESOURCES))
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        lines = get_resource(options['resource']).export(options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as fh:
+                fh.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,47 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.transfer import FORMATS, RESOURCES, TransferError, get_resource
+
+
+class Command(BaseCommand):
+    help = "Import categories, seasonal prices or bookings from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=list(RESOURCES))
+        parser.add_argument('path', help="File to read, or - for stdin")
+        parser.add_argument('--format', choices=list(FORMATS),
+                            help="Defaults to the file extension (.csv, .json or .jsonl)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Validate every row, write nothing")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.endswith(('.json', '.jsonl')) else 'csv')
+        started = time.perf_counter()
+        try:
+            if path == '-':
+                result = self.load(sys.stdin, fmt, options)
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    result = self.load(stream, fmt, options)
+        except (OSError, TransferError) as e:
+            raise CommandError(e)
+        elapsed = time.perf_counter() - started
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.skipped > len(result.errors):
+            self.stderr.write(f"... {result.skipped - len(result.errors)} more rows skipped")
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if result.dry_run else 'Imported'} {result.rows} rows in {elapsed:.1f}s "
+            f"({result.rows / elapsed if elapsed else 0:,.0f} rows/s): "
+            f"{result.created} created, {result.updated} updated, {result.skipped} skipped."
+        ))
+
+    def load(self, stream, fmt, options):
+        return get_resource(options['resource']).load(
+            stream, fmt, batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
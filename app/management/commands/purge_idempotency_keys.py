@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.idempotency import purge
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than IDEMPOTENCY_KEY_TTL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help="Age limit in hours (default: IDEMPOTENCY_KEY_TTL)")
+
+    def handle(self, *args, **options):
+        hours = options['hours']
+        deleted = purge(timedelta(hours=hours) if hours is not None else None)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency keys."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from app import reports
+from app.caching import bump_homepage_version
+from app.inventory import rebuild
+from app.models import Booking, Category
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-night room inventory ledger from existing bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=int, help="Only rebuild this category id")
+        parser.add_argument(
+            '--restore-capacity', action='store_true',
+            help="Add booked rooms back onto Category.number_of_rooms (it used to be decremented per booking)",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        categories = Category.objects.all()
+        if options['category']:
+            categories = categories.filter(pk=options['category'])
+
+        with transaction.atomic():
+            for category in categories:
+                bookings = Booking.objects.filter(Category=category)
+
+                if options['restore_capacity']:
+                    booked = bookings.aggregate(n=Count('pk'))['n']
+                    category.number_of_rooms += booked
+                    # update() rather than save() so the ledger is not synced twice; that also
+                    # skips the save signals, so the report rows and the homepage follow here
+                    Category.objects.filter(pk=category.pk).update(
+                        number_of_rooms=category.number_of_rooms, updated_at=timezone.now()
+                    )
+                    reports.sync_capacity(category)
+
+                sold = rebuild(category, batch_size=options['batch_size'])
+
+                overbooked = sum(1 for count in sold.values() if count > category.number_of_rooms)
+                self.stdout.write(
+                    f"{category.name}: {len(sold)} nights, {sum(sold.values())} room-nights sold"
+                    + (f", {overbooked} nights over capacity" if overbooked else "")
+                )
+
+        if options['restore_capacity']:
+            bump_homepage_version()
+        self.stdout.write(self.style.SUCCESS("Inventory ledger rebuilt."))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import reports
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily occupancy and revenue report rows from all bookings and payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = reports.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows} report rows in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.benchmarks import scratch_data
+from app.benchmarks.seed import seed
+from app.benchmarks.suite import compare, run_suite, write_report
+
+
+class Command(BaseCommand):
+    help = "Benchmark the booking flow endpoints on a synthetic dataset and write the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint")
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', metavar='PREVIOUS_JSON', help="Print the change against an earlier report")
+        parser.add_argument('--only', nargs='*', help="Only run these scenarios")
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--bookings', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        # Seeded data and the bookings posted by the suite are rolled back afterwards
+        with scratch_data():
+            started = time.perf_counter()
+            dataset = seed(users=options['users'], categories=options['categories'], bookings=options['bookings'])
+            self.stdout.write(f"Seeded {dataset['bookings']} bookings in {time.perf_counter() - started:.1f}s")
+            report = run_suite(options['requests'], dataset=dataset, only=options['only'])
+
+        write_report(report, options['output'])
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f"{name:>22}: p50 {result['p50_ms']:6.1f} ms  p95 {result['p95_ms']:6.1f} ms  "
+                f"p99 {result['p99_ms']:6.1f} ms  {result['per_second']:6.0f} req/s  "
+                f"{result['queries_per_request']:g} queries  {result['status_codes']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if options['compare']:
+            for name, metric, before, after, change in compare(report, options['compare']):
+                self.stdout.write(f"{name:>22} {metric:>20}: {before:8.2f} -> {after:8.2f} ({change:+.1f}%)")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.jobs import queued_jobs, requeue_expired, run_job, stats
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs in this process (also resumes jobs whose worker crashed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        # Once at startup: polls must not take back jobs other workers are running
+        requeued = requeue_expired()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} jobs whose lease expired")
+        while True:
+            started = time.perf_counter()
+            job_ids = queued_jobs()
+            for job_id in job_ids:
+                run_job(job_id)
+            if job_ids:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"Ran {len(job_ids)} jobs in {elapsed:.2f}s ({len(job_ids) / elapsed:.1f}/s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(str(stats()))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.benchmarks.seed import SYNTHETIC_PREFIX, clear, seed
+from app.models import User
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic dataset (users, categories, seasons, bookings, payments, photos, locations)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--seasons', type=int, default=6, help="Seasonal prices per category")
+        parser.add_argument('--bookings', type=int, default=10000)
+        parser.add_argument('--payments', type=float, default=0.8, help="Fraction of bookings with a payment")
+        parser.add_argument('--photos', type=int, default=20)
+        parser.add_argument('--locations', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help="Delete the synthetic dataset and exit")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['clear']:
+                clear()
+                self.stdout.write(self.style.SUCCESS("Synthetic data removed."))
+                return
+            if User.objects.filter(username__startswith=SYNTHETIC_PREFIX).exists():
+                self.stderr.write("Synthetic data already exists; run with --clear first.")
+                return
+            counts = seed(
+                users=options['users'], categories=options['categories'], seasons=options['seasons'],
+                bookings=options['bookings'], payments=options['payments'], photos=options['photos'],
+                locations=options['locations'], batch_size=options['batch_size'],
+            )
+
+        for name, count in counts.items():
+            self.stdout.write(f"{name:>18}: {count}")
+        self.stdout.write(self.style.SUCCESS("Synthetic data seeded."))
@@ -0,0 +1,77 @@
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from app.benchmarks import bench_client
+
+ASSET_RE = re.compile(r'''(?:href|src)=["']([^"']+)["']|url\(([^)]+)\)''')
+
+
+def static_urls(html):
+    prefix = '/' + settings.STATIC_URL.lstrip('/')
+    urls = []
+    for match in ASSET_RE.finditer(html):
+        url = (match.group(1) or match.group(2)).strip('\'" ')
+        if url.startswith(prefix) and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def body_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = "Bytes transferred for the homepage and its static assets, before and after the collectstatic pipeline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accept-encoding', default='br, gzip')
+
+    def handle(self, *args, **options):
+        if not (settings.STATIC_ROOT / 'staticfiles.json').exists():
+            raise CommandError("Run `manage.py collectstatic` first.")
+        client = bench_client()
+        prefix = '/' + settings.STATIC_URL.lstrip('/')
+
+        # Before: plain names (as with DEBUG on), served uncompressed and without cache headers
+        with override_settings(DEBUG=True):
+            page = client.get(reverse('index'))
+        before = {}
+        for url in static_urls(page.content.decode()):
+            path = finders.find(url[len(prefix):])
+            if path:
+                with open(path, 'rb') as fh:
+                    before[url] = len(fh.read())
+        before_page = len(page.content)
+
+        # After: hashed names from the manifest, precompressed variants, immutable caching
+        after = {}
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost']):
+            page = client.get(reverse('index'))
+            for url in static_urls(page.content.decode()):
+                response = client.get(url, HTTP_ACCEPT_ENCODING=options['accept_encoding'])
+                if response.status_code == 200:
+                    after[url] = (body_size(response), response.get('Content-Encoding', 'identity'),
+                                  'immutable' in response.get('Cache-Control', ''))
+        after_page = len(page.content)
+
+        for url, (size, encoding, immutable) in after.items():
+            self.stdout.write(f"{size:>9,} B  {encoding:<8}  {'immutable' if immutable else 'revalidate':<10}  {url}")
+
+        first_before = before_page + sum(before.values())
+        first_after = after_page + sum(size for size, _, _ in after.values())
+        repeat_after = after_page + sum(size for size, _, immutable in after.values() if not immutable)
+        text_before = sum(size for url, size in before.items() if url.endswith(('.css', '.js')))
+        text_after = sum(size for url, (size, _, _) in after.items() if url.endswith(('.css', '.js')))
+        self.stdout.write(f"\nAssets referenced by the homepage: {len(before)} before, {len(after)} after")
+        self.stdout.write(f"CSS/JS:       {text_before:>10,} B -> {text_after:>10,} B")
+        self.stdout.write(f"First visit:  {first_before:>10,} B -> {first_after:>10,} B "
+                          f"({(1 - first_after / first_before) * 100:.1f}% less)")
+        self.stdout.write(f"Repeat visit: {first_before:>10,} B -> {repeat_after:>10,} B "
+                          "(before: no cache headers, every asset refetched)")
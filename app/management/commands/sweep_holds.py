@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.holds import sweep
+
+
+class Command(BaseCommand):
+    help = "Release the rooms of expired booking holds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping every --interval seconds")
+        parser.add_argument('--interval', type=float, default=30)
+
+    def handle(self, *args, **options):
+        while True:
+            released = sweep(batch_size=options['batch_size'])
+            self.stdout.write(f"Released {released} expired holds.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from app.routers import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = "Copy the SQLite primary into the stand-in replica file (local replication for testing the router)"
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica configured; set DJANGO_SQLITE_REPLICA_NAME.")
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replica = connections[REPLICA_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("sync_replica only works for SQLite; PostgreSQL replicas use streaming replication.")
+
+        connections[REPLICA_ALIAS].close()
+        source = sqlite3.connect(primary['NAME'])
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            # Online backup: consistent snapshot even while the primary is being written
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f"Replica {replica['NAME']} synced from {primary['NAME']}."))
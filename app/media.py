@@ -0,0 +1,147 @@
+# media.py
+#
+# Production serving for uploaded media (photos/, category/, tourist_locations/).
+# Responses carry ETag and Last-Modified so browsers revalidate with a 304,
+# honour single byte ranges (206), and stream through FileResponse so WSGI
+# servers with a file_wrapper can use sendfile. With MEDIA_ACCEL_REDIRECT set,
+# the file is handed to the front proxy (nginx X-Accel-Redirect) instead.
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .images import is_derivative
+
+MEDIA_DIRECTORIES = ('photos', 'category', 'tourist_locations')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileRange:
+    """Read-only view of ``length`` bytes of an open file from its current position."""
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # Lets sendfile-capable servers copy straight from the current offset (bounded by Content-Length)
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to ignore the header, or False if unsatisfiable."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None  # malformed or multi-range: send the whole file
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # bytes=5-2 is not a valid range: ignore it
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def cache_control(name):
+    # Derivative names (IMG_4070.JPG.w640.jpg) are tied to one upload; originals may be replaced in place
+    if is_derivative(name):
+        return IMMUTABLE
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 86400)}"
+
+
+@require_safe
+def serve(request, path):
+    directory, _, name = path.partition('/')
+    if directory not in MEDIA_DIRECTORIES:
+        raise Http404
+    try:
+        # Join onto the upload directory itself: MEDIA_ROOT is the project root, so photos/../x must not escape
+        full_path = safe_join(os.path.join(settings.MEDIA_ROOT, directory), name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    headers = HttpResponse()
+    headers['ETag'] = etag
+    headers['Last-Modified'] = http_date(stat.st_mtime)
+    headers['Cache-Control'] = cache_control(path)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime), response=headers)
+    if not_modified is not headers:
+        return not_modified
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    accel = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+    if accel:
+        # nginx serves the bytes (and ranges) from an internal location mapped onto MEDIA_ROOT
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel.rstrip('/') + '/' + path
+        return _copy_headers(headers, response)
+
+    size = stat.st_size
+    byte_range = None
+    if 'Range' in request.headers and _if_range_passes(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return _copy_headers(headers, response)
+
+    fh = open(full_path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        fh.seek(start)
+        response = FileResponse(_FileRange(fh, end - start + 1), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(fh, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return _copy_headers(headers, response)
+
+
+def _if_range_passes(request, etag, mtime):
+    # A stale If-Range means the client's partial copy is outdated: send the full file instead
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return if_range == http_date(mtime)
+
+
+def _copy_headers(source, response):
+    for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+        response[header] = source[header]
+    return response
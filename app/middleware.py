@@ -0,0 +1,288 @@
+# middleware.py
+
+import logging
+import mimetypes
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.template.backends.django import Template as BackendTemplate
+from django.utils._os import safe_join
+from django.utils.http import parse_etags
+
+from .staticfiles import ENCODINGS
+
+logger = logging.getLogger(__name__)
+
+# Template render time of the current request, accumulated by the patched backend Template.render
+_render_seconds = ContextVar('render_seconds', default=None)
+
+# Query timer of the current request. A ContextVar rather than a per-connection wrapper because
+# async views run their queries in sync_to_async threads that have their own connections.
+_query_timer = ContextVar('query_timer', default=None)
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class _QueryTimer:
+    # Counts queries and SQL time for one request
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _timed_execute(execute, sql, params, many, context):
+    # Installed on every connection; only times queries made while a request is being recorded
+    timer = _query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def instrument_connection(connection):
+    # Called for every new connection from signals.py
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def _instrument_template_rendering():
+    # Both render() and TemplateResponse go through the backend Template; {% include %} does not,
+    # so nested templates are not counted twice.
+    if getattr(BackendTemplate.render, '_timed', False):
+        return
+    original = BackendTemplate.render
+
+    def render(self, context=None, request=None):
+        accumulated = _render_seconds.get()
+        if accumulated is None:
+            return original(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            accumulated[0] += time.perf_counter() - started
+
+    render._timed = True
+    BackendTemplate.render = render
+
+
+def record(url_name, queries, sql_ms, render_ms, total_ms, size):
+    with _stats_lock:
+        entry = _stats.setdefault(url_name, {
+            'requests': 0, 'queries': 0, 'max_queries': 0,
+            'sql_ms': 0.0, 'render_ms': 0.0, 'total_ms': 0.0, 'max_total_ms': 0.0, 'bytes': 0,
+        })
+        entry['requests'] += 1
+        entry['queries'] += queries
+        entry['max_queries'] = max(entry['max_queries'], queries)
+        entry['sql_ms'] += sql_ms
+        entry['render_ms'] += render_ms
+        entry['total_ms'] += total_ms
+        entry['max_total_ms'] = max(entry['max_total_ms'], total_ms)
+        entry['bytes'] += size
+
+
+def stats_snapshot():
+    """Per-URL-name totals plus per-request averages."""
+    with _stats_lock:
+        snapshot = {}
+        for url_name, entry in _stats.items():
+            n = entry['requests']
+            snapshot[url_name] = dict(
+                entry,
+                avg_queries=round(entry['queries'] / n, 2),
+                avg_sql_ms=round(entry['sql_ms'] / n, 3),
+                avg_render_ms=round(entry['render_ms'] / n, 3),
+                avg_total_ms=round(entry['total_ms'] / n, 3),
+                avg_bytes=round(entry['bytes'] / n),
+            )
+        return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class RequestStatsMiddleware:
+    """
+    Records query count, SQL time, template render time, total time and
+    response size per URL name, adds a Server-Timing header and checks the
+    per-view QUERY_BUDGETS. Works under both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Patch Template.render only where the stats are actually recorded
+        if getattr(settings, 'REQUEST_STATS_ENABLED', True):
+            _instrument_template_rendering()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'REQUEST_STATS_ENABLED', True):
+            return self.get_response(request)
+
+        # Connections opened before the app was ready missed connection_created
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(connection)
+        state = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(state)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'REQUEST_STATS_ENABLED', True):
+            return await self.get_response(request)
+
+        state = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(state)
+        return self.finish(request, response, state)
+
+    def start(self):
+        timer, render_seconds = _QueryTimer(), [0.0]
+        tokens = (_query_timer.set(timer), _render_seconds.set(render_seconds))
+        return timer, render_seconds, tokens, time.perf_counter()
+
+    def stop(self, state):
+        query_token, render_token = state[2]
+        _query_timer.reset(query_token)
+        _render_seconds.reset(render_token)
+
+    def finish(self, request, response, state):
+        timer, render_seconds, _, started = state
+        total_ms = (time.perf_counter() - started) * 1000
+
+        queries = timer.count
+        sql_ms = timer.seconds * 1000
+        render_ms = render_seconds[0] * 1000
+        size = len(response.content) if not response.streaming else 0
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match and match.url_name else 'unresolved'
+
+        record(url_name, queries, sql_ms, render_ms, total_ms, size)
+        response['Server-Timing'] = (
+            f'db;dur={sql_ms:.2f};desc="{queries} queries", '
+            f'tpl;dur={render_ms:.2f}, total;dur={total_ms:.2f}'
+        )
+
+        self.check_budget(url_name, request.method, queries)
+        return response
+
+    def check_budget(self, url_name, method, queries):
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+        if isinstance(budget, dict):
+            # Per method, e.g. {'GET': 4, 'POST': 16}; methods not listed are not checked
+            budget = budget.get(method)
+        if budget is None or queries <= budget:
+            return
+        message = f"View '{url_name}' ran {queries} queries on {method} (budget {budget})"
+        if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Serves files from STATIC_ROOT ahead of the rest of the stack, picking the
+    .br or .gz variant built by collectstatic according to Accept-Encoding.
+    Hashed (manifest) names are cached for a year as immutable. Off with DEBUG
+    on, where runserver serves app/static and STATIC_ROOT may be out of date.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = settings.STATIC_ROOT
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        if (settings.DEBUG or not getattr(settings, 'STATIC_SERVE', False) or not self.root
+                or request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix)):
+            return None
+        name = request.path[len(self.prefix):]
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        encoding, served = self.choose_variant(path, request.headers.get('Accept-Encoding', ''))
+        stat = os.stat(served)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        cache_control = 'public, max-age=31536000, immutable' if name in self.immutable else 'public, max-age=300'
+
+        # Weak comparison, as for any If-None-Match; "*" matches every existing file
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etags or etag in (tag.removeprefix('W/') for tag in etags):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+    def choose_variant(self, path, accept_encoding):
+        # Our preference order (ENCODINGS) among the codings the client accepts with q > 0
+        qualities = {}
+        for part in accept_encoding.lower().split(','):
+            coding, _, params = part.partition(';')
+            name, _, value = params.replace(' ', '').partition('=')
+            try:
+                qualities[coding.strip()] = float(value) if name == 'q' else 1.0
+            except ValueError:
+                qualities[coding.strip()] = 0.0
+        for encoding, suffix in ENCODINGS:
+            if qualities.get(encoding, qualities.get('*', 0.0)) > 0 and os.path.isfile(path + suffix):
+                return encoding, path + suffix
+        return None, path
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_category_free_wifi_category_hot_water_category_is_ac_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('sold', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='app.category')),
+            ],
+            options={
+                'unique_together': {('category', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_roominventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='max_guests',
+            field=models.PositiveIntegerField(default=2),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_booking_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategoryReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('nights_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payments_completed', models.IntegerField(default=0)),
+                ('payments_pending', models.IntegerField(default=0)),
+                ('payments_failed', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_reports', to='app.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='report_date_idx')],
+                'unique_together': {('category', 'date')},
+            },
+        ),
+    ]
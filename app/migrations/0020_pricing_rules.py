@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:51
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_arichange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seasonalpricing',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DayOfWeekRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('adjustment_percent', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(-100), django.core.validators.MaxValueValidator(900)])),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekday_rates', to='app.category')),
+            ],
+            options={
+                'unique_together': {('category', 'weekday')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LengthOfStayDiscount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_nights', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(2)])),
+                ('discount_percent', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stay_discounts', to='app.category')),
+            ],
+            options={
+                'unique_together': {('category', 'min_nights')},
+            },
+        ),
+    ]
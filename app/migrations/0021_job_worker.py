@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_pricing_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='worker',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
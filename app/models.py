@@ -1,4 +1,7 @@
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser , BaseUserManager
 
 class CustomUserManager(BaseUserManager):
@@ -37,8 +40,10 @@ class Category(models.Model):
     description = models.TextField(blank=True, null=True)
     price_per_night = models.DecimalField(max_digits=8, decimal_places=2)  # Price for the category
     number_of_rooms = models.PositiveIntegerField(default=0)  # Number of rooms in this category
+    max_guests = models.PositiveIntegerField(default=2)  # Guests that fit in one room
     is_available = models.BooleanField(default=True)  # Availability of the category
     image = models.ImageField(upload_to='category/', blank=True, null=True)
+    image_derivatives = models.JSONField(default=list, blank=True, editable=False)  # Resized variants written, see images.py
     free_wifi = models.BooleanField(default=False)  # Free Wi-Fi availability
     hot_water = models.BooleanField(default=False)  # Hot water availability
     swimming_pool = models.BooleanField(default=False)  # Swimming pool availability
@@ -52,6 +57,12 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the per-night inventory ledger in step with the room count
+        from .inventory import sync_capacity
+        sync_capacity(self)
+
 
 # Seasonal Pricing Model (applied per Category)
 class SeasonalPricing(models.Model):
@@ -59,6 +70,8 @@ class SeasonalPricing(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     price_per_night = models.DecimalField(max_digits=8, decimal_places=2)  # Override price for the category during this season
+    priority = models.PositiveSmallIntegerField(default=0)  # Where seasons overlap the highest priority wins
+    updated_at = models.DateTimeField(auto_now=True)  # API ETags
 
     class Meta:
         unique_together = ('category', 'start_date', 'end_date')
@@ -67,12 +80,47 @@ class SeasonalPricing(models.Model):
         return f"{self.category.name} - {self.price_per_night} (from {self.start_date} to {self.end_date})"
 
 
+# Day-of-week Rate (e.g. weekends 20% up), applied on top of the base or seasonal price
+class DayOfWeekRate(models.Model):
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='weekday_rates')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    adjustment_percent = models.DecimalField(  # Negative for a cheaper night
+        max_digits=5, decimal_places=2, validators=[MinValueValidator(-100), MaxValueValidator(900)]
+    )
+
+    class Meta:
+        unique_together = ('category', 'weekday')
+
+    def __str__(self):
+        return f"{self.category.name} {self.get_weekday_display()} {self.adjustment_percent:+}%"
+
+
+# Length-of-stay Discount: stays of at least min_nights get discount_percent off the total
+class LengthOfStayDiscount(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='stay_discounts')
+    min_nights = models.PositiveIntegerField(validators=[MinValueValidator(2)])
+    discount_percent = models.DecimalField(
+        max_digits=5, decimal_places=2, validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
+
+    class Meta:
+        unique_together = ('category', 'min_nights')
+
+    def __str__(self):
+        return f"{self.category.name} {self.min_nights}+ nights -{self.discount_percent}%"
+
+
 # Tourist Location Model
 class TouristLocation(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     distance_from_home_stay = models.DecimalField(max_digits=5, decimal_places=2, help_text="Distance in kilometers")
     image = models.ImageField(upload_to='tourist_locations/', blank=True, null=True)
+    image_derivatives = models.JSONField(default=list, blank=True, editable=False)  # Resized variants written, see images.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     link=models.CharField(null=True,max_length=100)
@@ -87,39 +135,43 @@ class Booking(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # API ETags
 
     _total_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # Backing field
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the admin reservation list (newest first)
+            models.Index(fields=['-created_at', '-id'], name='booking_created_idx'),
+            # Bookings of a category overlapping a date range
+            models.Index(fields=['Category', 'start_date', 'end_date'], name='booking_category_dates_idx'),
+            # A customer's booking history, newest first
+            models.Index(fields=['customer', '-created_at'], name='booking_customer_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.customer.username} - {self.Category.name} ({self.start_date} to {self.end_date})"
 
     @property
     def total_price(self):
-        if self._total_price is not None:
+        # Frozen prices: the stored value is the price, never recomputed on read
+        if self._total_price is not None or settings.BOOKING_FROZEN_PRICES:
             return self._total_price
 
-        # Check for seasonal pricing
-        seasonal_pricing = SeasonalPricing.objects.filter(
-            category=self.Category,
-            start_date__lte=self.start_date,
-            end_date__gte=self.end_date
-        ).first()
-
-        price_per_night = seasonal_pricing.price_per_night if seasonal_pricing else self.Category.price_per_night
-        total_days = (self.end_date - self.start_date).days
-
-        return total_days * price_per_night
+        # Same per-night pricing as BookingCreateView
+        from .pricing import quote
+        return quote(self.Category, self.start_date, self.end_date).total
 
     @total_price.setter
     def total_price(self, value):
         self._total_price = value
 
-    
-    def delete(self, *args, **kwargs):
-        # Restore room availability when booking is deleted
-        self.Category.number_of_rooms += 1
-        self.Category.save()
-        super().delete(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        # Every booking stores its price so list pages never have to compute it
+        if self._total_price is None and self.start_date and self.end_date and self.Category_id:
+            from .pricing import quote
+            self._total_price = quote(self.Category, self.start_date, self.end_date).total
+        super().save(*args, **kwargs)
 
 # Payment Model
 class Payment(models.Model):
@@ -128,6 +180,13 @@ class Payment(models.Model):
     payment_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=[('completed', 'Completed'), ('pending', 'Pending'), ('failed', 'Failed')])
     transaction_id = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)  # API ETags
+
+    class Meta:
+        indexes = [
+            # Payments by status over a date range (pending/failed follow-ups, revenue reports)
+            models.Index(fields=['status', 'payment_date'], name='payment_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.booking} - {self.amount} ({self.status})"
@@ -135,8 +194,136 @@ class Payment(models.Model):
 
 class Photo(models.Model):
     image = models.ImageField(upload_to='photos/')  # Store images in the 'media/photos/' directory
+    image_derivatives = models.JSONField(default=list, blank=True, editable=False)  # Resized variants written, see images.py
     caption = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     def __str__(self):
         return self.caption if self.caption else f"Photo {self.id}"
     
+
+
+# Booking Hold (rooms claimed for a customer while they check out, see holds.py)
+class BookingHold(models.Model):
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_holds')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='holds')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)  # Quoted when the hold was placed
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # The sweeper reads the oldest expired holds first
+            models.Index(fields=['expires_at'], name='hold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.customer.username} - {self.category.name} ({self.start_date} to {self.end_date}) until {self.expires_at}"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
+# Idempotency Key (a submitted form or API request and the response it got, see idempotency.py)
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=50)  # The endpoint the key was used on
+    key = models.CharField(max_length=64)
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of the request, to catch a key reused for something else
+    response_status = models.PositiveSmallIntegerField(default=0)  # 0 until the request has finished
+    response_location = models.CharField(max_length=255, blank=True)
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.scope} {self.key} ({self.response_status})"
+
+
+# Room Inventory Ledger (one row per category per night)
+class RoomInventory(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='inventory')
+    date = models.DateField()
+    capacity = models.PositiveIntegerField()  # Rooms that can be sold on this night
+    sold = models.PositiveIntegerField(default=0)  # Rooms already booked on this night
+
+    class Meta:
+        unique_together = ('category', 'date')
+
+    def __str__(self):
+        return f"{self.category.name} {self.date}: {self.sold}/{self.capacity}"
+
+
+# ARI Change (nights of a category whose availability or rate changed, see ari.py)
+class AriChange(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    start_date = models.DateField()
+    end_date = models.DateField()  # Exclusive
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)  # After the change was committed
+
+    def __str__(self):
+        return f"{self.category_id} {self.start_date}..{self.end_date} at {self.changed_at}"
+
+
+# Background Job (persisted so queued work survives a restart, see jobs.py)
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # Start of the running worker's lease
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default='')  # Process that claimed the job
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+    @property
+    def duration(self):
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+
+# Daily Report Row (pre-aggregated occupancy, revenue and payments per category per day, see reports.py)
+class DailyCategoryReport(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_reports')
+    date = models.DateField()
+    capacity = models.PositiveIntegerField(default=0)  # Rooms in the category on this day
+    nights_sold = models.IntegerField(default=0)  # Rooms booked for this night
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Booked revenue earned on this night
+    payments_completed = models.IntegerField(default=0)  # Payments made on this day, by status
+    payments_pending = models.IntegerField(default=0)
+    payments_failed = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('category', 'date')
+        indexes = [
+            # Dashboard and CSV export read a date range across all categories
+            models.Index(fields=['date'], name='report_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} {self.date}: {self.nights_sold}/{self.capacity}"
+
+    @property
+    def occupancy(self):
+        return self.nights_sold * 100 / self.capacity if self.capacity else 0
+
+    @property
+    def average_rate(self):
+        return self.revenue / self.nights_sold if self.nights_sold else 0
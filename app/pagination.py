@@ -0,0 +1,104 @@
+# pagination.py
+#
+# Keyset (cursor) pagination. Instead of OFFSET, each page continues from the
+# sort key of the last row of the previous page, so page 1000 costs the same
+# as page 1 as long as the ordering is backed by an index.
+
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _plain(value):
+    # Full-precision isoformat: DjangoJSONEncoder drops microseconds, which breaks equality on the key
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=_plain, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(str(exc))
+    if not isinstance(values, list):
+        raise InvalidCursor("Cursor must encode a list")
+    return values
+
+
+def _after(fields, values):
+    # (a, b) after (x, y) in the given ordering: a > x OR (a = x AND b > y), per direction
+    condition = Q()
+    for i, field in enumerate(fields):
+        name = field.lstrip('-')
+        op = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f"{name}__{op}": values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip('-'): prev_value})
+        condition |= step
+    # Redundant bound on the leading field so the database can range-scan its index
+    leading = fields[0].lstrip('-')
+    op = 'lte' if fields[0].startswith('-') else 'gte'
+    return Q(**{f"{leading}__{op}": values[0]}) & condition
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _ordered(queryset, fields, cursor):
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise InvalidCursor("Cursor does not match the ordering")
+        queryset = queryset.filter(_after(fields, values))
+    return queryset
+
+
+def _page(items, fields, page_size, key):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(key(last) if key else [getattr(last, f.lstrip('-')) for f in fields])
+    return KeysetPage(items, next_cursor)
+
+
+def keyset_page(queryset, fields, cursor=None, page_size=50, key=None):
+    """
+    One page of ``queryset`` ordered by ``fields`` (e.g. ('-created_at', '-id')).
+    The last field must be unique so the ordering is total. For values() or
+    values_list() querysets pass ``key``, which returns a row's values for
+    ``fields``.
+    """
+    queryset = _ordered(queryset, fields, cursor)
+    return _page(list(queryset[:page_size + 1]), fields, page_size, key)
+
+
+async def akeyset_page(queryset, fields, cursor=None, page_size=50, key=None):
+    queryset = _ordered(queryset, fields, cursor)
+    return _page([item async for item in queryset[:page_size + 1]], fields, page_size, key)
@@ -0,0 +1,259 @@
+# pricing.py
+#
+# Nightly pricing engine. A category's pricing rules (seasonal prices, day-of-
+# week rates and length-of-stay discounts) are compiled into PricingRules:
+# seasons flattened into sorted, non-overlapping segments, each with its rate
+# for every weekday. Compiled rules are kept in the PRICING_CACHE_ALIAS cache
+# and dropped whenever a rule of the category changes (see signals.py), so
+# pricing a stay is a cache read, one bisect and a walk over the segments it
+# touches, without any query.
+#
+# A night costs its season's price (or the category's price outside seasons)
+# adjusted by its weekday's percentage. A stay of at least a discount's
+# min_nights gets the largest such discount off its total.
+#
+# Rules are always compiled from the primary, even in a replica-read view: a
+# lagging replica's old rules would otherwise be cached after invalidate()
+# and price bookings for up to PRICING_CACHE_TIMEOUT.
+
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import DayOfWeekRate, LengthOfStayDiscount, SeasonalPricing
+
+ONE_DAY = timedelta(days=1)
+CENTS = Decimal('0.01')
+ZERO = Decimal('0')
+
+
+def _cents(value):
+    return value.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+class Quote:
+    """Per-night breakdown and total for a stay (end date exclusive)."""
+
+    def __init__(self, category, start_date, end_date, nights, discount_percent=ZERO):
+        self.category = category
+        self.start_date = start_date
+        self.end_date = end_date
+        self.nights = nights  # list of (date, price_per_night)
+        self.subtotal = sum((price for _, price in nights), ZERO)
+        self.discount_percent = discount_percent
+        self.discount = _cents(self.subtotal * discount_percent / 100) if discount_percent else ZERO
+        self.total = self.subtotal - self.discount
+
+    @property
+    def number_of_nights(self):
+        return len(self.nights)
+
+    def as_dict(self):
+        return {
+            'category': self.category.pk,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'nights': [{'date': day.isoformat(), 'price': str(price)} for day, price in self.nights],
+            'subtotal': str(self.subtotal),
+            'discount_percent': str(self.discount_percent),
+            'discount': str(self.discount),
+            'total': str(self.total),
+        }
+
+    def __repr__(self):
+        return f"<Quote {self.category} {self.start_date}..{self.end_date} total={self.total}>"
+
+
+class PricingRules:
+    """
+    One category's rules, compiled for lookups and independent of its base
+    price (so a price change on the category needs no recompilation).
+
+    Overlapping seasons are flattened into disjoint segments: the highest
+    priority wins, then the lowest primary key, which is what the old
+    ``filter(...).first()`` lookup returned for a given night.
+    """
+
+    def __init__(self, seasons=(), weekday_rates=(), stay_discounts=()):
+        self.adjustments = [ZERO] * 7  # Percent per weekday, Monday first
+        for weekday, percent in weekday_rates:
+            self.adjustments[weekday] = percent
+        self.starts = []
+        self.ends = []  # Inclusive
+        self.weeks = []  # Per segment, the rate on each weekday
+        self._build(seasons)
+        stay_discounts = sorted(stay_discounts)
+        self.discount_nights = [nights for nights, _ in stay_discounts]
+        self.discount_percents = [percent for _, percent in stay_discounts]
+
+    def week(self, price):
+        """``price`` on each weekday, Monday first."""
+        return tuple(_cents(price * (100 + a) / 100) if a else price for a in self.adjustments)
+
+    def discount_percent(self, nights):
+        i = bisect_right(self.discount_nights, nights) - 1
+        return self.discount_percents[i] if i >= 0 else ZERO
+
+    def _build(self, seasons):
+        # seasons: (pk, start_date, end_date, price, priority); earlier in this order takes precedence
+        seasons = sorted(seasons, key=lambda s: (-s[4], s[0]))
+        if not seasons:
+            return
+
+        # Elementary boundaries: every season start and the day after every season end
+        prices = []
+        boundaries = sorted({s[1] for s in seasons} | {s[2] + ONE_DAY for s in seasons})
+        for left, right in zip(boundaries, boundaries[1:]):
+            for _, start, end, price, _ in seasons:
+                if start <= left and end >= left:
+                    last = right - ONE_DAY
+                    # Merge with the previous segment when it is contiguous and priced the same
+                    if self.ends and prices[-1] == price and self.ends[-1] + ONE_DAY == left:
+                        self.ends[-1] = last
+                    else:
+                        self.starts.append(left)
+                        self.ends.append(last)
+                        prices.append(price)
+                    break
+        self.weeks = [self.week(price) for price in prices]
+
+
+def pricing_cache():
+    return caches[settings.PRICING_CACHE_ALIAS]
+
+
+def rules_key(category_id):
+    return f'pricing:rules:{category_id}'
+
+
+def invalidate(category_id):
+    """Drop a category's compiled rules now and again once the transaction commits."""
+    # The second delete covers a reader that compiled the old rules before the commit
+    key = rules_key(category_id)
+    pricing_cache().delete(key)
+    transaction.on_commit(lambda: pricing_cache().delete(key))
+
+
+def _rule_queries(category_ids):
+    return (
+        SeasonalPricing.objects.using(DEFAULT_DB_ALIAS).filter(category_id__in=category_ids).values_list(
+            'category_id', 'pk', 'start_date', 'end_date', 'price_per_night', 'priority'
+        ),
+        DayOfWeekRate.objects.using(DEFAULT_DB_ALIAS).filter(category_id__in=category_ids).values_list(
+            'category_id', 'weekday', 'adjustment_percent'
+        ),
+        LengthOfStayDiscount.objects.using(DEFAULT_DB_ALIAS).filter(category_id__in=category_ids).values_list(
+            'category_id', 'min_nights', 'discount_percent'
+        ),
+    )
+
+
+def _compile(category_ids, seasons, weekday_rates, stay_discounts):
+    grouped = {pk: ([], [], []) for pk in category_ids}
+    for rows, position in ((seasons, 0), (weekday_rates, 1), (stay_discounts, 2)):
+        for category_id, *row in rows:
+            grouped[category_id][position].append(row)
+    compiled = {pk: PricingRules(*rules) for pk, rules in grouped.items()}
+    pricing_cache().set_many({rules_key(pk): rules for pk, rules in compiled.items()}, settings.PRICING_CACHE_TIMEOUT)
+    return compiled
+
+
+class PriceIndex:
+    """A category's compiled rules together with its base price."""
+
+    def __init__(self, base_price, rules=None):
+        self.base_price = base_price
+        self.rules = rules or PricingRules()
+        self._base_week = self.rules.week(base_price)
+
+    @classmethod
+    def for_category(cls, category):
+        return cls.for_categories([category])[category.pk]
+
+    @classmethod
+    def for_categories(cls, categories):
+        """Indexes for many categories, keyed by category pk; rules not cached yet are compiled together."""
+        keys = {rules_key(c.pk): c.pk for c in categories}
+        rules = {keys[key]: value for key, value in pricing_cache().get_many(keys).items()}
+        missing = [pk for pk in dict.fromkeys(keys.values()) if pk not in rules]
+        if missing:
+            rules.update(_compile(missing, *_rule_queries(missing)))
+        return {c.pk: cls(c.price_per_night, rules[c.pk]) for c in categories}
+
+    @classmethod
+    async def afor_categories(cls, categories):
+        keys = {rules_key(c.pk): c.pk for c in categories}
+        found = await pricing_cache().aget_many(keys)
+        rules = {keys[key]: value for key, value in found.items()}
+        missing = [pk for pk in dict.fromkeys(keys.values()) if pk not in rules]
+        if missing:
+            rows = [[row async for row in queryset] for queryset in _rule_queries(missing)]
+            rules.update(_compile(missing, *rows))
+        return {c.pk: cls(c.price_per_night, rules[c.pk]) for c in categories}
+
+    def _segment(self, day):
+        i = bisect_right(self.rules.starts, day) - 1
+        return i if i >= 0 and day <= self.rules.ends[i] else None
+
+    def price_for(self, day):
+        i = self._segment(day)
+        week = self._base_week if i is None else self.rules.weeks[i]
+        return week[day.weekday()]
+
+    def _runs(self, start_date, end_date):
+        # (first night, nights, weekday rates) for each stretch of the stay priced alike
+        starts, ends, weeks = self.rules.starts, self.rules.ends, self.rules.weeks
+        i = max(0, bisect_right(starts, start_date) - 1)
+        day = start_date
+        while day < end_date:
+            if i < len(starts) and ends[i] < day:
+                i += 1
+            elif i < len(starts) and starts[i] <= day:
+                stop = min(ends[i] + ONE_DAY, end_date)
+                yield day, (stop - day).days, weeks[i]
+                day = stop
+                i += 1
+            else:
+                stop = min(starts[i], end_date) if i < len(starts) else end_date
+                yield day, (stop - day).days, self._base_week
+                day = stop
+
+    def nights(self, start_date, end_date):
+        """Yield (date, price) for every night in [start_date, end_date)."""
+        for first, count, week in self._runs(start_date, end_date):
+            weekday = first.weekday()
+            for n in range(count):
+                yield first + timedelta(days=n), week[(weekday + n) % 7]
+
+    def subtotal(self, start_date, end_date):
+        """Sum of the nightly prices, by whole weeks per run rather than per night."""
+        total = ZERO
+        for first, count, week in self._runs(start_date, end_date):
+            weeks, rest = divmod(count, 7)
+            if weeks:
+                total += sum(week) * weeks
+            weekday = first.weekday()
+            for n in range(rest):
+                total += week[(weekday + n) % 7]
+        return total
+
+    def discount_percent(self, start_date, end_date):
+        return self.rules.discount_percent(max(0, (end_date - start_date).days))
+
+    def total(self, start_date, end_date):
+        """Same total as quote(), without building the per-night list."""
+        subtotal = self.subtotal(start_date, end_date)
+        percent = self.discount_percent(start_date, end_date)
+        return subtotal - _cents(subtotal * percent / 100) if percent else subtotal
+
+
+def quote(category, start_date, end_date, index=None):
+    """Price a stay in ``category`` from ``start_date`` to ``end_date`` (exclusive)."""
+    if index is None:
+        index = PriceIndex.for_category(category)
+    return Quote(category, start_date, end_date, list(index.nights(start_date, end_date)),
+                 index.discount_percent(start_date, end_date))
@@ -0,0 +1,144 @@
+# ratelimit.py
+#
+# Sliding-window rate limits for the endpoints that are expensive to abuse:
+# login and registration (PBKDF2 on every attempt) and booking (pricing and
+# inventory writes). RateLimitMixin checks the limits in dispatch(), before
+# the view runs, so a throttled request costs two cache round trips and no
+# password hashing, session load or SQL.
+#
+# Each rule counts requests per identity (client IP, submitted username, or
+# session cookie) in fixed windows stored in the RATELIMIT_CACHE_ALIAS cache.
+# The rate is the current window's count plus the previous window's count
+# weighted by how much of it still overlaps the sliding window, which smooths
+# out bursts at window boundaries without storing a timestamp per request.
+
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+KEY_PREFIX = 'rl'
+
+
+class Rule:
+    """At most ``limit`` requests per ``window`` seconds for each value of ``key``."""
+
+    def __init__(self, key, limit, window):
+        self.key = key  # 'ip', 'username' or 'session'
+        self.limit = limit
+        self.window = window
+
+    def __repr__(self):
+        return f"<Rule {self.key} {self.limit}/{self.window}s>"
+
+
+def rules(scope):
+    return [Rule(*rule) for rule in settings.RATELIMITS.get(scope, ())]
+
+
+def get_cache():
+    return caches[settings.RATELIMIT_CACHE_ALIAS]
+
+
+def client_ip(request):
+    return request.META.get(settings.RATELIMIT_IP_META) or request.META.get('REMOTE_ADDR', '')
+
+
+def identity(request, key):
+    """The value a rule counts by, or None when the request has none (e.g. no username posted)."""
+    if key == 'ip':
+        value = client_ip(request)
+    elif key == 'username':
+        value = request.POST.get('username', '').strip().lower()
+    elif key == 'session':
+        # The cookie value, so checking it never loads the session
+        value = request.COOKIES.get(settings.SESSION_COOKIE_NAME) or client_ip(request)
+    else:
+        raise ValueError(f"Unknown rate limit key '{key}'")
+    return value or None
+
+
+def _cache_key(scope, rule, value, window_index):
+    # Hashed so usernames and IPv6 addresses are always valid cache keys
+    digest = hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+    return f'{KEY_PREFIX}:{scope}:{rule.key}:{rule.window}:{digest}:{window_index}'
+
+
+def check(request, scope, now=None):
+    """
+    Count this request against every rule of ``scope``. Returns None when it
+    may proceed, or the number of seconds to wait before retrying. Throttled
+    requests are not counted, so a client that keeps hammering is let back in
+    as soon as its earlier requests age out.
+    """
+    if not settings.RATELIMIT_ENABLED:
+        return None
+    now = time.time() if now is None else now
+    cache = get_cache()
+
+    counters = []
+    for rule in rules(scope):
+        value = identity(request, rule.key)
+        if value is None:
+            continue
+        index, elapsed = divmod(now, rule.window)
+        current = _cache_key(scope, rule, value, int(index))
+        previous = _cache_key(scope, rule, value, int(index) - 1)
+        counters.append((rule, current, previous, elapsed))
+    if not counters:
+        return None
+
+    counts = cache.get_many([key for _, current, previous, _ in counters for key in (current, previous)])
+    retry_after = 0
+    for rule, current, previous, elapsed in counters:
+        in_current = counts.get(current, 0)
+        in_previous = counts.get(previous, 0)
+        overlap = 1 - elapsed / rule.window
+        if in_current + in_previous * overlap + 1 > rule.limit:
+            retry_after = max(retry_after, _retry_after(rule, in_current, in_previous, elapsed))
+    if retry_after:
+        return retry_after
+
+    for rule, current, _, _ in counters:
+        # add() is a no-op when the counter exists; the timeout outlives the next window
+        cache.add(current, 0, timeout=rule.window * 2)
+        try:
+            cache.incr(current)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(current, 1, timeout=rule.window * 2)
+    return None
+
+
+def _retry_after(rule, in_current, in_previous, elapsed):
+    # Seconds until the weighted count leaves room for one more request
+    room = rule.limit - 1 - in_current
+    if room >= 0 and in_previous:
+        wait = rule.window * (1 - room / in_previous) - elapsed
+    else:
+        # The current window alone is full: wait for it to end
+        wait = rule.window - elapsed
+    return max(1, math.ceil(wait))
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse("Too many requests. Please try again later.\n", status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimitMixin:
+    """Throttle a view's ``ratelimit_methods`` requests by the RATELIMITS rules of ``ratelimit_scope``."""
+
+    ratelimit_scope = None
+    ratelimit_methods = ('POST',)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.ratelimit_methods:
+            retry_after = check(request, self.ratelimit_scope)
+            if retry_after:
+                return too_many_requests(retry_after)
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,274 @@
+# reports.py
+#
+# Occupancy and revenue reporting from pre-aggregated DailyCategoryReport
+# rows. Booking and Payment signals (signals.py) apply each change as a delta
+# to the affected (category, day) rows, so the dashboard and CSV export never
+# scan Booking or Payment. rebuild() recomputes the rows from scratch, for
+# data written with bulk_create/update() or after a schema change.
+#
+# A booking earns its stored total evenly over its nights (any rounding
+# remainder on the first night); a payment counts on the day it was made.
+
+import csv
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Booking, Category, DailyCategoryReport, Payment
+from .pricing import PriceIndex
+
+CENT = Decimal('0.01')
+
+PAYMENT_FIELDS = {
+    'completed': 'payments_completed',
+    'pending': 'payments_pending',
+    'failed': 'payments_failed',
+}
+
+SUMMED_FIELDS = ('capacity', 'nights_sold', 'revenue', 'payments_completed', 'payments_pending', 'payments_failed')
+
+CSV_HEADER = (
+    'date', 'category', 'capacity', 'nights_sold', 'occupancy_pct', 'revenue', 'average_rate',
+    'payments_completed', 'payments_pending', 'payments_failed',
+)
+
+
+def booking_nights(start_date, end_date, total):
+    """(night, revenue) for every night of a stay, the total spread evenly."""
+    nights = (end_date - start_date).days
+    if nights <= 0:
+        return []
+    total = total or Decimal('0')
+    share = (total / nights).quantize(CENT, rounding=ROUND_DOWN)
+    first = total - share * (nights - 1)
+    return [(start_date + timedelta(days=i), first if i == 0 else share) for i in range(nights)]
+
+
+def booking_deltas(category_id, start_date, end_date, total, sign=1):
+    return {
+        (category_id, night): {'nights_sold': sign, 'revenue': revenue * sign}
+        for night, revenue in booking_nights(start_date, end_date, total)
+    }
+
+
+def payment_deltas(category_id, paid_at, status, sign=1):
+    field = PAYMENT_FIELDS.get(status)
+    if category_id is None or paid_at is None or field is None:
+        return {}
+    return {(category_id, timezone.localdate(paid_at)): {field: sign}}
+
+
+def merge(*deltas):
+    merged = defaultdict(lambda: defaultdict(int))
+    for delta in deltas:
+        for key, fields in delta.items():
+            for field, value in fields.items():
+                merged[key][field] += value
+    return {key: {f: v for f, v in fields.items() if v} for key, fields in merged.items()}
+
+
+def apply(deltas, capacities=None):
+    """
+    Add ``deltas`` ({(category_id, date): {field: delta}}) onto the report rows.
+
+    Rows that gain something are created first if missing, so each call costs
+    one INSERT plus one UPDATE per distinct delta per category (usually one or
+    two). Pure decrements never create rows: during a cascade delete the
+    category's rows may already be gone.
+    """
+    deltas = {key: fields for key, fields in deltas.items() if fields}
+    if not deltas:
+        return
+
+    # No savepoint inside the caller's transaction: nothing here is retried on failure
+    with transaction.atomic(savepoint=False):
+        growing = [key for key, fields in deltas.items() if any(value > 0 for value in fields.values())]
+        if growing:
+            category_ids = {category_id for category_id, _ in growing}
+            if capacities is None or not category_ids <= capacities.keys():
+                capacities = dict(Category.objects.filter(pk__in=category_ids).values_list('pk', 'number_of_rooms'))
+            DailyCategoryReport.objects.bulk_create(
+                [DailyCategoryReport(category_id=category_id, date=day, capacity=capacities[category_id])
+                 for category_id, day in growing if category_id in capacities],
+                ignore_conflicts=True,
+            )
+
+        # Nights with the same change share one UPDATE
+        groups = defaultdict(list)
+        for (category_id, day), fields in deltas.items():
+            groups[category_id, tuple(sorted(fields.items()))].append(day)
+        for (category_id, fields), days in groups.items():
+            DailyCategoryReport.objects.filter(category_id=category_id, date__in=days).update(
+                **{field: F(field) + value for field, value in fields}
+            )
+
+
+def _stay_total(category_id, start_date, end_date, total):
+    if total is not None:
+        return total
+    category = Category.objects.only('price_per_night').get(pk=category_id)
+    return PriceIndex.for_category(category).total(start_date, end_date)
+
+
+def stored_booking(pk):
+    """The booking's report-relevant fields as they are in the database, before a save."""
+    return Booking.objects.filter(pk=pk).values_list('Category_id', 'start_date', 'end_date', '_total_price').first()
+
+
+def booking_saved(booking, previous=None):
+    current = (booking.Category_id, booking.start_date, booking.end_date, booking._total_price)
+    if previous == current:
+        return
+    deltas = [booking_deltas(*current[:3], _stay_total(*current))]
+    if previous:
+        deltas.append(booking_deltas(*previous[:3], _stay_total(*previous), sign=-1))
+    capacities = None
+    if Booking.Category.is_cached(booking):
+        capacities = {booking.Category_id: booking.Category.number_of_rooms}
+    apply(merge(*deltas), capacities)
+
+
+def booking_deleted(booking):
+    apply(booking_deltas(booking.Category_id, booking.start_date, booking.end_date,
+                         _stay_total(booking.Category_id, booking.start_date, booking.end_date, booking._total_price),
+                         sign=-1))
+
+
+def stored_payment(pk):
+    return Payment.objects.filter(pk=pk).values_list('booking_id', 'booking__Category_id', 'payment_date', 'status').first()
+
+
+def _payment_category(payment, previous=None):
+    if previous and previous[0] == payment.booking_id:
+        return previous[1]
+    if Payment.booking.is_cached(payment):
+        return payment.booking.Category_id
+    return Booking.objects.filter(pk=payment.booking_id).values_list('Category_id', flat=True).first()
+
+
+def payment_saved(payment, previous=None):
+    category_id = _payment_category(payment, previous)
+    if previous == (payment.booking_id, category_id, payment.payment_date, payment.status):
+        return
+    deltas = [payment_deltas(category_id, payment.payment_date, payment.status)]
+    if previous:
+        deltas.append(payment_deltas(*previous[1:], sign=-1))
+    apply(merge(*deltas))
+
+
+def payment_deleted(payment):
+    apply(payment_deltas(_payment_category(payment), payment.payment_date, payment.status, sign=-1))
+
+
+def sync_capacity(category):
+    # Room count changed: today onwards uses the new capacity, past days keep theirs
+    DailyCategoryReport.objects.filter(category=category, date__gte=timezone.localdate()).update(
+        capacity=category.number_of_rooms
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recompute every report row from Booking and Payment; returns the number of rows written."""
+    categories = list(Category.objects.only('pk', 'price_per_night', 'number_of_rooms'))
+    indexes = None
+    rows = defaultdict(lambda: dict.fromkeys(SUMMED_FIELDS[1:], 0))
+
+    bookings = Booking.objects.values_list('Category_id', 'start_date', 'end_date', '_total_price')
+    for category_id, start_date, end_date, total in bookings.iterator(chunk_size=batch_size):
+        if total is None:
+            # Legacy row without a stored price: price it like Booking.total_price would
+            indexes = indexes or PriceIndex.for_categories(categories)
+            total = indexes[category_id].total(start_date, end_date)
+        for night, revenue in booking_nights(start_date, end_date, total):
+            row = rows[category_id, night]
+            row['nights_sold'] += 1
+            row['revenue'] += revenue
+
+    payments = (
+        Payment.objects.annotate(day=TruncDate('payment_date'))
+        .values_list('booking__Category_id', 'day', 'status')
+        .annotate(n=Count('pk'))
+        .order_by()
+    )
+    for category_id, day, status, n in payments:
+        if status in PAYMENT_FIELDS:
+            rows[category_id, day][PAYMENT_FIELDS[status]] += n
+
+    capacities = {c.pk: c.number_of_rooms for c in categories}
+    with transaction.atomic():
+        DailyCategoryReport.objects.all().delete()
+        DailyCategoryReport.objects.bulk_create(
+            (DailyCategoryReport(category_id=category_id, date=day, capacity=capacities[category_id], **fields)
+             for (category_id, day), fields in rows.items()),
+            batch_size=batch_size,
+        )
+    return len(rows)
+
+
+def _with_rates(row):
+    row['occupancy'] = row['nights_sold'] * 100 / row['capacity'] if row['capacity'] else 0
+    row['average_rate'] = row['revenue'] / row['nights_sold'] if row['nights_sold'] else 0
+    return row
+
+
+def report_rows(start_date, end_date, category=None):
+    rows = DailyCategoryReport.objects.filter(date__gte=start_date, date__lte=end_date)
+    if category is not None:
+        rows = rows.filter(category=category)
+    return rows
+
+
+def summary(start_date, end_date, category=None):
+    """Per-category totals, overall totals and per-day totals for the dashboard (three queries)."""
+    categories = Category.objects.order_by('name')
+    if category is not None:
+        categories = categories.filter(pk=getattr(category, 'pk', category))
+    categories = list(categories.values_list('pk', 'name', 'number_of_rooms'))
+    days = (end_date - start_date).days + 1
+
+    # Rows exist only for days with bookings or payments. A day without one sold
+    # nothing and counts the category's current room count as its capacity.
+    rows = report_rows(start_date, end_date, category)
+    sums = {field: Sum(field) for field in SUMMED_FIELDS}
+    stored = {row.pop('category'): row for row in rows.values('category').annotate(**sums, days=Count('pk')).order_by()}
+    by_category = []
+    for pk, name, rooms in categories:
+        row = stored.get(pk) or {'days': 0, **dict.fromkeys(SUMMED_FIELDS, 0)}
+        row['capacity'] += rooms * (days - row.pop('days'))
+        by_category.append(_with_rates({'category': pk, 'name': name, **row}))
+    totals = _with_rates({field: sum(row[field] for row in by_category) for field in SUMMED_FIELDS})
+
+    all_rooms = sum(rooms for _, _, rooms in categories)
+    by_day = []
+    for row in rows.values('date').annotate(**sums, rooms=Sum('category__number_of_rooms')).order_by('date'):
+        row['capacity'] += all_rooms - row.pop('rooms')
+        by_day.append(_with_rates(row))
+    return by_category, totals, by_day
+
+
+class _Echo:
+    # csv.writer target that hands each line straight back
+    def write(self, value):
+        return value
+
+
+def csv_lines(start_date, end_date, category=None):
+    """Yield the export as CSV lines, one row per category per day."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    rows = (
+        report_rows(start_date, end_date, category)
+        .select_related('category').only('category__name', 'date', *SUMMED_FIELDS)
+        .order_by('date', 'category__name')
+    )
+    for row in rows.iterator(chunk_size=2000):
+        yield writer.writerow((
+            row.date.isoformat(), row.category.name, row.capacity, row.nights_sold,
+            f'{row.occupancy:.1f}', row.revenue, f'{row.average_rate:.2f}',
+            row.payments_completed, row.payments_pending, row.payments_failed,
+        ))
@@ -0,0 +1,130 @@
+# routers.py
+#
+# Read-replica routing. Views that only read opt in with ReplicaReadMixin;
+# ReplicaRoutingMiddleware marks those requests and ReplicaRouter then sends
+# their reads to the 'replica' alias. Everything else (writes, sessions, and
+# any read outside such a view) goes to the primary.
+#
+# Read-your-writes: once a request writes application data the client is
+# pinned to the primary for REPLICA_STICKY_SECONDS, so e.g. the booking list
+# shown right after a booking never comes from a lagging replica.
+
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = 'replica'
+PINNED_SESSION_KEY = '_db_primary_until'
+
+# Models that must always be read from the primary
+PRIMARY_ONLY_APPS = {'sessions', 'contenttypes', 'migrations'}
+
+# Per-request routing state, set by ReplicaRoutingMiddleware
+_use_replica = ContextVar('use_replica', default=False)
+_wrote = ContextVar('wrote', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def pin_to_primary(request):
+    """Serve this client's reads from the primary for the next REPLICA_STICKY_SECONDS."""
+    request.session[PINNED_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PINNED_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaReadMixin:
+    """Marks a view whose reads may be served by the replica."""
+    read_replica = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        wrote = _wrote.get()
+        if wrote:
+            # Read our own write from the primary for the rest of the request
+            return DEFAULT_DB_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        if wrote is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            wrote.append(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication (or sync_replica locally)
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Enables replica reads for ReplicaReadMixin views and pins clients after a write."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+
+        wrote, tokens = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, wrote)
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+
+        wrote, tokens = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, wrote)
+
+    def start(self):
+        wrote = []
+        return wrote, (_wrote.set(wrote), _use_replica.set(False))
+
+    def stop(self, tokens):
+        wrote_token, replica_token = tokens
+        _use_replica.reset(replica_token)
+        _wrote.reset(wrote_token)
+
+    def finish(self, request, response, wrote):
+        if wrote and hasattr(request, 'session'):
+            pin_to_primary(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if getattr(view_class, 'read_replica', False) and replica_configured() and not is_pinned(request):
+            # Load the user from the primary first; a freshly registered one may not be replicated yet
+            if hasattr(request, 'user'):
+                request.user.is_authenticated
+            _use_replica.set(True)
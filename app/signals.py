@@ -0,0 +1,158 @@
+# signals.py
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import ari, auth, inventory, pricing, reports
+from .caching import bump_homepage_version
+from .images import delete_derivatives
+from .middleware import instrument_connection
+from .models import (
+    Booking, Category, DayOfWeekRate, LengthOfStayDiscount, Payment, Photo, SeasonalPricing, TouristLocation, User,
+)
+
+
+# Homepage content changed: move the cached fragment to a new version
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=TouristLocation)
+@receiver(post_delete, sender=TouristLocation)
+def invalidate_homepage(sender, **kwargs):
+    bump_homepage_version()
+
+
+# Remove resized variants along with the row that owned the upload
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=TouristLocation)
+def remove_image_derivatives(sender, instance, **kwargs):
+    if instance.image:
+        delete_derivatives(instance.image_derivatives, storage=instance.image.storage)
+
+
+# A new upload replaces the image: the old upload's variants go once the change is committed
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Photo)
+@receiver(pre_save, sender=TouristLocation)
+def replace_image_derivatives(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    stored = sender.objects.filter(pk=instance.pk).values_list('image', 'image_derivatives').first()
+    if stored is None or stored[0] == instance.image.name:
+        return
+    variants, storage = stored[1], instance.image.storage
+    instance.image_derivatives = []
+    transaction.on_commit(lambda: delete_derivatives(variants, storage=storage))
+
+
+# Let RequestStatsMiddleware time queries on every connection, including sync_to_async threads
+@receiver(connection_created)
+def instrument_new_connection(sender, connection, **kwargs):
+    instrument_connection(connection)
+
+
+# Occupancy and revenue reports: apply every booking/payment change to the daily rows
+@receiver(pre_save, sender=Booking)
+def remember_stored_booking(sender, instance, raw=False, **kwargs):
+    instance._report_previous = reports.stored_booking(instance.pk) if instance.pk and not raw else None
+
+
+@receiver(post_save, sender=Booking)
+def report_booking_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reports.booking_saved(instance, getattr(instance, '_report_previous', None))
+
+
+@receiver(post_delete, sender=Booking)
+def report_booking_deleted(sender, instance, **kwargs):
+    reports.booking_deleted(instance)
+
+
+# Give a deleted booking's nights back to the inventory ledger, however it was
+# deleted (instance, queryset or cascade from its customer)
+@receiver(post_delete, sender=Booking)
+def release_booking_nights(sender, instance, origin=None, **kwargs):
+    if not _category_deleted(origin):  # The category's ledger goes with it
+        inventory.release(instance.Category_id, instance.start_date, instance.end_date)
+
+
+@receiver(pre_save, sender=Payment)
+def remember_stored_payment(sender, instance, raw=False, **kwargs):
+    instance._report_previous = reports.stored_payment(instance.pk) if instance.pk and not raw else None
+
+
+@receiver(post_save, sender=Payment)
+def report_payment_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reports.payment_saved(instance, getattr(instance, '_report_previous', None))
+
+
+@receiver(post_delete, sender=Payment)
+def report_payment_deleted(sender, instance, **kwargs):
+    reports.payment_deleted(instance)
+
+
+@receiver(post_save, sender=Category)
+def report_capacity_changed(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        reports.sync_capacity(instance)
+
+
+# Drop the cached copy used by CachedModelBackend (password, role or is_active may have changed)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    auth.invalidate(instance.pk)
+
+
+def _category_deleted(origin):
+    # Cascade from a category delete: the category leaves the feed, and logging
+    # its nights would point AriChange at a row that is gone by commit time
+    return isinstance(origin, Category)
+
+
+# ARI feed: a season's nights change rate; a moved season also changes the nights it left
+@receiver(pre_save, sender=SeasonalPricing)
+def remember_stored_season(sender, instance, raw=False, **kwargs):
+    instance._ari_previous = (
+        SeasonalPricing.objects.filter(pk=instance.pk).values_list('category_id', 'start_date', 'end_date').first()
+        if instance.pk and not raw else None
+    )
+
+
+@receiver(post_save, sender=SeasonalPricing)
+@receiver(post_delete, sender=SeasonalPricing)
+def season_changed(sender, instance, raw=False, origin=None, **kwargs):
+    if raw:
+        return
+    seasons = [(instance.category_id, instance.start_date, instance.end_date)]
+    if getattr(instance, '_ari_previous', None):
+        seasons.append(instance._ari_previous)
+    for category_id, start_date, end_date in seasons:
+        pricing.invalidate(category_id)
+        if not _category_deleted(origin):
+            ari.changed_nights(category_id, start_date, end_date + timedelta(days=1))
+
+
+# Recompile a category's pricing rules on its next quote. Categories too: a new
+# one may reuse the primary key of a deleted one whose rules are still cached.
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=LengthOfStayDiscount)
+@receiver(post_delete, sender=LengthOfStayDiscount)
+def pricing_rules_changed(sender, instance, **kwargs):
+    pricing.invalidate(instance.pk if sender is Category else instance.category_id)
+
+
+@receiver(post_save, sender=DayOfWeekRate)
+@receiver(post_delete, sender=DayOfWeekRate)
+def weekday_rate_changed(sender, instance, origin=None, **kwargs):
+    pricing.invalidate(instance.category_id)
+    if not _category_deleted(origin):
+        ari.changed_category(instance.category_id)
@@ -0,0 +1,128 @@
+# staticfiles.py
+#
+# Static asset pipeline, run by `manage.py collectstatic`: files are collected
+# into STATIC_ROOT, CSS/JS is minified as it is written, names are
+# content-hashed through the manifest from the minified bytes (templates then
+# emit the hashed names, which can be cached forever), and every text asset
+# gets .gz and, if the brotli package is installed, .br siblings.
+# PrecompressedStaticMiddleware serves the variant the client accepts.
+
+import gzip
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # optional: pip install rjsmin
+    rjsmin = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.eot', '.ttf', '.ico'}
+
+# Variants in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Comments, and the literals whose contents must survive as written: strings and unquoted url()s
+_CSS_TOKEN = re.compile(r'''(/\*.*?\*/)|("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|url\([^)"']*\))''', re.S | re.I)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+# Already minified, hashed or not (app.min.css, app.min.0123456789ab.css)
+_MINIFIED = re.compile(r'\.min(\.[0-9a-f]{12})?\.(css|js)$')
+
+
+def _squeeze(css):
+    css = _CSS_SPACE.sub(' ', css)
+    return _CSS_PUNCTUATION.sub(r'\1', css).replace(';}', '}')
+
+
+def minify_css(css):
+    """Conservative CSS minifier: comments and redundant whitespace only, strings and selectors are left alone."""
+    parts = []
+    code = ''
+    # Scan left to right so "/*" inside a string is not taken for a comment, nor a quote inside a comment for a string
+    position = 0
+    for match in _CSS_TOKEN.finditer(css):
+        comment, literal = match.groups()
+        code += css[position:match.start()]
+        position = match.end()
+        if comment and not comment.startswith('/*!'):  # keeps /*! license */ comments
+            code += ' '  # a comment still separates the tokens around it
+            continue
+        parts += [_squeeze(code), comment or literal]
+        code = ''
+    parts.append(_squeeze(code + css[position:]))
+    return ''.join(parts).strip()
+
+
+def minify(name, data):
+    if _MINIFIED.search(name):
+        return data
+    if name.endswith('.css'):
+        return minify_css(data.decode('utf-8')).encode('utf-8')
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+def compress(path):
+    """Write .gz/.br next to ``path`` when they are smaller; returns {encoding: size}."""
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+
+    written = {}
+    for encoding, suffix in ENCODINGS:
+        payload = variants.get(encoding)
+        if payload is not None and len(payload) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as fh:
+                fh.write(payload)
+            written[encoding] = len(payload)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+class FingerprintedStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            # Templates and vendor CSS reference a few files that are not in app/static; serve
+            # those unhashed instead of failing the whole page (or collectstatic)
+            return name
+
+    def file_hash(self, name, content=None):
+        # Hash the bytes that are served, i.e. after minification
+        if content is not None and name and name.endswith(('.css', '.js')):
+            content = ContentFile(minify(name, b''.join(content.chunks())))
+        return super().file_hash(name, content)
+
+    def _save(self, name, content):
+        # Both the collected copy and the hashed copy are written minified
+        if name.endswith(('.css', '.js')):
+            content = ContentFile(minify(name, b''.join(content.chunks())))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            self.optimize(name)
+
+    def optimize(self, name):
+        path = self.path(name)
+        if os.path.isfile(path) and os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            compress(path)
@@ -0,0 +1,15 @@
+from django import template
+
+from app import images
+
+register = template.Library()
+
+
+# {{ photo.image|srcset }} or {{ photo.image|srcset:"webp" }}
+@register.filter
+def srcset(image, fmt='jpg'):
+    if not image:
+        return ''
+    # Reads the variants recorded on the row; no storage lookups while rendering
+    variants = getattr(image.instance, 'image_derivatives', None)
+    return images.srcset(image.name, variants, fmt=fmt, storage=image.storage)
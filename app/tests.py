@@ -1,3 +1,1067 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ari, holds, images, jobs, pricing, reports, routers, staticfiles, transfer
+from .caching import homepage_version
+from .templatetags.images import srcset
+from .forms import SeasonalPricingForm
+from .inventory import RoomsUnavailable, release, reserve
+from .middleware import QueryBudgetExceeded, stats_snapshot
+from .pagination import encode_cursor
+from .ratelimit import get_cache as ratelimit_cache
+from .models import *
+from .views import AdminBookingListView
+
+
+# Every page below must stay within its QUERY_BUDGETS entry in settings.py
+@override_settings(QUERY_BUDGET_ENFORCE=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        cls.customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        cls.categories = [
+            Category.objects.create(name=f'Room {i}', price_per_night=Decimal('1000.00'), number_of_rooms=3,
+                                     image='category/img_2.jpg')
+            for i in range(5)
+        ]
+        start = timezone.now().date() + timedelta(days=10)
+        for category in cls.categories:
+            SeasonalPricing.objects.create(category=category, start_date=start, end_date=start + timedelta(days=3),
+                                           price_per_night=Decimal('1500.00'))
+            for i in range(3):
+                Booking.objects.create(customer=cls.customer, Category=category, start_date=start + timedelta(days=i),
+                                       end_date=start + timedelta(days=i + 2))
+        cls.start = start
+
+    def test_public_pages(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('availability'), {
+            'start_date': self.start, 'end_date': self.start + timedelta(days=5), 'guests': 2,
+        })
+
+    def test_customer_pages(self):
+        self.client.force_login(self.customer)
+        self.client.get(reverse('booking_list'))
+        self.client.get(reverse('booking_add', args=[self.categories[0].pk]))
+
+    def test_admin_pages(self):
+        self.client.force_login(self.admin)
+        for name in ('admin_reservations', 'seasonalpricing_list', 'category_list', 'touristlocation_list', 'photo_list',
+                     'adminindex'):
+            self.client.get(reverse(name))
+
+    def test_booking_post(self):
+        self.client.force_login(self.customer)
+        start = self.start + timedelta(days=20)
+        response = self.client.post(reverse('booking_add', args=[self.categories[0].pk]), {
+            'Category': self.categories[0].pk, 'start_date': start, 'end_date': start + timedelta(days=2),
+            'name': 'Guest', 'email': 'guest@example.com', 'phone_number': '9999999999',
+            'payment_method': 'cash', 'number_of_guests': 2, 'idempotency_key': 'budget',
+        })
+        self.assertRedirects(response, reverse('booking_list'), fetch_redirect_response=False)
+
+    @override_settings(QUERY_BUDGETS={'booking_list': 1})
+    def test_budget_exceeded(self):
+        self.client.force_login(self.customer)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('booking_list'))
+
+    def test_server_timing_and_stats(self):
+        response = self.client.get(reverse('index'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertGreaterEqual(stats_snapshot()['index']['requests'], 1)
+
+
+# Racing threads need the SQLite production profile: IMMEDIATE transactions wait
+# on busy_timeout instead of failing with "database is locked" on lock upgrade
+class SqliteProfileMixin:
+    def setUp(self):
+        if connection.vendor == 'sqlite':
+            # Threads build their connections from connections.settings, not from this connection
+            for settings_dict in (connections.settings[connection.alias], connection.settings_dict):
+                self.enterContext(mock.patch.dict(settings_dict, OPTIONS=settings.SQLITE_PROFILE_OPTIONS))
+            connection.close()
+            connection.ensure_connection()  # switch the file to WAL before the threads connect
+        super().setUp()
+
+
+# Many customers racing for the last room: exactly one hold may win
+@override_settings(BOOKING_HOLD_SWEEP_INTERVAL=0)
+class BookingHoldContentionTests(SqliteProfileMixin, TransactionTestCase):
+    workers = 12
+
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Last Room', price_per_night=Decimal('1000.00'), number_of_rooms=1)
+        self.customers = [User.objects.create(username=f'guest{i}', email=f'guest{i}@example.com')
+                          for i in range(self.workers)]
+        self.start = timezone.now().date() + timedelta(days=30)
+        self.end = self.start + timedelta(days=3)
+
+    def race(self):
+        barrier = threading.Barrier(self.workers)
+        results = []
+
+        def attempt(customer):
+            try:
+                barrier.wait()
+                results.append(holds.place(customer, self.category, self.start, self.end))
+            except RoomsUnavailable:
+                results.append(None)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(customer,)) for customer in self.customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [hold for hold in results if hold is not None], len(results)
+
+    def sold(self):
+        return list(RoomInventory.objects.filter(category=self.category).order_by('date').values_list('sold', flat=True))
+
+    def test_one_hold_wins_the_last_room(self):
+        won, attempts = self.race()
+        self.assertEqual(attempts, self.workers)
+        self.assertEqual(len(won), 1)
+        self.assertEqual(BookingHold.objects.count(), 1)
+        self.assertEqual(self.sold(), [1, 1, 1])
+
+        booking = holds.confirm(won[0], Booking())
+        self.assertEqual(booking.total_price, Decimal('3000.00'))
+        self.assertEqual(BookingHold.objects.count(), 0)
+        self.assertEqual(self.sold(), [1, 1, 1])
+
+    def test_expired_hold_is_swept_and_room_resold(self):
+        won, _ = self.race()
+        BookingHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(holds.HoldExpired):
+            holds.confirm(won[0], Booking())
+
+        self.assertEqual(holds.sweep(), 1)
+        self.assertEqual(self.sold(), [0, 0, 0])
+        won, _ = self.race()
+        self.assertEqual(len(won), 1)
+
+
+# Double clicks and client retries of one booking submission: exactly one booking
+@override_settings(BOOKING_HOLD_SWEEP_INTERVAL=0)
+class IdempotentBookingTests(SqliteProfileMixin, TransactionTestCase):
+    workers = 8
+
+    def setUp(self):
+        super().setUp()
+        self.customer = User.objects.create(username='guest', email='guest@example.com')
+        self.category = Category.objects.create(name='Garden', price_per_night=Decimal('1000.00'), number_of_rooms=5)
+        self.url = reverse('booking_add', args=[self.category.pk])
+        start = timezone.now().date() + timedelta(days=30)
+        self.data = {
+            'Category': self.category.pk, 'start_date': start, 'end_date': start + timedelta(days=2),
+            'name': 'Guest', 'email': 'guest@example.com', 'phone_number': '9999999999',
+            'payment_method': 'cash', 'number_of_guests': 2, 'idempotency_key': 'f00d',
+        }
+
+    def client_for(self):
+        client = Client()
+        client.force_login(self.customer)
+        return client
+
+    def sold(self):
+        return list(RoomInventory.objects.filter(category=self.category).values_list('sold', flat=True))
+
+    def test_concurrent_duplicates_book_once(self):
+        clients = [self.client_for() for _ in range(self.workers)]
+        barrier = threading.Barrier(self.workers)
+        responses = []
+
+        def submit(client):
+            try:
+                barrier.wait()
+                responses.append(client.post(self.url, self.data))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses), self.workers)
+        self.assertEqual({(r.status_code, r['Location']) for r in responses}, {(302, reverse('booking_list'))})
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.sold(), [1, 1])
+        self.assertEqual(sum(r.has_header('Idempotent-Replayed') for r in responses), self.workers - 1)
+
+    def test_retry_replays_without_pricing_or_inventory(self):
+        client = self.client_for()
+        client.post(self.url, self.data)
+        with self.assertNumQueries(1):  # the key lookup; session and user come from the cache
+            response = client.post(self.url, self.data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.sold(), [1, 1])
+
+    def test_key_reused_for_another_request(self):
+        client = self.client_for()
+        client.post(self.url, self.data)
+        response = client.post(self.url, dict(self.data, number_of_guests=3))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_without_key_every_submission_books(self):
+        client = self.client_for()
+        data = {k: v for k, v in self.data.items() if k != 'idempotency_key'}
+        client.post(self.url, data)
+        client.post(self.url, data)
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+@override_settings(RATELIMITS={'login': [('ip', 3, 60), ('username', 2, 60)]})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit_cache().clear()
+
+    def test_throttled_before_any_query(self):
+        for i in range(3):
+            self.assertEqual(self.client.post(reverse('login'), {'username': f'u{i}', 'password': 'x'}).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('login'), {'username': 'u9', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_username_limit_spans_addresses(self):
+        for i in range(2):
+            self.client.post(reverse('login'), {'username': 'Victim', 'password': 'x'}, REMOTE_ADDR=f'10.0.0.{i}')
+        response = self.client.post(reverse('login'), {'username': 'victim', 'password': 'x'}, REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+
+
+# A second connection to the test database stands in for the replica; committed
+# rows (TransactionTestCase) are visible to it, and query_only rejects any write
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        replica = dict(connections.settings[connection.alias], OPTIONS={'init_command': 'PRAGMA query_only=ON'})
+        self.enterContext(mock.patch.dict(connections.settings, {routers.REPLICA_ALIAS: replica}))
+        # The alias did not exist when the class was set up, so allow it for this test only
+        self.enterContext(mock.patch.object(type(self), 'databases', {connection.alias, routers.REPLICA_ALIAS}))
+        self.enterContext(mock.patch.object(routers, 'replica_configured', return_value=True))
+        self.enterContext(override_settings(DATABASE_ROUTERS=['app.routers.ReplicaRouter'], RATELIMIT_ENABLED=False))
+        self.addCleanup(connections[routers.REPLICA_ALIAS].close)
+
+        self.customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        self.category = Category.objects.create(name='Garden', price_per_night=Decimal('1000.00'), number_of_rooms=5)
+
+    def booking_reads(self, client):
+        # Queries on the booking table per alias while the client loads its booking list
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[routers.REPLICA_ALIAS]) as replica:
+            response = client.get(reverse('booking_list'))
+        self.assertContains(response, 'Garden')
+        return [sum('"app_booking"' in query['sql'] for query in queries.captured_queries)
+                for queries in (primary, replica)]
+
+    def test_reads_follow_the_clients_writes(self):
+        client = Client()
+        client.force_login(self.customer)
+        start = timezone.localdate() + timedelta(days=30)
+        response = client.post(reverse('booking_add', args=[self.category.pk]), {
+            'start_date': start, 'end_date': start + timedelta(days=2), 'name': 'Guest', 'email': 'guest@example.com',
+            'phone_number': '9999999999', 'payment_method': 'cash', 'number_of_guests': 2,
+        })
+        self.assertRedirects(response, reverse('booking_list'), fetch_redirect_response=False)
+        self.assertGreater(client.session[routers.PINNED_SESSION_KEY], 0)
+
+        # The client that booked reads its booking from the primary; anyone else from the replica
+        self.assertEqual(self.booking_reads(client), [1, 0])
+        other = Client()
+        other.force_login(self.customer)
+        self.assertEqual(self.booking_reads(other), [0, 1])
+
+
+class CachedAuthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries.captured_queries
+                          if '"app_user"' in q['sql'] or '"django_session"' in q['sql']]
+
+    def test_warm_request_skips_user_and_session_queries(self):
+        self.client.get(reverse('booking_list'))
+        response, queries = self.auth_queries(reverse('booking_list'))
+        self.assertEqual((response.status_code, queries), (200, []))
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.assertEqual(self.client.get(reverse('request_stats')).status_code, 403)
+        self.user.role = 'admin'
+        self.user.save()
+        response, queries = self.auth_queries(reverse('request_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)  # The user, reloaded once
+
+        # A new password signs the old session out
+        self.user.set_password('new password')
+        self.user.save()
+        response, _ = self.auth_queries(reverse('booking_list'))
+        self.assertEqual(response.status_code, 302)
+
+
+class HomepageCacheTests(TestCase):
+    def test_saving_a_category_refreshes_the_cached_fragment(self):
+        category = Category.objects.create(name='Garden Suite', price_per_night=Decimal('1000.00'), number_of_rooms=2)
+        self.assertContains(self.client.get('/'), 'Garden Suite')
+        version = homepage_version()
+        with self.assertNumQueries(0):  # Served from the cached fragment
+            self.assertContains(self.client.get('/'), 'Garden Suite')
+
+        category.name = 'Lakeside Suite'
+        category.save()
+        self.assertGreater(homepage_version(), version)
+        response = self.client.get('/')
+        self.assertContains(response, 'Lakeside Suite')
+        self.assertNotContains(response, 'Garden Suite')
+
+
+class ReservationListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        cls.garden, lake = (Category.objects.create(name=name, price_per_night=Decimal('1000.00'), number_of_rooms=9)
+                            for name in ('Garden', 'Lake'))
+        day = timezone.localdate() + timedelta(days=10)
+        bookings = Booking.objects.bulk_create(
+            Booking(customer=customer, Category=(cls.garden, lake)[i % 2], start_date=day + timedelta(days=i),
+                    end_date=day + timedelta(days=i + 2), _total_price=Decimal('2000.00'))
+            for i in range(9)
+        )
+        # Several bookings share a created_at, so the id decides their order
+        now = timezone.now()
+        for i, booking in enumerate(bookings):
+            Booking.objects.filter(pk=booking.pk).update(created_at=now - timedelta(minutes=i // 3))
+        cls.day = day
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.enterContext(mock.patch.object(AdminBookingListView, 'paginate_by', 2))
+
+    def walk(self, **filters):
+        pks, cursor = [], None
+        while True:
+            params = dict(filters, cursor=cursor) if cursor else filters
+            response = self.client.get(reverse('admin_reservations'), params)
+            self.assertEqual(response.status_code, 200)
+            pks += [booking.pk for booking in response.context['reservations']]
+            cursor = response.context['page_obj'].next_cursor
+            if cursor is None:
+                return pks
+
+    def test_pages_cover_every_booking_once(self):
+        expected = list(Booking.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(), expected)
+
+    def test_filters_compose_with_the_cursor(self):
+        start, end = self.day + timedelta(days=3), self.day + timedelta(days=7)
+        expected = list(
+            Booking.objects.filter(Category=self.garden, end_date__gt=start, start_date__lt=end)
+            .order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(self.walk(category=self.garden.pk, start_date=start, end_date=end), expected)
+
+    def test_tampered_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', encode_cursor([1]), encode_cursor(['yesterday', 1])):
+            response = self.client.get(reverse('admin_reservations'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+class AdminAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='admin')
+        cls.customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        cls.urls = [
+            reverse('data_transfer'),
+            reverse('data_export', args=['categories', 'csv']),
+            reverse('report_export'),
+            reverse('api_ari'),
+            reverse('job_stats'),
+            reverse('request_stats'),
+            reverse('admin_reservations'),
+        ]
+
+    def test_customers_are_forbidden(self):
+        self.client.force_login(self.customer)
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 403, url)
+
+    def test_anonymous_users_are_sent_to_login(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 302, url)
+
+    def test_admins_are_let_through(self):
+        self.client.force_login(self.admin)
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+class AvailabilitySearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Garden', price_per_night=Decimal('1000.00'), number_of_rooms=2,
+                                                max_guests=2)
+        start = timezone.localdate() + timedelta(days=10)
+        self.stay = {'start_date': start, 'end_date': start + timedelta(days=2), 'guests': 2}
+        self.backwards = dict(self.stay, end_date=start - timedelta(days=1))
+
+    def test_search(self):
+        response = self.client.get(reverse('availability'), self.stay)
+        self.assertContains(response, 'Garden')
+        self.assertContains(response, '2000.00')
+
+        response = self.client.get(reverse('availability'), dict(self.stay, format='json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['name'], r['rooms_left'], r['quote']['total']) for r in response.json()['results']],
+                         [('Garden', 2, '2000.00')])
+
+    def test_invalid_date_range(self):
+        response = self.client.get(reverse('availability'), self.backwards)
+        self.assertContains(response, 'End date must be after the start date.')
+        self.assertIsNone(response.context['results'])
+
+        response = self.client.get(reverse('availability'), dict(self.backwards, format='json'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors']['__all__'][0]['message'], 'End date must be after the start date.')
+
+        # The quote API shares the checks
+        response = self.client.get(reverse('api_quote', args=[self.category.pk]), self.backwards)
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='guest', email='guest@example.com')
+        cls.other = User.objects.create(username='other', email='other@example.com')
+        cls.category = Category.objects.create(name='Deluxe', price_per_night=Decimal('1000.00'), number_of_rooms=3)
+        start = timezone.now().date() + timedelta(days=10)
+        for customer in (cls.customer, cls.other):
+            Booking.objects.create(customer=customer, Category=cls.category, start_date=start,
+                                   end_date=start + timedelta(days=2))
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse('api_list', args=['categories'])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_sparse_fields_and_cursor(self):
+        Category.objects.create(name='Standard', price_per_night=Decimal('500.00'), number_of_rooms=2)
+        page = self.client.get(reverse('api_list', args=['categories']), {'fields': 'id,name', 'limit': 1}).json()
+        self.assertEqual(page['data'], [{'id': self.category.pk, 'name': 'Deluxe'}])
+        self.assertEqual(self.client.get(page['next']).json()['data'][0]['name'], 'Standard')
+        response = self.client.get(reverse('api_list', args=['categories']), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_customers_only_see_their_bookings(self):
+        url = reverse('api_list', args=['bookings'])
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.customer)
+        bookings = self.client.get(url).json()['data']
+        self.assertEqual([b['customer'] for b in bookings], [self.customer.pk])
+        other = Booking.objects.get(customer=self.other)
+        self.assertEqual(self.client.get(reverse('api_detail', args=['bookings', other.pk])).status_code, 404)
+
+
+class AriFeedTests(TestCase):
+    def setUp(self):
+        ari.ari_cache().clear()
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Deluxe', price_per_night=Decimal('1000.00'), number_of_rooms=2)
+            SeasonalPricing.objects.create(category=self.category, start_date=self.today + timedelta(days=5),
+                                           end_date=self.today + timedelta(days=6), price_per_night=Decimal('1500.00'))
+
+    def ranges(self, feed):
+        return [(r['start_date'], r['end_date'], r['available'], r['rate']) for r in feed['categories'][0]['ranges']]
+
+    def night(self, days):
+        return (self.today + timedelta(days=days)).isoformat()
+
+    def test_booking_updates_cached_grid_and_delta(self):
+        first = ari.feed(self.today, 10)
+        self.assertEqual(self.ranges(first), [
+            (self.night(0), self.night(4), 2, '1000.00'),
+            (self.night(5), self.night(6), 2, '1500.00'),
+            (self.night(7), self.night(9), 2, '1000.00'),
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve(self.category, self.today + timedelta(days=1), self.today + timedelta(days=3))
+
+        since = timezone.datetime.fromisoformat(first['generated_at'])
+        self.assertEqual(self.ranges(ari.feed(self.today, 10, since=since)), [
+            (self.night(1), self.night(2), 1, '1000.00'),
+        ])
+        self.assertIn((self.night(1), self.night(2), 1, '1000.00'), self.ranges(ari.feed(self.today, 10)))
+
+    def test_nothing_changed_since(self):
+        first = ari.feed(self.today, 10)
+        since = timezone.datetime.fromisoformat(first['generated_at'])
+        self.assertEqual(ari.feed(self.today, 10, since=since)['categories'], [])
+
+
+# app.pricing against the per-night lookup BookingCreateView used before it
+class PricingTests(TestCase):
+    def setUp(self):
+        pricing.pricing_cache().clear()
+        self.day = timezone.datetime(2030, 3, 1).date()
+        self.category = Category.objects.create(name='Garden', price_per_night=Decimal('100.00'), number_of_rooms=2)
+        for first, last, price in ((3, 5, '150.00'), (6, 9, '200.00')):
+            SeasonalPricing.objects.create(category=self.category, start_date=self.day + timedelta(days=first),
+                                           end_date=self.day + timedelta(days=last), price_per_night=Decimal(price))
+
+    def legacy_nights(self, start, end):
+        nights = []
+        while start < end:
+            season = SeasonalPricing.objects.filter(category=self.category, start_date__lte=start,
+                                                    end_date__gte=start).first()
+            nights.append((start, season.price_per_night if season else self.category.price_per_night))
+            start += timedelta(days=1)
+        return nights
+
+    def assertPricedLikeLegacy(self, first, last):
+        start, end = self.day + timedelta(days=first), self.day + timedelta(days=last)
+        quote = pricing.quote(self.category, start, end)
+        self.assertEqual(quote.nights, self.legacy_nights(start, end))
+        self.assertEqual(quote.total, sum(price for _, price in quote.nights))
+        self.assertEqual(pricing.PriceIndex.for_category(self.category).total(start, end), quote.total)
+        return [price for _, price in quote.nights]
+
+    def test_base_price_outside_seasons(self):
+        self.assertEqual(self.assertPricedLikeLegacy(0, 3), [Decimal('100.00')] * 3)
+        self.assertEqual(self.assertPricedLikeLegacy(10, 12), [Decimal('100.00')] * 2)
+
+    def test_season_boundaries(self):
+        # The last night before a season, its first and last (end_date is included) and the night after
+        self.assertEqual(self.assertPricedLikeLegacy(2, 4), [Decimal('100.00'), Decimal('150.00')])
+        self.assertEqual(self.assertPricedLikeLegacy(9, 11), [Decimal('200.00'), Decimal('100.00')])
+
+    def test_stay_across_two_seasons(self):
+        self.assertEqual(self.assertPricedLikeLegacy(4, 8), [Decimal('150.00'), Decimal('150.00'),
+                                                             Decimal('200.00'), Decimal('200.00')])
+        self.assertPricedLikeLegacy(0, 14)
+
+    def nights(self, first, last):
+        return {'start_date': self.day + timedelta(days=first), 'end_date': self.day + timedelta(days=last)}
+
+    def test_booking_keeps_its_stored_price(self):
+        customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        booking = Booking.objects.create(customer=customer, Category=self.category, **self.nights(4, 7))
+        self.assertEqual(booking.total_price, Decimal('500.00'))
+
+        self.category.price_per_night = Decimal('999.00')
+        self.category.save()
+        for season in SeasonalPricing.objects.all():
+            season.price_per_night = Decimal('999.00')
+            season.save()
+        for frozen in (False, True):
+            with override_settings(BOOKING_FROZEN_PRICES=frozen):
+                self.assertEqual(Booking.objects.get(pk=booking.pk).total_price, Decimal('500.00'))
+
+    def test_backfill_fills_only_missing_prices(self):
+        customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        # bulk_create skips Booking.save(), like rows from before prices were stored
+        Booking.objects.bulk_create([
+            Booking(customer=customer, Category=self.category, **self.nights(0, 4)),
+            Booking(customer=customer, Category=self.category, _total_price=Decimal('1234.00'), **self.nights(4, 7)),
+        ])
+        with override_settings(BOOKING_FROZEN_PRICES=True):
+            self.assertIsNone(Booking.objects.order_by('pk').first().total_price)
+
+        stored = Booking.objects.order_by('pk').values_list('_total_price', flat=True)
+        call_command('backfill_booking_prices', stdout=io.StringIO())
+        self.assertEqual(list(stored), [Decimal('450.00'), Decimal('1234.00')])
+        out = io.StringIO()
+        call_command('backfill_booking_prices', stdout=out)
+        self.assertIn('Nothing to backfill.', out.getvalue())
+        self.assertEqual(list(stored), [Decimal('450.00'), Decimal('1234.00')])
+
+
+class PricingRulesTests(TestCase):
+    def setUp(self):
+        pricing.pricing_cache().clear()
+        self.monday = timezone.datetime(2030, 1, 7).date()
+        self.category = Category.objects.create(name='Deluxe', price_per_night=Decimal('100.00'), number_of_rooms=2)
+        # Two overlapping seasons: the higher priority wins on the shared nights
+        self.season = SeasonalPricing.objects.create(
+            category=self.category, start_date=self.monday, end_date=self.monday + timedelta(days=3),
+            price_per_night=Decimal('200.00'),
+        )
+        SeasonalPricing.objects.create(
+            category=self.category, start_date=self.monday + timedelta(days=2), end_date=self.monday + timedelta(days=4),
+            price_per_night=Decimal('300.00'), priority=1,
+        )
+        DayOfWeekRate.objects.create(category=self.category, weekday=5, adjustment_percent=Decimal('10'))
+        LengthOfStayDiscount.objects.create(category=self.category, min_nights=7, discount_percent=Decimal('5'))
+
+    def test_priority_weekday_and_stay_discount(self):
+        end = self.monday + timedelta(days=7)
+        quote = pricing.quote(self.category, self.monday, end)
+        self.assertEqual([price for _, price in quote.nights], [
+            Decimal('200.00'), Decimal('200.00'), Decimal('300.00'), Decimal('300.00'), Decimal('300.00'),
+            Decimal('110.00'), Decimal('100.00'),
+        ])
+        self.assertEqual(quote.discount, Decimal('75.50'))
+        self.assertEqual(quote.total, Decimal('1434.50'))
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.PriceIndex.for_category(self.category).total(self.monday, end), quote.total)
+
+    def test_season_change_recompiles_rules(self):
+        pricing.quote(self.category, self.monday, self.monday + timedelta(days=1))
+        self.season.price_per_night = Decimal('250.00')
+        self.season.save()
+        self.assertEqual(pricing.quote(self.category, self.monday, self.monday + timedelta(days=1)).total,
+                         Decimal('250.00'))
+
+    @override_settings(DATABASE_ROUTERS=['app.routers.ReplicaRouter'])
+    def test_rules_compile_from_the_primary(self):
+        token = routers._use_replica.set(True)
+        try:
+            self.assertEqual({queryset.db for queryset in pricing._rule_queries([self.category.pk])}, {'default'})
+        finally:
+            routers._use_replica.reset(token)
+
+    def test_overlap_needs_another_priority(self):
+        data = {'category': self.category.pk, 'start_date': self.monday + timedelta(days=1),
+                'end_date': self.monday + timedelta(days=2), 'price_per_night': '150.00', 'priority': 0}
+        self.assertFalse(SeasonalPricingForm(data).is_valid())
+        data['priority'] = 2
+        self.assertTrue(SeasonalPricingForm(data).is_valid())
+
+
+class JobLeaseTests(TestCase):
+    def test_only_expired_leases_are_requeued(self):
+        now = timezone.now()
+        fresh = Job.objects.create(task='generate_derivatives', status='running', worker='other', started_at=now)
+        stale = Job.objects.create(task='generate_derivatives', status='running', worker='gone',
+                                   started_at=now - timedelta(seconds=settings.JOBS_LEASE + 1))
+        self.assertEqual(jobs.requeue_expired(now), 1)
+        fresh.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((fresh.status, stale.status, stale.worker), ('running', 'queued', ''))
+        self.assertEqual(jobs.queued_jobs(), [stale.pk])
+
+    def test_claimed_job_is_not_run_again(self):
+        job = Job.objects.create(task='generate_derivatives', status='running', worker='other',
+                                 started_at=timezone.now())
+        jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), ('running', 'other', 0))
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        self.category = Category.objects.create(name='Deluxe', price_per_night=Decimal('100.00'), number_of_rooms=2)
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def book(self, start, nights, total):
+        return Booking.objects.create(customer=self.customer, Category=self.category, _total_price=Decimal(total),
+                                      start_date=self.day + timedelta(days=start),
+                                      end_date=self.day + timedelta(days=start + nights))
+
+    def sold(self):
+        return dict(DailyCategoryReport.objects.filter(nights_sold__gt=0).values_list('date', 'revenue'))
+
+    def test_booking_deltas(self):
+        booking = self.book(0, 3, '301.00')
+        self.assertEqual(self.sold(), {
+            self.day: Decimal('100.34'), self.day + timedelta(days=1): Decimal('100.33'),
+            self.day + timedelta(days=2): Decimal('100.33'),
+        })
+        booking.start_date += timedelta(days=2)
+        booking.end_date = booking.start_date + timedelta(days=1)
+        booking._total_price = Decimal('120.00')
+        booking.save()
+        self.assertEqual(self.sold(), {self.day + timedelta(days=2): Decimal('120.00')})
+        booking.delete()
+        self.assertEqual(self.sold(), {})
+
+    def test_summary_counts_days_without_activity(self):
+        self.book(0, 1, '100.00')
+        by_category, totals, by_day = reports.summary(self.day, self.day + timedelta(days=29))
+        self.assertEqual((by_category[0]['capacity'], by_category[0]['nights_sold']), (60, 1))
+        self.assertAlmostEqual(totals['occupancy'], 100 / 60)
+        self.assertEqual([(row['date'], row['occupancy']) for row in by_day], [(self.day, 50)])
+
+    def test_rebuild_matches_incremental_rows(self):
+        booking = self.book(0, 2, '250.00')
+        self.book(1, 3, '300.00').delete()
+        Payment.objects.create(booking=booking, amount=Decimal('250.00'), status='completed', transaction_id='t1')
+        fields = ('category_id', 'date', 'capacity', 'nights_sold', 'revenue', 'payments_completed')
+        incremental = set(DailyCategoryReport.objects.exclude(nights_sold=0, payments_completed=0).values_list(*fields))
+        reports.rebuild()
+        self.assertEqual(set(DailyCategoryReport.objects.values_list(*fields)), incremental)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        self.category = Category.objects.create(name='Garden', price_per_night=Decimal('1000.00'), number_of_rooms=2)
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def nights(self, first, last):
+        return self.day + timedelta(days=first), self.day + timedelta(days=last)
+
+    def sold(self):
+        return list(RoomInventory.objects.filter(category=self.category).order_by('date').values_list('sold', flat=True))
+
+    def book(self, first, last):
+        start, end = self.nights(first, last)
+        reserve(self.category, start, end)
+        return Booking.objects.create(customer=self.customer, Category=self.category, start_date=start, end_date=end)
+
+    def test_last_room_and_partial_claim_rolls_back(self):
+        reserve(self.category, *self.nights(1, 2))
+        reserve(self.category, *self.nights(1, 2))
+        with self.assertRaises(RoomsUnavailable):
+            reserve(self.category, *self.nights(1, 2))
+        # Night 0 is free but night 1 is not: nothing of the stay is claimed (not even night 0's row)
+        with self.assertRaises(RoomsUnavailable):
+            reserve(self.category, *self.nights(0, 2))
+        self.assertEqual(self.sold(), [2])
+        release(self.category, *self.nights(1, 2))
+        reserve(self.category, *self.nights(0, 2))
+        self.assertEqual(self.sold(), [1, 2])
+
+    def test_deletes_free_the_nights(self):
+        self.book(0, 2).delete()
+        self.assertEqual(self.sold(), [0, 0])
+        self.book(0, 2)
+        Booking.objects.filter(customer=self.customer).delete()
+        self.assertEqual(self.sold(), [0, 0])
+        self.book(0, 2)
+        self.customer.delete()  # Cascades to the booking
+        self.assertEqual(self.sold(), [0, 0])
+
+    def test_sweep_releases_only_the_holds_it_deletes(self):
+        from django.db.models.query import QuerySet
+
+        first, second = (holds.place(self.customer, self.category, *self.nights(0, 1)) for _ in range(2))
+        BookingHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        delete = QuerySet.delete
+
+        def confirm_first_meanwhile(queryset):
+            # A confirm deletes the hold between the sweep's SELECT and its DELETE
+            delete(BookingHold.objects.filter(pk=first.pk))
+            return delete(queryset)
+
+        with mock.patch.object(QuerySet, 'delete', autospec=True, side_effect=confirm_first_meanwhile):
+            self.assertEqual(holds.sweep(), 1)
+        self.assertEqual(self.sold(), [1])  # The confirmed hold's room stays sold
+
+    def test_restore_capacity_updates_reports_and_homepage(self):
+        self.book(0, 2)
+        version = homepage_version()
+        call_command('rebuild_inventory', restore_capacity=True, stdout=io.StringIO())
+        self.assertEqual(Category.objects.get(pk=self.category.pk).number_of_rooms, 3)
+        self.assertEqual(set(RoomInventory.objects.values_list('capacity', flat=True)), {3})
+        self.assertEqual(set(DailyCategoryReport.objects.values_list('capacity', flat=True)), {3})
+        self.assertGreater(homepage_version(), version)
+
+    def test_cancelled_hold_frees_the_nights(self):
+        hold = holds.place(self.customer, self.category, *self.nights(0, 2))
+        self.assertEqual(self.sold(), [1, 1])
+        holds.cancel(hold)
+        self.assertEqual(self.sold(), [0, 0])
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('guest', 'guest@example.com', 'pw')
+        self.category = Category.objects.create(name='Garden', price_per_night=Decimal('1000.00'), number_of_rooms=1)
+        self.day = timezone.localdate() + timedelta(days=10)
+        SeasonalPricing.objects.create(category=self.category, start_date=self.day,
+                                       end_date=self.day + timedelta(days=4), price_per_night=Decimal('1500.00'))
+
+    def load(self, resource, text, fmt='csv'):
+        return transfer.get_resource(resource).load(io.StringIO(text), fmt)
+
+    def export(self, resource, fmt='csv'):
+        return ''.join(transfer.get_resource(resource).export(fmt))
+
+    def test_round_trip_without_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'categories.csv')
+            call_command('export_data', 'categories', output=path)
+            out = io.StringIO()
+            call_command('import_data', 'categories', path, stdout=out)
+        self.assertIn('0 created, 1 updated, 0 skipped', out.getvalue())
+        for resource in ('categories', 'seasonal_prices'):
+            before = self.export(resource, 'json')
+            result = self.load(resource, before, 'json')
+            self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+            self.assertEqual(self.export(resource, 'json'), before)
+
+    def test_updates_existing_rows(self):
+        result = self.load('categories', 'name,price_per_night,number_of_rooms\nGarden,1200.00,3\nLake,900.00,2\n')
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.price_per_night, self.category.number_of_rooms), (Decimal('1200.00'), 3))
+        result = self.load('seasonal_prices', f'category,start_date,end_date,price_per_night\n'
+                                              f'Garden,{self.day},{self.day + timedelta(days=4)},1700.00\n')
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+        self.assertEqual(pricing.quote(self.category, self.day, self.day + timedelta(days=1)).total, Decimal('1700.00'))
+
+    def test_bad_rows_are_reported(self):
+        start, end = self.day + timedelta(days=2), self.day + timedelta(days=6)
+        result = self.load('seasonal_prices', '\n'.join([
+            'category,start_date,end_date,price_per_night,priority',
+            f'Nowhere,{start},{end},100,0',
+            f'Garden,{end},{start},100,0',
+            f'Garden,{start},{end},100,0',  # Overlaps the stored season
+            f'Garden,{start},{end},100,1',
+            f'Garden,{end},{end},100,1',  # Overlaps the row above
+            f'Garden,not a date,{end},100,2',
+        ]) + '\n')
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 3, 4, 6, 7])
+        self.assertIn('same priority', result.errors[2][1])
+
+    def test_booking_import_updates_ledger_and_reports(self):
+        end = self.day + timedelta(days=2)
+        result = self.load('bookings', '\n'.join([
+            'customer,category,start_date,end_date',
+            f'guest,Garden,{self.day},{end}',
+            f'guest,Garden,{self.day + timedelta(days=1)},{end}',  # The only room is taken
+        ]) + '\n')
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(3, f"No room left in 'Garden' on {self.day + timedelta(days=1)}.")])
+        self.assertEqual(list(RoomInventory.objects.order_by('date').values_list('date', 'sold')),
+                         [(self.day, 1), (self.day + timedelta(days=1), 1)])
+        self.assertEqual(list(DailyCategoryReport.objects.order_by('date').values_list('nights_sold', 'revenue')),
+                         [(1, Decimal('1500.00')), (1, Decimal('1500.00'))])
+
+    def test_booking_batch_is_rolled_back_when_the_rooms_went_meanwhile(self):
+        end = self.day + timedelta(days=2)
+        resource = transfer.get_resource('bookings')
+        prepare = resource.prepare
+
+        def prepare_then_book(chunk):
+            prepare(chunk)
+            reserve(self.category, self.day + timedelta(days=1), end)  # Someone else takes the last room
+
+        resource.prepare = prepare_then_book
+        result = resource.load(io.StringIO(f'customer,category,start_date,end_date\nguest,Garden,{self.day},{end}\n'))
+        self.assertEqual((result.created, result.skipped), (0, 1))
+        self.assertIn('not imported', result.errors[0][1])
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(list(RoomInventory.objects.values_list('date', 'sold')), [(self.day + timedelta(days=1), 1)])
+        self.assertFalse(DailyCategoryReport.objects.exists())
+
+    def test_booking_round_trip_adds_nothing(self):
+        self.load('bookings', f'customer,category,start_date,end_date\nguest,Garden,{self.day},{self.day + timedelta(days=2)}\n')
+        booking = Booking.objects.get()
+        for fmt in ('csv', 'json'):
+            result = self.load('bookings', self.export('bookings', fmt), fmt)
+            self.assertEqual((result.created, result.skipped), (0, 1))
+            self.assertIn(f'Booking {booking.pk} already exists.', result.errors[0][1])
+        self.assertEqual(Booking.objects.count(), 1)
+
+        # Restored into a database without it, the booking keeps its id and created_at
+        exported = self.export('bookings')
+        Booking.objects.all().delete()
+        result = self.load('bookings', exported)
+        self.assertEqual((result.created, result.errors), (1, []))
+        restored = Booking.objects.get()
+        self.assertEqual((restored.pk, restored.created_at, restored.total_price),
+                         (booking.pk, booking.created_at, booking.total_price))
+        self.assertEqual(list(RoomInventory.objects.values_list('sold', flat=True)), [1, 1])
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name, IMAGE_DERIVATIVE_WIDTHS=(320, 1280)))
+
+    def upload(self, name, fmt):
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'teal').save(buffer, fmt)
+        photo = Photo.objects.create(image=default_storage.save(name, io.BytesIO(buffer.getvalue())))
+        jobs.generate_derivatives_task(photo.image.name)
+        photo.refresh_from_db()
+        return photo
+
+    def test_same_stem_uploads_keep_their_own_variants(self):
+        jpeg, png = self.upload('photos/IMG.jpg', 'JPEG'), self.upload('photos/IMG.png', 'PNG')
+        self.assertEqual([name for *_, name in png.image_derivatives],
+                         ['photos/IMG.png.w320.jpg', 'photos/IMG.png.w320.webp'])
+        self.assertEqual(srcset(jpeg.image, 'webp'), f'{settings.MEDIA_URL}photos/IMG.jpg.w320.webp 320w')
+
+        png.delete()
+        self.assertEqual(os.listdir(os.path.join(self.media.name, 'photos')).count('IMG.jpg.w320.jpg'), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.media.name, 'photos', 'IMG.png.w320.jpg')))
+
+        # A replaced upload shows no srcset until its own variants are recorded
+        jpeg.image = 'photos/other.jpg'
+        self.assertEqual(srcset(jpeg.image), '')
+
+    def test_replaced_image_drops_the_old_variants(self):
+        photo = self.upload('photos/IMG.jpg', 'JPEG')
+        photos = os.path.join(self.media.name, 'photos')
+        photo.caption = 'Garden'
+        photo.save()
+        self.assertIn('IMG.jpg.w320.webp', os.listdir(photos))
+
+        photo.image = 'photos/new.jpg'
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        self.assertEqual(sorted(os.listdir(photos)), ['IMG.jpg'])
+        photo.refresh_from_db()
+        self.assertEqual(photo.image_derivatives, [])
+
+
+class MediaServeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        os.mkdir(os.path.join(self.media.name, 'photos'))
+        with open(os.path.join(self.media.name, 'photos', 'IMG.jpg'), 'wb') as fh:
+            fh.write(bytes(range(100)))
+        self.url = f'{settings.MEDIA_URL}photos/IMG.jpg'
+
+    def test_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (200, bytes(range(100))))
+        response = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 0-9/100'))
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10)))
+        response = self.client.get(self.url, headers={'Range': 'bytes=-5'})
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 95-99/100'))
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=100-'})
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */100'))
+        # An invalid range is ignored rather than refused
+        self.assertEqual(self.client.get(self.url, headers={'Range': 'bytes=5-2'}).status_code, 200)
+
+        # The client's partial copy is outdated: it gets the whole file
+        stale = {'Range': 'bytes=0-9', 'If-Range': '"0-0"'}
+        self.assertEqual(self.client.get(self.url, headers=stale).status_code, 200)
+
+    def test_only_upload_directories_are_served(self):
+        with open(os.path.join(self.media.name, 'db.sqlite3'), 'w') as fh:
+            fh.write('secret')
+        for path in ('db.sqlite3', 'hotel/settings.py', 'photos/../db.sqlite3', 'photos/%2e%2e/db.sqlite3'):
+            self.assertEqual(self.client.get(f'{settings.MEDIA_URL}{path}').status_code, 404, path)
+
+
+class StaticPipelineTests(TestCase):
+    def test_minify_css_leaves_strings_and_urls_alone(self):
+        css = ('a::before { content: "/*" ; }\n/* it\'s gone */\nb { background: url("img/*x.png") ; }\n'
+               'i { background: url(a/*b.png) }  p { margin: 0/**/auto; }')
+        self.assertEqual(staticfiles.minify_css(css), 'a::before{content: "/*"}b{background: url("img/*x.png")}'
+                                                      'i{background: url(a/*b.png)}p{margin: 0 auto}')
+
+    def test_hashed_name_matches_the_minified_file(self):
+        from django.core.files.storage import FileSystemStorage
+
+        with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(source_dir, 'site.css'), 'w') as fh:
+                fh.write('/* Site styles */\nbody {\n    color: teal;\n}\n')
+            source = FileSystemStorage(location=source_dir)
+            storage = staticfiles.FingerprintedStaticFilesStorage(location=root, base_url='/static/')
+            storage.save('site.css', source.open('site.css'))
+            list(storage.post_process({'site.css': (source, 'site.css')}))
+
+            name = storage.stored_name('site.css')
+            with storage.open(name) as fh:
+                data = fh.read()
+        self.assertEqual(data, b'body{color: teal}')
+        self.assertEqual(name, f'site.{hashlib.md5(data).hexdigest()[:12]}.css')
+
+
+class PrecompressedStaticTests(TestCase):
+    def setUp(self):
+        # site.css with the .gz and .br siblings collectstatic would build
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        for suffix in ('', '.gz', '.br'):
+            with open(os.path.join(self.root.name, 'site.css' + suffix), 'w') as fh:
+                fh.write('body{color:teal}' + suffix)
+
+    def serve(self, **headers):
+        with override_settings(STATIC_ROOT=self.root.name, STATIC_SERVE=True):
+            response = Client().get('/static/site.css', headers=headers)
+        if response.status_code == 200:
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_collected_files_are_not_served_with_debug_on(self):
+        self.assertEqual(self.serve().status_code, 200)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.serve().status_code, 404)
+
+    def test_accept_encoding_negotiation(self):
+        for accept, encoding in (('gzip, deflate, br', 'br'), ('br;q=0, gzip', 'gzip'), ('gzip;q=0.5, br;q=0.1', 'br'),
+                                 ('br;q=0, gzip;q=0.0', None), ('identity', None), ('*', 'br')):
+            response = self.serve(accept_encoding=accept)
+            self.assertEqual(response.get('Content-Encoding'), encoding, accept)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response.body, b'body{color:teal}' + {'br': b'.br', 'gzip': b'.gz', None: b''}[encoding])
+
+    def test_if_none_match(self):
+        etag = self.serve(accept_encoding='br')['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            self.assertEqual(self.serve(accept_encoding='br', if_none_match=header).status_code, 304, header)
+        # The gzip variant has its own ETag
+        self.assertEqual(self.serve(accept_encoding='gzip', if_none_match=etag).status_code, 200)
+
+
+class SqliteProfileTests(TestCase):
+    def test_production_profile_sets_the_pragmas(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        with tempfile.TemporaryDirectory() as tmp:
+            profile = DatabaseWrapper(dict(connection.settings_dict, NAME=os.path.join(tmp, 'profile.sqlite3'),
+                                           OPTIONS=settings.SQLITE_PROFILE_OPTIONS), alias='profile')
+            try:
+                with profile.cursor() as cursor:
+                    pragmas = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                               for name in ('journal_mode', 'synchronous', 'busy_timeout')}
+            finally:
+                profile.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000})
@@ -0,0 +1,490 @@
+# transfer.py
+#
+# Bulk import and export of categories, seasonal prices and bookings as CSV
+# or JSON Lines (one object per line). An import is a generator pipeline:
+# records() parses the file lazily, chunks() groups the records into batches,
+# and each batch is validated with a handful of lookups, then written with
+# bulk_create in its own transaction. Exports stream straight from a
+# server-side iterator. Memory therefore depends on the batch size, not on
+# the size of the file.
+#
+# Rows get the checks of the admin forms and the booking flow: seasons must not
+# overlap another season of the category with the same priority, and bookings
+# must fit the rooms left on every night. Both count the rows already accepted
+# from the same file. A booking row keeps its id and created_at, and a row whose
+# id is already taken is rejected, so importing an export again adds nothing.
+#
+# bulk_create skips Model.save() and the signals, so the booking import keeps
+# the inventory ledger and the daily report rows up to date itself: each batch
+# claims its nights with the same conditional UPDATE as a booking and adds its
+# report deltas inside the batch transaction. If bookings made meanwhile took
+# the rooms, the whole batch is rolled back and its rows reported as skipped.
+
+import csv
+import json
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import ari, inventory, pricing, reports
+from .caching import bump_homepage_version
+from .inventory import RoomsUnavailable
+from .models import Booking, Category, RoomInventory, SeasonalPricing, User
+from .pricing import PriceIndex
+
+FORMATS = {
+    'csv': 'text/csv',
+    'json': 'application/x-ndjson',
+}
+
+MAX_ERRORS = 100  # Row errors kept for the report; later ones are only counted
+
+
+class TransferError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []  # (line, message), the first MAX_ERRORS only
+
+    def error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.skipped
+
+
+class _Echo:
+    # csv.writer target that hands each line straight back
+    def write(self, value):
+        return value
+
+
+def csv_stream(header, rows):
+    """Yield ``header`` and then every row of ``rows`` as CSV lines."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def json_stream(header, rows):
+    """Yield every row of ``rows`` as one JSON object per line."""
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=str) + '\n'
+
+
+def records(stream, fmt):
+    """Yield (line number, dict) for every record of a text stream; None for lines that do not parse."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'json':
+        for line_num, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_num, row if isinstance(row, dict) else None
+    else:
+        raise TransferError(f"Unknown format '{fmt}'.")
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _message(error):
+    return '; '.join(error.messages) if isinstance(error, ValidationError) else str(error)
+
+
+class Resource:
+    """One importable/exportable model: its columns and how a row becomes an instance."""
+
+    model = None
+    columns = ()  # File columns, in export order
+    required = ()  # Columns an import file must have
+    unique_fields = ()  # Rows that match on these update the existing row
+    update_fields = ()
+
+    def export_rows(self):
+        raise NotImplementedError
+
+    def prepare(self, chunk):
+        # Batch lookups shared by every row of the chunk
+        pass
+
+    def build(self, row):
+        """A model instance for one record, or raise ValidationError."""
+        raise NotImplementedError
+
+    def existing(self, instances):
+        """How many of the instances already exist (they will be updated)."""
+        return 0
+
+    def saved(self, instances):
+        # Called inside the batch transaction after the rows were written;
+        # raising ValidationError rolls the batch back
+        pass
+
+    def rolled_back(self):
+        # Called after a batch was rolled back
+        pass
+
+    def finish(self):
+        # Called once after the last batch
+        pass
+
+    def clean(self, name, value):
+        # Model field validation, without the per-row uniqueness queries of full_clean()
+        field = self.model._meta.get_field(name)
+        if value is None or value == '':
+            if field.has_default():
+                return field.get_default()
+            if field.null:
+                return None
+            if field.blank:
+                return ''
+        try:
+            return field.clean(value, None)
+        except ValidationError as e:
+            raise ValidationError(f"{name}: {_message(e)}")
+
+    def write(self, instances):
+        if self.unique_fields:
+            self.model.objects.bulk_create(
+                instances, update_conflicts=True,
+                unique_fields=self.unique_fields, update_fields=self.update_fields,
+            )
+        else:
+            self.model.objects.bulk_create(instances)
+
+    def load(self, stream, fmt='csv', batch_size=1000, dry_run=False):
+        """Import every record of ``stream``; returns an ImportResult."""
+        result = ImportResult(dry_run=dry_run)
+        # category_id rather than category, so building a key never loads the related row
+        key_fields = [self.model._meta.get_field(name).attname for name in self.unique_fields]
+        parsed = records(stream, fmt)
+        for index, chunk in enumerate(chunks(parsed, batch_size)):
+            if index == 0 and fmt == 'csv':
+                missing = [name for name in self.required if name not in chunk[0][1]]
+                if missing:
+                    raise TransferError(f"Missing column(s): {', '.join(missing)}.")
+            self.prepare(chunk)
+
+            # Later rows win over earlier rows with the same key
+            instances = {}
+            for line_num, row in chunk:
+                if row is None:
+                    result.error(line_num, "Not a JSON object.")
+                    continue
+                try:
+                    instance = self.build(row)
+                except ValidationError as e:
+                    result.error(line_num, _message(e))
+                    continue
+                key = tuple(getattr(instance, f) for f in key_fields) if key_fields else line_num
+                if key in instances:
+                    result.skipped += 1
+                instances[key] = instance
+            instances = list(instances.values())
+
+            existing = self.existing(instances)
+            if instances and not dry_run:
+                try:
+                    with transaction.atomic():
+                        self.write(instances)
+                        self.saved(instances)
+                except ValidationError as e:
+                    result.error(chunk[0][0], f"Rows {chunk[0][0]}-{chunk[-1][0]} not imported: {_message(e)}")
+                    result.skipped += len(instances) - 1
+                    self.rolled_back()
+                    continue
+            result.updated += existing
+            result.created += len(instances) - existing
+        if not dry_run:
+            self.finish()
+        return result
+
+    def export(self, fmt='csv'):
+        """Yield the whole table as lines of text."""
+        if fmt == 'csv':
+            return csv_stream(self.columns, self.export_rows())
+        if fmt == 'json':
+            return json_stream(self.columns, self.export_rows())
+        raise TransferError(f"Unknown format '{fmt}'.")
+
+
+class CategoryResource(Resource):
+    model = Category
+    columns = (
+        'name', 'description', 'price_per_night', 'number_of_rooms', 'max_guests', 'is_available',
+        'free_wifi', 'hot_water', 'swimming_pool', 'kitchen', 'parking_area', 'is_ac', 'is_non_ac',
+    )
+    required = ('name', 'price_per_night')
+    unique_fields = ('name',)
+    update_fields = columns[1:] + ('updated_at',)
+
+    def __init__(self):
+        self.updated_names = set()
+
+    def export_rows(self):
+        return Category.objects.order_by('pk').values_list(*self.columns).iterator(chunk_size=2000)
+
+    def build(self, row):
+        values = {name: self.clean(name, row.get(name)) for name in self.columns}
+        return Category(**values)
+
+    def existing(self, instances):
+        names = Category.objects.filter(name__in=[c.name for c in instances]).values_list('name', flat=True)
+        self.batch_existing = set(names)
+        return len(self.batch_existing)
+
+    def saved(self, instances):
+        # Category.save() keeps the ledgers' capacity in step; bulk_create does not
+        for category in Category.objects.filter(name__in=[c.name for c in instances]):
+            if category.name in self.batch_existing:
+                inventory.sync_capacity(category)
+                reports.sync_capacity(category)
+            else:
+                ari.changed_category(category)
+
+    def finish(self):
+        bump_homepage_version()
+
+
+class SeasonalPricingResource(Resource):
+    model = SeasonalPricing
+    columns = ('category', 'start_date', 'end_date', 'price_per_night', 'priority')
+    required = columns[:4]
+    unique_fields = ('category', 'start_date', 'end_date')
+    update_fields = ('price_per_night', 'priority', 'updated_at')
+
+    def __init__(self):
+        self.category_ids = {}
+        self.seasons = {}  # category_id -> {(start_date, end_date): priority}, stored and accepted
+
+    def export_rows(self):
+        return (
+            SeasonalPricing.objects.order_by('pk')
+            .values_list('category__name', 'start_date', 'end_date', 'price_per_night', 'priority')
+            .iterator(chunk_size=2000)
+        )
+
+    def prepare(self, chunk):
+        names = {row.get('category') for _, row in chunk if row} - self.category_ids.keys()
+        self.category_ids.update(Category.objects.filter(name__in=names).values_list('name', 'pk'))
+        new = {self.category_ids[name] for name in names if name in self.category_ids} - self.seasons.keys()
+        if new:
+            for category_id in new:
+                self.seasons[category_id] = {}
+            stored = SeasonalPricing.objects.filter(category_id__in=new).values_list(
+                'category_id', 'start_date', 'end_date', 'priority'
+            )
+            for category_id, start_date, end_date, priority in stored:
+                self.seasons[category_id][start_date, end_date] = priority
+
+    def build(self, row):
+        category_id = self.category_ids.get(row.get('category'))
+        if category_id is None:
+            raise ValidationError(f"Unknown category '{row.get('category')}'.")
+        season = SeasonalPricing(
+            category_id=category_id,
+            start_date=self.clean('start_date', row.get('start_date')),
+            end_date=self.clean('end_date', row.get('end_date')),
+            price_per_night=self.clean('price_per_night', row.get('price_per_night')),
+            priority=self.clean('priority', row.get('priority')),
+        )
+        if season.end_date < season.start_date:
+            raise ValidationError("end_date must not be before start_date.")
+        # Same rule as SeasonalPricingForm; a row with the same dates replaces that season
+        seasons = self.seasons[category_id]
+        own = (season.start_date, season.end_date)
+        for (start_date, end_date), priority in seasons.items():
+            if (priority == season.priority and (start_date, end_date) != own
+                    and start_date <= season.end_date and end_date >= season.start_date):
+                raise ValidationError(
+                    f"Overlaps the season from {start_date} to {end_date} with the same priority."
+                )
+        seasons[own] = season.priority
+        return season
+
+    def existing(self, instances):
+        categories = {s.category_id for s in instances}
+        keys = {(s.category_id, s.start_date, s.end_date) for s in instances}
+        stored = SeasonalPricing.objects.filter(category__in=categories).values_list(
+            'category_id', 'start_date', 'end_date'
+        )
+        return len(keys & set(stored))
+
+    def saved(self, instances):
+        for category_id in {season.category_id for season in instances}:
+            pricing.invalidate(category_id)
+        for season in instances:
+            ari.changed_nights(season.category_id, season.start_date, season.end_date + timedelta(days=1))
+
+
+class BookingResource(Resource):
+    model = Booking
+    columns = ('id', 'customer', 'category', 'start_date', 'end_date', 'total_price', 'created_at')
+    required = ('customer', 'category', 'start_date', 'end_date')
+
+    def __init__(self):
+        self.taken_ids = set()  # ids stored or accepted from the file so far
+        self.customer_ids = {}
+        self.categories = {}
+        self.indexes = {}
+        self.rooms_left = {}  # (category_id, night) -> rooms left, for the nights seen so far
+
+    def export_rows(self):
+        return (
+            Booking.objects.order_by('pk')
+            .values_list('pk', 'customer__username', 'Category__name', 'start_date', 'end_date',
+                         '_total_price', 'created_at')
+            .iterator(chunk_size=2000)
+        )
+
+    def prepare(self, chunk):
+        rows = [row for _, row in chunk if row]
+        usernames = {row.get('customer') for row in rows} - self.customer_ids.keys()
+        if usernames:
+            self.customer_ids.update(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        names = {row.get('category') for row in rows} - self.categories.keys()
+        if names:
+            found = list(
+                Category.objects.filter(name__in=names).only('pk', 'name', 'price_per_night', 'number_of_rooms')
+            )
+            self.categories.update((c.name, c) for c in found)
+            self.indexes.update(PriceIndex.for_categories(found))
+        ids = set()
+        for row in rows:
+            try:
+                if row.get('id'):
+                    ids.add(self.clean('id', row['id']))
+            except ValidationError:
+                continue  # Reported by build()
+        if ids:
+            self.taken_ids.update(Booking.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        self._load_ledger(rows)
+
+    def _load_ledger(self, rows):
+        # Rooms left on the chunk's nights not seen yet, from one query on the ledger
+        stays = []
+        for row in rows:
+            category = self.categories.get(row.get('category'))
+            try:
+                start_date = self.clean('start_date', row.get('start_date'))
+                end_date = self.clean('end_date', row.get('end_date'))
+            except ValidationError:
+                continue  # Reported by build()
+            if category and start_date and end_date:
+                stays.append((category, start_date, end_date))
+        wanted = {
+            (category.pk, night): category.number_of_rooms
+            for category, start_date, end_date in stays
+            for night in inventory.stay_dates(start_date, end_date)
+            if (category.pk, night) not in self.rooms_left
+        }
+        if not wanted:
+            return
+        ledger = RoomInventory.objects.filter(
+            category_id__in={category_id for category_id, _ in wanted},
+            date__gte=min(night for _, night in wanted), date__lte=max(night for _, night in wanted),
+        ).values_list('category_id', 'date', 'capacity', 'sold')
+        stored = {(category_id, night): (capacity, sold) for category_id, night, capacity, sold in ledger}
+        for key, rooms in wanted.items():
+            capacity, sold = stored.get(key, (rooms, 0))
+            # Same rule as inventory.rooms_left: never more than the category has today
+            self.rooms_left[key] = max(0, min(capacity - sold, rooms))
+
+    def build(self, row):
+        pk = self.clean('id', row['id']) if row.get('id') else None
+        if pk in self.taken_ids:
+            raise ValidationError(f"Booking {pk} already exists.")
+        customer_id = self.customer_ids.get(row.get('customer'))
+        if customer_id is None:
+            raise ValidationError(f"Unknown customer '{row.get('customer')}'.")
+        category = self.categories.get(row.get('category'))
+        if category is None:
+            raise ValidationError(f"Unknown category '{row.get('category')}'.")
+        start_date = self.clean('start_date', row.get('start_date'))
+        end_date = self.clean('end_date', row.get('end_date'))
+        if end_date <= start_date:
+            raise ValidationError("end_date must be after start_date.")
+        nights = inventory.stay_dates(start_date, end_date)
+        full = [night for night in nights if self.rooms_left[category.pk, night] < 1]
+        if full:
+            raise ValidationError(
+                f"No room left in '{category.name}' on {', '.join(night.isoformat() for night in full)}."
+            )
+        created_at = self.clean('created_at', row['created_at']) if row.get('created_at') else None
+        total = self.clean('_total_price', row.get('total_price'))
+        if total is None:
+            # Same frozen price Booking.save() would store
+            total = self.indexes[category.pk].total(start_date, end_date)
+        for night in nights:
+            self.rooms_left[category.pk, night] -= 1
+        if pk is not None:
+            self.taken_ids.add(pk)
+        booking = Booking(pk=pk, customer_id=customer_id, Category_id=category.pk, start_date=start_date,
+                          end_date=end_date, _total_price=total)
+        booking.imported_created_at = created_at
+        return booking
+
+    def write(self, instances):
+        super().write(instances)
+        # auto_now_add overwrites created_at on insert, so put the file's value back
+        dated = [booking for booking in instances if booking.imported_created_at]
+        for booking in dated:
+            booking.created_at = booking.imported_created_at
+        Booking.objects.bulk_update(dated, ['created_at'], batch_size=500)
+
+    def saved(self, instances):
+        nights = Counter()
+        deltas = defaultdict(lambda: {'nights_sold': 0, 'revenue': 0})
+        for booking in instances:
+            for night, revenue in reports.booking_nights(booking.start_date, booking.end_date, booking._total_price):
+                nights[booking.Category_id, night] += 1
+                delta = deltas[booking.Category_id, night]
+                delta['nights_sold'] += 1
+                delta['revenue'] += revenue
+        try:
+            inventory.claim(nights)
+        except RoomsUnavailable as e:
+            raise ValidationError(str(e))
+        reports.apply(deltas)
+
+    def rolled_back(self):
+        # The rows were never written: forget their ids and read the ledger again
+        self.taken_ids.clear()
+        self.rooms_left.clear()
+
+
+RESOURCES = {
+    'categories': CategoryResource,
+    'seasonal_prices': SeasonalPricingResource,
+    'bookings': BookingResource,
+}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]()
+    except KeyError:
+        raise TransferError(f"Unknown resource '{name}'. Choose from: {', '.join(RESOURCES)}.")
@@ -1,7 +1,6 @@
-from django.urls import path
+from django.urls import path, re_path
 from .views import*
-from django.conf import settings
-from django.conf.urls.static import static
+from . import media
 
 
 urlpatterns = [
@@ -10,12 +9,16 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path("adminn/",AdminIndexView.as_view(),name="adminindex"),
+    path('adminn/report.csv', ReportExportView.as_view(), name='report_export'),
+    path('adminn/data/', DataTransferView.as_view(), name='data_transfer'),
+    path('adminn/data/<slug:resource>.<slug:fmt>', DataExportView.as_view(), name='data_export'),
    
     # Category URLs
     path('categories/', CategoryListView.as_view(), name='category_list'),
     path('categories/add/', CategoryCreateView.as_view(), name='category_add'),
     path('categories/<int:pk>/edit/', CategoryUpdateView.as_view(), name='category_edit'),
     path('categories/<int:pk>/delete/', CategoryDeleteView.as_view(), name='category_delete'),
+    path('categories/<int:pk>/pricing/', CategoryPricingRulesView.as_view(), name='category_pricing_rules'),
 
     # Seasonal Pricing URLs
     path('seasonalpricing/', SeasonalPricingListView.as_view(), name='seasonalpricing_list'),
@@ -34,14 +37,27 @@ urlpatterns = [
     path('photos/', PhotoListView.as_view(), name='photo_list'),  # List photos
     path('photos/delete/<int:pk>/', PhotoDeleteView.as_view(), name='photo_delete'),  # Delete photo
     
+    path('stats/requests/', RequestStatsView.as_view(), name='request_stats'),
+    path('jobs/', JobStatusView.as_view(), name='job_stats'),
+    path('jobs/<int:pk>/', JobStatusView.as_view(), name='job_status'),
+
     path('reservationsList/', AdminBookingListView.as_view(), name='admin_reservations'),
 
     
     
+    path('availability/', AvailabilitySearchView.as_view(), name='availability'),
     path('bookings/add/<int:category_id>/', BookingCreateView.as_view(), name='booking_add'),
+    path('bookings/hold/<int:category_id>/', BookingHoldView.as_view(), name='booking_hold'),
+    path('bookings/checkout/<int:pk>/', BookingCheckoutView.as_view(), name='booking_checkout'),
+    path('bookings/checkout/<int:pk>/cancel/', BookingHoldCancelView.as_view(), name='booking_hold_cancel'),
     path('bookings/', BookingListView.as_view(), name='booking_list'),
     path('bookings/<int:pk>/delete/', BookingDeleteView.as_view(), name='booking_delete'),
-]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # JSON API
+    path('api/v1/ari/', AriFeedView.as_view(), name='api_ari'),
+    path('api/v1/categories/<int:pk>/quote/', ApiQuoteView.as_view(), name='api_quote'),
+    path('api/v1/<slug:resource>/', ApiListView.as_view(), name='api_list'),
+    path('api/v1/<slug:resource>/<int:pk>/', ApiDetailView.as_view(), name='api_detail'),
+    # Uploaded media (MEDIA_URL is the site root); only the upload directories are exposed
+    re_path(r'^(?P<path>(?:%s)/.+)$' % '|'.join(media.MEDIA_DIRECTORIES), media.serve, name='media'),
+]
\ No newline at end of file
@@ -11,11 +11,42 @@ from .models import *
 from django.contrib.auth import authenticate, login
 from django.shortcuts import get_object_or_404
 from django.forms import ValidationError
+from django.core.exceptions import BadRequest
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-
+from .pricing import PriceIndex, quote
+from .inventory import RoomsUnavailable, reserve
+from .availability import asearch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from .caching import ahomepage_version
+from .jobs import stats as job_stats
+from .pagination import InvalidCursor, keyset_page
+from .middleware import stats_snapshot
+from .routers import ReplicaReadMixin
+from .ratelimit import RateLimitMixin
+from . import reports
+from . import transfer
+from . import holds
+from . import idempotency
+from . import api
+from . import ari
+from django.http import HttpResponseNotModified
+import io
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.contrib.auth.views import redirect_to_login
+
+# The public read views below are async so an ASGI worker is not tied up by slow clients.
+# Not a replica read: the fragment is cached under the version bumped by the write, so
+# content rendered from a lagging replica would be served as current until it expires.
 class IndexView(TemplateView):
     template_name = "index.html"
 
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        context['homepage_version'] = await ahomepage_version()
+        return self.render_to_response(context)
+
     def get_context_data(self, **kwargs):
         # Get the default context
         context = super().get_context_data(**kwargs)
@@ -25,11 +56,15 @@ class IndexView(TemplateView):
         context['photos'] = Photo.objects.all()
         # Add tourist locations to the context
         context['tourist_locations'] = TouristLocation.objects.all()
+        # The querysets above are lazy; they only run when the cached fragment is stale
+        context['homepage_cache_timeout'] = settings.HOMEPAGE_CACHE_TIMEOUT
         return context
 
     
     
-class CustomerRegisterView(View):
+class CustomerRegisterView(RateLimitMixin, View):
+    ratelimit_scope = 'register'
+
     def get(self, request):
         return render(request, 'login.html')  # Return the sign-up page
 
@@ -53,8 +88,9 @@ class CustomerRegisterView(View):
             return redirect('customer_register')
 
 
-class LoginView(View):
+class LoginView(RateLimitMixin, View):
     template_name = 'login.html'
+    ratelimit_scope = 'login'
 
     def get(self, request):
         return render(request, self.template_name)
@@ -85,15 +121,96 @@ class LogoutView(View):
         return redirect('login')
 
 
-class AdminIndexView(TemplateView):
-    template_name="admin/base_generic.html"
+class AdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    # Signed-in admins only: others are sent to the login page or get a 403
+    def test_func(self):
+        return self.request.user.role == 'admin'
+
+
+# Admin dashboard: occupancy and revenue from the daily report rows (admins only)
+class AdminIndexView(AdminRequiredMixin, TemplateView):
+    template_name = "admin/dashboard.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = ReportFilterForm(self.request.GET)
+        if form.is_valid():
+            data = form.cleaned_data
+        else:
+            # Show the default range alongside the form errors
+            defaults = ReportFilterForm({})
+            defaults.is_valid()
+            data = defaults.cleaned_data
+        by_category, totals, by_day = reports.summary(data['start_date'], data['end_date'], data.get('category'))
+        context.update({
+            'filter_form': form,
+            'report': data,
+            'by_category': by_category,
+            'totals': totals,
+            'by_day': by_day,
+            'export_query': self.request.GET.urlencode(),
+        })
+        return context
+
+
+# Bulk import (uploaded CSV/JSON Lines file) and export links (admins only)
+class DataTransferView(AdminRequiredMixin, View):
+    template_name = "admin/data_transfer.html"
+
+    def get(self, request):
+        return render(request, self.template_name, {'form': DataImportForm(), 'resources': transfer.RESOURCES})
+
+    def post(self, request):
+        form = DataImportForm(request.POST, request.FILES)
+        result = None
+        if form.is_valid():
+            data = form.cleaned_data
+            # Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to disk and read back line by line
+            stream = io.TextIOWrapper(data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = transfer.get_resource(data['resource']).load(stream, data['format'], dry_run=data['dry_run'])
+            except transfer.TransferError as e:
+                form.add_error('file', str(e))
+        return render(request, self.template_name, {'form': form, 'resources': transfer.RESOURCES, 'result': result})
+
+
+# Streamed export of one resource, as CSV or JSON Lines (admins only)
+class DataExportView(AdminRequiredMixin, View):
+    def get(self, request, resource, fmt):
+        if resource not in transfer.RESOURCES or fmt not in transfer.FORMATS:
+            return JsonResponse({'error': 'Unknown resource or format.'}, status=404)
+        response = StreamingHttpResponse(
+            transfer.get_resource(resource).export(fmt), content_type=transfer.FORMATS[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{"csv" if fmt == "csv" else "jsonl"}"'
+        return response
+
+
+# CSV export of the daily report rows, streamed (admins only)
+class ReportExportView(AdminRequiredMixin, View):
+    def get(self, request):
+        form = ReportFilterForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        data = form.cleaned_data
+        response = StreamingHttpResponse(
+            reports.csv_lines(data['start_date'], data['end_date'], data.get('category')), content_type='text/csv'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="report-{data["start_date"]}-{data["end_date"]}.csv"'
+        )
+        return response
 
 # List View for Categories
-class CategoryListView(ListView):
+class CategoryListView(ReplicaReadMixin, ListView):
     model = Category
     template_name = 'admin/category_list.html'
     context_object_name = 'categories'
 
+    async def get(self, request, *args, **kwargs):
+        self.object_list = [category async for category in self.get_queryset()]
+        return self.render_to_response(self.get_context_data())
+
 # Create View for Category
 class CategoryCreateView(CreateView):
     model = Category
@@ -129,14 +246,8 @@ class SeasonalPricingCreateView(CreateView):
         return initial
 
     def form_valid(self, form):
-        category = get_object_or_404(Category, pk=self.kwargs.get('category_id'))
-
-        # Check if there is already a seasonal pricing for this category
-        existing_pricing = SeasonalPricing.objects.filter(category=category).exists()
-        if existing_pricing:
-            raise ValidationError("A seasonal pricing already exists for this category. Only one seasonal pricing is allowed.")
-        
-        form.instance.category = category
+        # Any number of seasons per category; SeasonalPricingForm rejects overlaps with the same priority
+        form.instance.category = get_object_or_404(Category, pk=self.kwargs.get('category_id'))
         return super().form_valid(form)
 
     success_url = reverse_lazy('seasonalpricing_list')
@@ -158,6 +269,33 @@ class SeasonalPricingUpdateView(UpdateView):
     template_name = 'admin/seasonalpricing_form.html'
     success_url = reverse_lazy('category_list')
 
+# Weekday rates and length-of-stay discounts of a category (admins only)
+class CategoryPricingRulesView(AdminRequiredMixin, View):
+    template_name = 'admin/pricing_rules.html'
+
+    def render_rules(self, request, category, weekday_rates, stay_discounts):
+        return render(request, self.template_name, {
+            'category': category, 'weekday_rates': weekday_rates, 'stay_discounts': stay_discounts,
+        })
+
+    def get(self, request, pk):
+        category = get_object_or_404(Category, pk=pk)
+        return self.render_rules(request, category, DayOfWeekRateFormSet(instance=category),
+                                 LengthOfStayDiscountFormSet(instance=category))
+
+    def post(self, request, pk):
+        category = get_object_or_404(Category, pk=pk)
+        weekday_rates = DayOfWeekRateFormSet(request.POST, instance=category)
+        stay_discounts = LengthOfStayDiscountFormSet(request.POST, instance=category)
+        if weekday_rates.is_valid() and stay_discounts.is_valid():
+            with transaction.atomic():
+                weekday_rates.save()
+                stay_discounts.save()
+            messages.success(request, f"Pricing rules of {category.name} saved.")
+            return redirect('category_pricing_rules', pk=category.pk)
+        return self.render_rules(request, category, weekday_rates, stay_discounts)
+
+
 # Delete View for Seasonal Pricing
 class SeasonalPricingDeleteView(DeleteView):
     model = SeasonalPricing
@@ -186,7 +324,7 @@ class TouristLocationDeleteView(DeleteView):
     success_url = reverse_lazy('category_list')
     
 # Tourist Location List View
-class TouristLocationListView(ListView):
+class TouristLocationListView(ReplicaReadMixin, ListView):
     model = TouristLocation
     template_name = 'admin/touristlocation_list.html'
     context_object_name = 'tourist_locations'
@@ -226,18 +364,40 @@ class PhotoDeleteView(View):
         return redirect('photo_list')
     
 
-class AdminBookingListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class AdminBookingListView(AdminRequiredMixin, ListView):
     model = Booking
     template_name = 'admin/reservation_list.html'
     context_object_name = 'reservations'
-
-    def test_func(self):
-        # Ensure only admins can access this view
-        return self.request.user.role == 'admin'
+    paginate_by = 50
 
     def get_queryset(self):
-        # Return all bookings
-        return Booking.objects.all()
+        # Customer and category in one query for the whole page (legacy unpriced rows use the cached pricing rules)
+        queryset = Booking.objects.select_related('customer', 'Category')
+        self.filter_form = ReservationFilterForm(self.request.GET or None)
+        if self.filter_form.is_valid():
+            queryset = self.filter_form.filter(queryset)
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = keyset_page(queryset, ('-created_at', '-id'), self.request.GET.get('cursor'), page_size)
+        except (InvalidCursor, ValidationError):
+            # A hand-edited cursor; silently showing the first page would look like the next one
+            raise BadRequest("Invalid cursor.")
+        return None, page, page.items, page.has_next
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filter_form'] = self.filter_form
+        page = context['page_obj']
+        if page.has_next:
+            query = self.request.GET.copy()
+            query['cursor'] = page.next_cursor
+            context['next_query'] = query.urlencode()
+        filters = self.request.GET.copy()
+        filters.pop('cursor', None)
+        context['first_query'] = filters.urlencode()
+        return context
     
 ##################################################################################################################################################
 
@@ -246,17 +406,29 @@ from django.shortcuts import render
 from django.contrib import messages
 from django.utils import timezone
 
-class BookingCreateView(LoginRequiredMixin, View):
+class BookingCreateView(RateLimitMixin, LoginRequiredMixin, View):
     template_name = 'customer/booking_add.html'
+    ratelimit_scope = 'booking'
+
+    def get_context(self, form, category):
+        # Retries of one submission (double click, resend) carry the same key
+        key = self.request.POST.get(idempotency.FIELD_NAME) or idempotency.new_key()
+        return {'form': form, 'category': category, 'idempotency_key': key}
 
     def get(self, request, category_id):
         category = get_object_or_404(Category, pk=category_id)
         form = BookingForm(initial={'Category': category})
-        return render(request, self.template_name, {'form': form, 'category': category})
+        return render(request, self.template_name, self.get_context(form, category))
 
     def post(self, request, category_id):
+        # A retry of a booking that already went through gets the original response
+        submission = idempotency.IdempotentRequest(request, 'booking_add')
+        replayed = submission.replay()
+        if replayed:
+            return replayed
+
         category = get_object_or_404(Category, pk=category_id)
-        form = BookingForm(request.POST)
+        form = BookingForm(request.POST, category=category)
 
         if form.is_valid():
             booking = form.save(commit=False)
@@ -271,62 +443,138 @@ class BookingCreateView(LoginRequiredMixin, View):
 
             if end_date <= start_date:
                 messages.error(request, "End date must be after the start date.")
-                return render(request, self.template_name, {'form': form, 'category': category})
+                return render(request, self.template_name, self.get_context(form, category))
 
             # Calculate total nights (exclusive of the end date)
             total_nights = (end_date - start_date).days
 
             if total_nights <= 0:
                 messages.error(request, "End date must be after the start date.")
-                return render(request, self.template_name, {'form': form, 'category': category})
-
-            # Initialize total price variable
-            total_price = 0
-            current_date = start_date
-
-            # Loop through each day in the booking range and calculate the price
-            while current_date < end_date:
-                seasonal_pricing = SeasonalPricing.objects.filter(
-                    category=category,
-                    start_date__lte=current_date,
-                    end_date__gte=current_date
-                ).first()
-
-                # If seasonal pricing is found, use it; otherwise, use the normal price
-                price_per_night = seasonal_pricing.price_per_night if seasonal_pricing else category.price_per_night
+                return render(request, self.template_name, self.get_context(form, category))
 
-                # Add the price of the current day to the total price
-                total_price += price_per_night
-                current_date += timedelta(days=1)
+            # Price every night of the stay from a single seasonal pricing lookup
+            total_price = quote(category, start_date, end_date).total
 
-            # Check if there are available rooms
-            if category.number_of_rooms <= 0 or not category.is_available:
+            if not category.is_available:
                 messages.error(request, "No rooms available for the selected category.")
-                return render(request, self.template_name, {'form': form, 'category': category})
+                return render(request, self.template_name, self.get_context(form, category))
 
-            # Deduct a room and save the booking
-            category.number_of_rooms -= 1
-            category.save()
-
-            # Set the total price and save the booking
+            # Record the key, claim a room on every night of the stay and save the booking together
             booking.total_price = total_price
-            booking.save()
+            try:
+                with transaction.atomic():
+                    submission.claim()
+                    reserve(category, start_date, end_date)
+                    booking.save()
+                    response = submission.complete(redirect('booking_list'), booking)
+            except idempotency.DuplicateRequest:
+                return submission.replay()
+            except RoomsUnavailable:
+                messages.error(request, "No rooms available for the selected dates.")
+                return render(request, self.template_name, self.get_context(form, category))
 
             messages.success(request, "Booking successful!")
-            return redirect('booking_list')  # Redirect to the booking list page
+            return response
 
-        return render(request, self.template_name, {'form': form, 'category': category})
+        return render(request, self.template_name, self.get_context(form, category))
 
     
 
-class BookingListView(ListView):
+# Checkout step one: hold a room for the chosen dates (BOOKING_HOLD_TTL seconds)
+class BookingHoldView(RateLimitMixin, LoginRequiredMixin, View):
+    template_name = 'customer/booking_add.html'
+    ratelimit_scope = 'booking'
+
+    def post(self, request, category_id):
+        category = get_object_or_404(Category, pk=category_id)
+        form = BookingHoldForm(request.POST)
+        context = {'form': BookingForm(request.POST), 'category': category,
+                   'idempotency_key': request.POST.get(idempotency.FIELD_NAME) or idempotency.new_key()}
+        if not form.is_valid():
+            for error in form.non_field_errors():
+                messages.error(request, error)
+            return render(request, self.template_name, context)
+        if not category.is_available:
+            messages.error(request, "No rooms available for the selected category.")
+            return render(request, self.template_name, context)
+
+        try:
+            hold = holds.place(request.user, category, form.cleaned_data['start_date'], form.cleaned_data['end_date'])
+        except RoomsUnavailable:
+            messages.error(request, "No rooms available for the selected dates.")
+            return render(request, self.template_name, context)
+        except holds.TooManyHolds as e:
+            messages.error(request, str(e))
+            return render(request, self.template_name, context)
+        return redirect('booking_checkout', pk=hold.pk)
+
+
+# Checkout step two: guest details, then the hold becomes a booking
+class BookingCheckoutView(RateLimitMixin, LoginRequiredMixin, View):
+    template_name = 'customer/booking_checkout.html'
+    ratelimit_scope = 'booking'
+
+    def get_hold(self, request, pk):
+        return get_object_or_404(BookingHold.objects.select_related('category'), pk=pk, customer=request.user)
+
+    def get(self, request, pk):
+        hold = self.get_hold(request, pk)
+        if hold.is_expired:
+            messages.error(request, "Your hold on this room has expired.")
+            return redirect('booking_add', category_id=hold.category_id)
+        return render(request, self.template_name, self.get_context(hold, GuestDetailsForm()))
+
+    def get_context(self, hold, form):
+        key = self.request.POST.get(idempotency.FIELD_NAME) or idempotency.new_key()
+        return {'hold': hold, 'form': form, 'idempotency_key': key}
+
+    def post(self, request, pk):
+        submission = idempotency.IdempotentRequest(request, 'booking_checkout')
+        replayed = submission.replay()
+        if replayed:
+            return replayed
+
+        hold = self.get_hold(request, pk)
+        form = GuestDetailsForm(request.POST)
+        if not form.is_valid():
+            return render(request, self.template_name, self.get_context(hold, form))
+        try:
+            with transaction.atomic():
+                submission.claim()
+                booking = holds.confirm(hold, Booking())
+                response = submission.complete(redirect('booking_list'), booking)
+        except idempotency.DuplicateRequest:
+            return submission.replay()
+        except holds.HoldExpired as e:
+            messages.error(request, str(e))
+            return redirect('booking_add', category_id=hold.category_id)
+        messages.success(request, "Booking successful!")
+        return response
+
+
+class BookingHoldCancelView(LoginRequiredMixin, View):
+    def post(self, request, pk):
+        hold = get_object_or_404(BookingHold, pk=pk, customer=request.user)
+        holds.cancel(hold)
+        messages.info(request, "Your hold has been released.")
+        return redirect('booking_add', category_id=hold.category_id)
+
+
+class BookingListView(ReplicaReadMixin, ListView):
     model = Booking
     template_name = 'customer/booking_list.html'
     context_object_name = 'bookings'
 
+    async def get(self, request, *args, **kwargs):
+        self.customer = await request.auser()
+        if not self.customer.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        self.object_list = [booking async for booking in self.get_queryset()]
+        return self.render_to_response(self.get_context_data())
+
     def get_queryset(self):
-        # Filter bookings for the currently logged-in customer
-        return Booking.objects.filter(customer=self.request.user)
+        # Filter bookings for the currently logged-in customer, newest first
+        return Booking.objects.filter(customer=self.customer).select_related('Category').order_by('-created_at')
     
 
 class BookingDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
@@ -338,4 +586,132 @@ class BookingDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         # Ensure the booking belongs to the logged-in user
         booking = self.get_object()
         return booking.customer == self.request.user
-    
\ No newline at end of file
+    
+
+
+# Availability search (HTML, or JSON with ?format=json / Accept: application/json)
+class AvailabilitySearchView(View):
+    template_name = 'customer/availability.html'
+
+    def wants_json(self, request):
+        return request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', '')
+
+    async def get(self, request):
+        form = AvailabilitySearchForm(request.GET or None)
+        results = None
+
+        if form.is_valid():
+            results = await asearch(
+                form.cleaned_data['start_date'],
+                form.cleaned_data['end_date'],
+                form.cleaned_data['guests'],
+            )
+
+        if self.wants_json(request):
+            if results is None:
+                return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+            return JsonResponse({
+                'start_date': form.cleaned_data['start_date'].isoformat(),
+                'end_date': form.cleaned_data['end_date'].isoformat(),
+                'guests': form.cleaned_data['guests'],
+                'results': [result.as_dict() for result in results],
+            })
+
+        # TemplateResponse is rendered by the handler in a thread, where the template may touch request.user
+        return TemplateResponse(request, self.template_name, {'form': form, 'results': results})
+
+
+# Background job status and throughput (admins only)
+class JobStatusView(AdminRequiredMixin, View):
+    def get(self, request, pk=None):
+        if pk is not None:
+            job = get_object_or_404(Job, pk=pk)
+            return JsonResponse({
+                'id': job.pk,
+                'task': job.task,
+                'status': job.status,
+                'attempts': job.attempts,
+                'worker': job.worker,
+                'error': job.error,
+                'created_at': job.created_at,
+                'started_at': job.started_at,
+                'finished_at': job.finished_at,
+                'duration_seconds': job.duration,
+            })
+        return JsonResponse(job_stats())
+
+
+# Per-view request statistics collected by RequestStatsMiddleware (admins only)
+class RequestStatsView(AdminRequiredMixin, View):
+    def get(self, request):
+        return JsonResponse({'views': stats_snapshot(), 'budgets': settings.QUERY_BUDGETS})
+
+
+# JSON API, version 1 (see api.py). Reads only, so they may come from the replica.
+class ApiView(ReplicaReadMixin, View):
+    async def get(self, request, resource, pk=None):
+        try:
+            resource = api.get_resource(resource)
+            user = await request.auser()
+            if resource.login_required and not user.is_authenticated:
+                raise api.ApiError("Authentication required.", status=401)
+            response = await self.respond(request, resource, user, pk)
+        except api.ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        # Clients revalidate with If-None-Match; per-user resources stay out of shared caches
+        response['Cache-Control'] = 'private, no-cache' if resource.login_required else 'no-cache'
+        return response
+
+
+class ApiListView(ApiView):
+    async def respond(self, request, resource, user, pk):
+        serializer, page = await resource.page(request, user)
+        next_url = None
+        if page.has_next:
+            query = request.GET.copy()
+            query['cursor'] = page.next_cursor
+            next_url = f'{request.path}?{query.urlencode()}'
+        tag = api.etag(request, page.items, next_url)
+        if api.not_modified(request, tag):
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse({'data': [serializer(row) for row in page.items], 'next': next_url})
+        response['ETag'] = tag
+        return response
+
+
+class ApiDetailView(ApiView):
+    async def respond(self, request, resource, user, pk):
+        serializer, row = await resource.get(request, user, pk)
+        tag = api.etag(request, [row])
+        if api.not_modified(request, tag):
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse({'data': serializer(row)})
+        response['ETag'] = tag
+        return response
+
+
+# Availability and rates for channel managers, whole horizon or changes since (admins only).
+# Not a replica read: a slice computed from a lagging replica would be cached as current.
+class AriFeedView(AdminRequiredMixin, View):
+    def get(self, request):
+        form = AriFeedForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        data = form.cleaned_data
+        return JsonResponse(ari.feed(data['start_date'], data['days'], data.get('since')))
+
+
+# Price of a stay in one category, night by night (JSON API)
+class ApiQuoteView(ReplicaReadMixin, View):
+    async def get(self, request, pk):
+        category = await Category.objects.only('pk', 'price_per_night').filter(pk=pk).afirst()
+        if category is None:
+            return JsonResponse({'error': 'Not found.'}, status=404)
+        form = QuoteForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        start_date, end_date = form.cleaned_data['start_date'], form.cleaned_data['end_date']
+        indexes = await PriceIndex.afor_categories([category])
+        return JsonResponse({'data': quote(category, start_date, end_date, index=indexes[category.pk]).as_dict()})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,7 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'app.apps.StaticFilesConfig',  # django.contrib.staticfiles without the SCSS sources
     'app'
 ]
 
@@ -44,16 +45,46 @@ AUTH_USER_MODEL = "app.User"
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.PrecompressedStaticMiddleware',
+    'app.middleware.RequestStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'hotel.urls'
 
+# Per-request query/latency instrumentation (app/middleware.py)
+REQUEST_STATS_ENABLED = True
+
+# Maximum SQL queries per request, by URL name (or a dict by HTTP method). Over
+# budget is logged, or raises QueryBudgetExceeded when QUERY_BUDGET_ENFORCE is on (tests).
+QUERY_BUDGETS = {
+    # Signed-in visitors add the session and user lookups when those are not cached yet
+    'index': 5,
+    'availability': 7,  # 3 of them compile the pricing rules when those are not cached
+    # POST: 16 with everything cached (4 reads, 8 writes, the transaction and
+    # savepoint statements and the ARI log write after commit), 3 more to compile
+    # the pricing rules
+    'booking_add': {'GET': 4, 'POST': 21},
+    'booking_list': 4,
+    'admin_reservations': 6,
+    'seasonalpricing_list': 3,
+    'category_list': 3,
+    'touristlocation_list': 3,
+    'photo_list': 3,
+    'adminindex': 6,
+    'api_list': 3,
+    'api_detail': 3,
+    'api_quote': 4,
+    'api_ari': 7,
+}
+QUERY_BUDGET_ENFORCE = False
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -76,13 +107,136 @@ WSGI_APPLICATION = 'hotel.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# DJANGO_DB_ENGINE=postgresql switches to PostgreSQL configured from the POSTGRES_* variables;
+# otherwise the bundled SQLite file is used. Setting a replica host (or file) adds a
+# 'replica' alias that app.routers.ReplicaRouter sends read-only views to.
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'homestay'),
+            'USER': os.environ.get('POSTGRES_USER', 'homestay'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DJANGO_DB_POOL', '1') == '1':
+        # psycopg 3 connection pool (pip install "psycopg[pool]"); pooling replaces CONN_MAX_AGE
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX', 10)),
+                'timeout': int(os.environ.get('DJANGO_DB_POOL_TIMEOUT', 10)),
+            },
+        }
+    else:
+        # E.g. behind PgBouncer
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+    REPLICA_OVERRIDES = {'HOST': os.environ['POSTGRES_REPLICA_HOST']} if os.environ.get('POSTGRES_REPLICA_HOST') else None
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_SQLITE_NAME', BASE_DIR / 'db.sqlite3'),
+            # A file rather than the in-memory default, so tests with threads get real
+            # locking (busy_timeout) instead of shared-cache "table is locked" errors
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+    # A second SQLite file stands in for the replica locally; refresh it with manage.py sync_replica
+    REPLICA_OVERRIDES = (
+        {'NAME': os.environ['DJANGO_SQLITE_REPLICA_NAME']} if os.environ.get('DJANGO_SQLITE_REPLICA_NAME') else None
+    )
+
+# SQLite production profile, off unless DJANGO_SQLITE_PROFILE=production.
+# WAL lets readers run while a booking is being written, IMMEDIATE transactions
+# take the write lock up front so busy_timeout applies instead of failing on
+# lock upgrade, and persistent connections skip the connect + pragma cost per request.
+SQLITE_PROFILE = os.environ.get('DJANGO_SQLITE_PROFILE', 'default')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # durable with WAL except for the last commits on power loss
+    'busy_timeout': 5000,  # ms
+    'cache_size': -20000,  # KiB, i.e. 20 MB page cache per connection
+    'mmap_size': 134217728,  # 128 MB
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+SQLITE_PROFILE_OPTIONS = {
+    'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+}
+
+if DB_ENGINE != 'postgresql' and SQLITE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_PROFILE_OPTIONS,
+    })
+
+if REPLICA_OVERRIDES:
+    # The test runner points the replica at the test primary instead of creating a second test database
+    DATABASES['replica'] = dict(DATABASES['default'], **REPLICA_OVERRIDES, TEST={'MIRROR': 'default'})
+    if DB_ENGINE != 'postgresql':
+        # Make a write that was routed to the stand-in replica by mistake fail loudly
+        options = {k: v for k, v in DATABASES['replica'].get('OPTIONS', {}).items() if k != 'transaction_mode'}
+        options['init_command'] = ';'.join(filter(None, [options.get('init_command'), 'PRAGMA query_only=ON']))
+        DATABASES['replica']['OPTIONS'] = options
+    DATABASE_ROUTERS = ['app.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after it wrote something (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.environ.get('DJANGO_REPLICA_STICKY_SECONDS', 15))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Local memory by default; point DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION at a
+# shared backend (e.g. django.core.cache.backends.redis.RedisCache) when running
+# several worker processes so invalidation reaches all of them.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'homestay'),
     }
 }
 
+CACHES['ratelimit'] = {
+    'BACKEND': os.environ.get('DJANGO_RATELIMIT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': os.environ.get('DJANGO_RATELIMIT_CACHE_LOCATION', 'homestay-ratelimit'),
+}
+
+HOMEPAGE_CACHE_ALIAS = 'default'
+HOMEPAGE_CACHE_TIMEOUT = 60 * 60 * 24  # Versioned, so this only bounds memory use
+
+# Compiled pricing rules per category (app/pricing.py); dropped on every rule change
+PRICING_CACHE_ALIAS = 'default'
+PRICING_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Sessions and authentication
+# cached_db reads the session from the cache and falls back to the database, and
+# CachedModelBackend (app/auth.py) caches the signed-in user, so a warm
+# authenticated request makes no session or user queries. Both use the 'default'
+# cache: with several worker processes point it at a shared backend, otherwise a
+# logout or password change is only seen by the process that handled it until
+# the entries expire. DJANGO_SESSION_ENGINE=django.contrib.sessions.backends.db
+# restores the plain database sessions (signed_cookies needs no storage at all).
+SESSION_ENGINE = os.environ.get('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'default'
+
+# Sessions created with the stock ModelBackend sign in again once after this changes
+AUTHENTICATION_BACKENDS = ['app.auth.CachedModelBackend']
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = 60  # seconds
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -120,6 +274,85 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# `manage.py collectstatic` builds STATIC_ROOT: hashed names plus minified and
+# .gz/.br variants (see app/staticfiles.py). With DEBUG on, templates keep the
+# plain names and runserver serves app/static directly.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.staticfiles.FingerprintedStaticFilesStorage'},
+}
+
+# Serve STATIC_ROOT from PrecompressedStaticMiddleware (never with DEBUG on); turn off when the web server serves it
+STATIC_SERVE = True
+
+# Uploaded files (photos/, category/, tourist_locations/ live in the project root)
+
+MEDIA_URL = '/'
+MEDIA_ROOT = BASE_DIR
+
+# Served by app.media.serve in every environment. Originals are revalidated after
+# MEDIA_CACHE_MAX_AGE seconds; derivatives are cached as immutable. Set
+# DJANGO_MEDIA_ACCEL_REDIRECT to an nginx `internal` location aliased to MEDIA_ROOT
+# to let nginx send the bytes.
+MEDIA_CACHE_MAX_AGE = 86400
+MEDIA_ACCEL_REDIRECT = os.environ.get('DJANGO_MEDIA_ACCEL_REDIRECT')
+
+# Resized copies written next to each upload for srcset (see app/images.py)
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+IMAGE_DERIVATIVE_WEBP = True
+
+# Booking.total_price returns the stored _total_price only and never queries
+# SeasonalPricing. Run `manage.py backfill_booking_prices` before enabling.
+BOOKING_FROZEN_PRICES = False
+
+# Background jobs (see app/jobs.py)
+JOBS_EAGER = False
+JOBS_WORKERS = 2
+# A running job whose worker has not finished it JOBS_LEASE seconds after
+# claiming it is taken to have crashed, and is queued again on the next start
+# of a worker. Keep it well above the longest task.
+JOBS_LEASE = 10 * 60
+
+# Booking holds (see app/holds.py): rooms are claimed for BOOKING_HOLD_TTL seconds
+# while the customer checks out. A background thread gives expired holds back
+# every BOOKING_HOLD_SWEEP_INTERVAL seconds (0 turns it off; run
+# `manage.py sweep_holds --loop` instead).
+BOOKING_HOLD_TTL = 10 * 60
+BOOKING_HOLD_SWEEP_INTERVAL = 60
+BOOKING_HOLD_MAX_PER_CUSTOMER = 3
+
+# Rate limits (see app/ratelimit.py): scope -> (key, requests, window seconds) rules.
+# Keys are 'ip', 'username' (the posted username) and 'session' (the session cookie).
+# Counters live in the 'ratelimit' cache; point it at a shared backend with several
+# worker processes, and set RATELIMIT_IP_META (e.g. 'HTTP_X_REAL_IP') behind a proxy.
+RATELIMIT_ENABLED = True
+RATELIMIT_CACHE_ALIAS = 'ratelimit'
+RATELIMIT_IP_META = 'REMOTE_ADDR'
+RATELIMITS = {
+    'login': [('ip', 30, 60), ('username', 10, 300)],
+    'register': [('ip', 10, 3600)],
+    'booking': [('session', 20, 60), ('ip', 120, 60)],
+}
+
+# Idempotency keys on booking submissions (see app/idempotency.py) are kept this
+# many seconds; `manage.py purge_idempotency_keys` deletes older ones
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# JSON API (see app/api.py): rows per page, default and the most ?limit= may ask for
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# ARI feed (see app/ari.py): nights per feed by default and at most, the cache the
+# category/month slices live in and for how long, and how long the change log
+# behind `since` is kept (`manage.py ari_feed --purge` deletes older entries)
+ARI_DEFAULT_DAYS = 365
+ARI_MAX_DAYS = 730
+ARI_CACHE_ALIAS = 'default'
+ARI_CACHE_TIMEOUT = 60 * 60
+ARI_CHANGE_TTL = 7 * 24 * 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 